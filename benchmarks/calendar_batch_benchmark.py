@@ -0,0 +1,90 @@
+"""
+Benchmark: creating N events one request at a time vs. in bulk.
+
+Compares three ways of creating the same number of events:
+  - serial: one events.insert round trip per event (what create_event does)
+  - batch:  apply_event_operations(), Calendar batch HTTP requests of up to 50
+  - async:  the async apply_event_operations(), CALENDAR_BATCH_CONCURRENCY
+            requests in flight over one keep-alive connection pool
+Every event created is cancelled again (in bulk) before the next mode runs.
+
+This talks to the real Calendar API: it books short events two years ahead on
+BOOKING_CALENDAR_ID and then deletes them, so point it at a test calendar.
+Run from the repository root (with the .env variables exported):
+    python -m benchmarks.calendar_batch_benchmark --events 50
+"""
+
+import argparse
+import asyncio
+import datetime
+import time
+import uuid
+
+from bookings_agent.tools import google_calendar_async
+from bookings_agent.tools.google_calendar import (
+    _build_event,
+    _insert_event,
+    apply_event_operations,
+)
+from bookings_agent.tools.calendar_client import get_calendar_client
+
+
+def make_events(count, run_id):
+    first = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    first += datetime.timedelta(days=730)
+    events = []
+    for index in range(count):
+        start = int((first + datetime.timedelta(hours=index)).timestamp())
+        events.append(_build_event("Batch benchmark", str(start), str(start + 900), f"benchmark {run_id} #{index}"))
+    return events
+
+
+def cancel(events):
+    results = apply_event_operations([{'action': 'cancel', 'event_id': event['id']} for event in events])
+    return sum(not result['ok'] for result in results)
+
+
+def run_serial(events):
+    client = get_calendar_client()
+    for event in events:
+        _insert_event(client, event)
+    return len(events)
+
+
+def run_batch(events):
+    results = apply_event_operations([{'action': 'create', 'event': event} for event in events])
+    return sum(result['ok'] for result in results)
+
+
+def run_async(events):
+    async def create():
+        try:
+            return await google_calendar_async.apply_event_operations(
+                [{'action': 'create', 'event': event} for event in events])
+        finally:
+            await google_calendar_async.get_async_calendar_client().aclose()
+    return sum(result['ok'] for result in asyncio.run(create()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs. bulk Calendar event creation")
+    parser.add_argument("--events", type=int, default=50)
+    args = parser.parse_args()
+
+    # Build the service and mint a token up front so no mode pays for it
+    get_calendar_client().authorized_http()
+
+    print(f"{'mode':<8} {'events':>6} {'created':>8} {'seconds':>8} {'events/s':>9}")
+    for mode, run in [('serial', run_serial), ('batch', run_batch), ('async', run_async)]:
+        events = make_events(args.events, uuid.uuid4().hex[:8])
+        started = time.perf_counter()
+        created = run(events)
+        elapsed = time.perf_counter() - started
+        print(f"{mode:<8} {args.events:>6} {created:>8} {elapsed:>8.2f} {created / elapsed:>9.1f}")
+        failed = cancel(events)
+        if failed:
+            print(f"  warning: {failed} event(s) could not be cancelled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: time to first slot in a fresh process.
+
+Each run starts a new Python process that imports the Calendar tools and
+times its first get_all_available_slots call, in four modes:
+  - cold:   no warm state and no shared snapshot (live Calendar lookup)
+  - shared: no warm state, shared Firestore snapshot (AVAILABILITY_SNAPSHOT_SHARED)
+  - warm:   rules and snapshot loaded from a warm state file just written
+  - aged:   the same file with its snapshot built --aged-seconds ago, past
+            AVAILABILITY_SNAPSHOT_MAX_AGE_SECONDS, as after a restart
+            (WARM_STATE_MAX_AGE_SECONDS decides whether it is still served)
+A setup process builds a snapshot and writes the warm state file (and the
+shared snapshot) before the measured runs. The "snapshot" column says whether
+the first call was answered from a snapshot rather than a live lookup.
+
+Slot leases are still listed from Firestore in every mode; set
+SLOT_LEASES_ENABLED=false to see the first slot without any round trip.
+
+Run from the repository root (with the .env variables exported):
+    python -m benchmarks.cold_start_benchmark --runs 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+from bookings_agent.tools import google_calendar_async, warm_state
+from bookings_agent.tools.availability_snapshot import get_availability_snapshots
+imported = time.perf_counter()
+
+async def main(mode):
+    try:
+        if mode == 'setup':
+            snapshot = await google_calendar_async.build_availability_snapshot()
+            if snapshot is not None:
+                get_availability_snapshots().install(snapshot)
+            warm_state.save_warm_state(snapshot)
+            return
+        if mode in ('warm', 'aged'):
+            warm_state.load_warm_state()
+        loaded = time.perf_counter()
+        result = await google_calendar_async.get_all_available_slots(compact=True)
+        first = time.perf_counter()
+        print(json.dumps({
+            'import_ms': (imported - started) * 1000,
+            'load_ms': (loaded - imported) * 1000,
+            'first_slot_ms': (first - loaded) * 1000,
+            'total_ms': (first - started) * 1000,
+            'slots': result.get('total_slots'),
+            'snapshot': get_availability_snapshots().get_stats()['served'] > 0,
+        }))
+    finally:
+        await google_calendar_async.get_async_calendar_client().aclose()
+
+asyncio.run(main(sys.argv[1]))
+"""
+
+
+def age_state_file(state_file, aged_file, seconds):
+    """Copy the warm state file with its snapshot built the given number of seconds earlier."""
+    with open(state_file) as f:
+        state = json.load(f)
+    state['saved_at'] -= seconds
+    state['snapshot']['built_at'] -= seconds
+    with open(aged_file, 'w') as f:
+        json.dump(state, f)
+
+
+def run_child(mode, state_file):
+    env = dict(os.environ, WARM_STATE_FILE=state_file if mode in ('setup', 'warm', 'aged') else '')
+    if mode in ('cold', 'aged'):
+        # An aged file must stand on its own, without a fresher shared snapshot
+        env['AVAILABILITY_SNAPSHOT_SHARED'] = 'false'
+    output = subprocess.run([sys.executable, '-c', CHILD, mode], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    if mode == 'setup':
+        return None
+    # The tools print progress; the measurement is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first slot in a fresh process")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--aged-seconds", type=int, default=900)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        state_file = os.path.join(directory, 'warm_state.json')
+        aged_file = os.path.join(directory, 'aged_state.json')
+        run_child('setup', state_file)
+        age_state_file(state_file, aged_file, args.aged_seconds)
+        print(f"warm state file: {os.path.getsize(state_file)} bytes")
+        print(f"{'mode':<7} {'import ms':>10} {'load ms':>8} {'first slot ms':>14} {'total ms':>9} {'slots':>6} "
+              f"{'snapshot':>9}")
+        for mode in ('cold', 'shared', 'warm', 'aged'):
+            results = [run_child(mode, aged_file if mode == 'aged' else state_file) for _ in range(args.runs)]
+            median = {key: statistics.median(result[key] for result in results)
+                      for key in ('import_ms', 'load_ms', 'first_slot_ms', 'total_ms')}
+            print(f"{mode:<7} {median['import_ms']:>10.1f} {median['load_ms']:>8.1f} "
+                  f"{median['first_slot_ms']:>14.1f} {median['total_ms']:>9.1f} {results[0]['slots']:>6} "
+                  f"{str(results[0]['snapshot']):>9}")
+
+
+if __name__ == "__main__":
+    main()
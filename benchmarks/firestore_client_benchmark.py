@@ -0,0 +1,73 @@
+"""
+Benchmark: per-call Firestore latency with a new client per call vs. the shared client.
+
+Until the shared client, interact_with_firestore built a FirestoreService (and
+so a new firestore.Client, gRPC channel and auth handshake) on every tool
+call. This times the same get_task read both ways:
+  - per-call: FirestoreService() then get_task(), as the tool used to do
+  - shared:   get_firestore_service().get_task(), as it does now
+Run it against the Firestore emulator:
+
+    gcloud emulators firestore start --host-port=localhost:8081
+    FIRESTORE_EMULATOR_HOST=localhost:8081 GOOGLE_CLOUD_PROJECT=demo-bookings \\
+        python -m benchmarks.firestore_client_benchmark --calls 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from bookings_agent.firestore_service import (
+    FirestoreService,
+    close_firestore_client,
+    close_firestore_service,
+    get_firestore_service,
+)
+
+
+def per_call(task_id):
+    service = FirestoreService()
+    try:
+        return service.get_task(task_id)
+    finally:
+        close_firestore_client(service.client)
+
+
+def shared(task_id):
+    return get_firestore_service().get_task(task_id)
+
+
+def measure(read, task_id, calls):
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        read(task_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call vs. shared Firestore client latency")
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("FIRESTORE_EMULATOR_HOST is not set; refusing to run against a real Firestore project.")
+
+    task_id = get_firestore_service().save_task({"title": "client benchmark", "status": "pending"})
+    try:
+        print(f"{'client':<9} {'calls':>6} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'first ms':>9}")
+        for name, read in [('per-call', per_call), ('shared', shared)]:
+            latencies = measure(read, task_id, args.calls)
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{name:<9} {args.calls:>6} {statistics.mean(latencies):>8.2f} "
+                  f"{statistics.median(latencies):>7.2f} {p95:>7.2f} {latencies[0]:>9.2f}")
+    finally:
+        get_firestore_service().delete_task(task_id)
+        close_firestore_service()
+
+
+if __name__ == "__main__":
+    main()
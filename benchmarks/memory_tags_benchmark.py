@@ -0,0 +1,82 @@
+"""
+Benchmark: documents read and results returned by multi-tag memory queries.
+
+Seeds --memories memories with random tags, then for tag combinations of
+growing selectivity compares:
+  - post-limit: the previous list_memories (query the first tag with the
+    limit, then drop documents missing the other tags)
+  - cursor:     FirestoreService.query_memories (over-fetched pages continued
+    with start_after cursors until the limit is met)
+Both are checked against every matching memory, newest first. Run it against
+the Firestore emulator (the memories collection is cleared first):
+
+    gcloud emulators firestore start --host-port=localhost:8081
+    FIRESTORE_EMULATOR_HOST=localhost:8081 GOOGLE_CLOUD_PROJECT=demo-bookings \\
+        python -m benchmarks.memory_tags_benchmark --memories 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from bookings_agent.firestore_service import FirestoreService, _memories_query
+
+TAGS = ["booking", "pricing", "career", "coding", "health", "family", "travel", "finance"]
+QUERIES = [["booking"], ["booking", "pricing"], ["booking", "pricing", "career"], ["booking", "pricing", "career", "coding"]]
+
+
+def seed(service, count):
+    for doc in service.memories_collection.stream():
+        doc.reference.delete()
+    memories = []
+    for index in range(count):
+        memories.append({"id": f"memory-{index:06}", "tags": random.sample(TAGS, random.randint(1, 4)),
+                         "updated_at": index})
+    for offset in range(0, count, 500):
+        batch = service.client.batch()
+        for memory in memories[offset:offset + 500]:
+            batch.set(service.memories_collection.document(memory["id"]), memory)
+        batch.commit()
+    return memories
+
+
+def post_limit(service, filters):
+    """The previous behaviour: limit first, then filter the remaining tags."""
+    query, limit, extra_tags = _memories_query(service.memories_collection, filters)
+    docs = list(query.limit(limit).stream())
+    return [doc.id for doc in docs if all(tag in doc.to_dict()["tags"] for tag in extra_tags)], len(docs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-tag memory query reads")
+    parser.add_argument("--memories", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("FIRESTORE_EMULATOR_HOST is not set; refusing to run against a real Firestore project.")
+
+    random.seed(7)
+    service = FirestoreService()
+    memories = seed(service, args.memories)
+    newest_first = sorted(memories, key=lambda memory: memory["updated_at"], reverse=True)
+
+    print(f"{'tags':<5} {'mode':<11} {'reads':>6} {'results':>8} {'correct':>8} {'ms':>8}")
+    for tags in QUERIES:
+        expected = [m["id"] for m in newest_first if all(tag in m["tags"] for tag in tags)][:args.limit]
+        filters = {"tags": tags, "limit": args.limit}
+        for mode in ('post-limit', 'cursor'):
+            started = time.perf_counter()
+            if mode == 'post-limit':
+                ids, reads = post_limit(service, filters)
+            else:
+                results, reads = service.query_memories(filters)
+                ids = [memory["id"] for memory in results]
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"{len(tags):<5} {mode:<11} {reads:>6} {len(ids):>8} {str(ids == expected):>8} {elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark: common free time across many calendars.
+
+Compares checking every slot against every calendar's events in turn with
+slot_engine.merge_busy_lists() (a k-way heap merge of the per-calendar busy
+lists, as returned by FreeBusy) followed by one free_slots() sweep. Also
+prints how many FreeBusy requests each scenario needs.
+
+Run from the repository root (with the .env variables exported):
+    python -m benchmarks.multi_calendar_benchmark
+"""
+
+from bookings_agent.tools.calendar_client import freebusy_queries
+from bookings_agent.tools.slot_engine import free_slots, merge_busy_lists, merge_sorted_intervals
+
+from benchmarks.slot_engine_benchmark import WEEK, best_of, candidate_slots, synthetic_calendar
+
+# (calendars, events per calendar, weeks) combinations to measure
+SCENARIOS = [(3, 50, 3), (12, 200, 12), (36, 500, 26), (72, 500, 52)]
+
+
+def per_calendar_scan(candidates, calendars):
+    """Check each slot against each calendar's events, one calendar at a time."""
+    free = []
+    for slot_start, slot_end in candidates:
+        if all(not (busy_start < slot_end and slot_start < busy_end)
+               for busy in calendars for busy_start, busy_end in busy):
+            free.append((slot_start, slot_end))
+    return free
+
+
+def k_way(candidates, calendars):
+    # FreeBusy returns each calendar's busy periods in order
+    busy_lists = [list(merge_sorted_intervals(sorted(busy))) for busy in calendars]
+    return list(free_slots(candidates, merge_busy_lists(busy_lists)))
+
+
+def main():
+    print(f"{'calendars':>9} {'events':>7} {'weeks':>6} {'queries':>8} {'scan ms':>10} {'k-way ms':>9} {'speedup':>8}")
+    for calendar_count, event_count, weeks in SCENARIOS:
+        calendars = [synthetic_calendar(event_count, weeks, seed=index) for index in range(calendar_count)]
+        candidates = candidate_slots(weeks)
+        queries = len(freebusy_queries([f"calendar-{index}" for index in range(calendar_count)], 0, weeks * WEEK))
+        scan_seconds, scan_result = best_of(per_calendar_scan, candidates, calendars, repeat=1)
+        merge_seconds, merge_result = best_of(k_way, candidates, calendars)
+        assert scan_result == merge_result, "slot engines disagree"
+        print(f"{calendar_count:>9} {calendar_count * event_count:>7} {weeks:>6} {queries:>8} "
+              f"{scan_seconds * 1000:>10.2f} {merge_seconds * 1000:>9.2f} "
+              f"{scan_seconds / merge_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
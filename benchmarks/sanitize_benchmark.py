@@ -0,0 +1,107 @@
+"""
+Benchmark: sanitizing large session and inquiry documents.
+
+Builds a session document with --messages conversation turns and an inquiry
+with a long conversation context, each with and without a SERVER_TIMESTAMP,
+and times per call:
+  - rebuild:  the previous sanitize_sentinel (every dict and list rebuilt),
+              followed by the .copy() interact_with_firestore made of its args
+  - copy-free: sanitize_sentinel (containers copied only on the path to a Sentinel)
+  - in-place:  sanitize_sentinel(..., in_place=True), as used on read documents
+Nothing talks to Firestore:
+
+    python -m benchmarks.sanitize_benchmark --messages 500
+"""
+
+import argparse
+import copy
+import time
+from datetime import datetime, timedelta, timezone
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+from google.cloud.firestore_v1.transforms import Sentinel
+
+from bookings_agent.firestore_service import sanitize_sentinel
+
+
+def sanitize_rebuild(data):
+    """The previous sanitize_sentinel."""
+    if isinstance(data, Sentinel):
+        return "<SERVER_TIMESTAMP>"
+    elif isinstance(data, dict):
+        return {k: sanitize_rebuild(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [sanitize_rebuild(item) for item in data]
+    else:
+        return data
+
+
+def session_document(messages, timestamp):
+    started = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+    turns = []
+    for index in range(messages):
+        turns.append({
+            "role": "user" if index % 2 == 0 else "model",
+            "text": "Could we move the consultation to Thursday afternoon instead? " * 3,
+            "sent_at": started + timedelta(seconds=30 * index),
+            "tool_calls": [{"name": "get_available_slots", "args": {"date": "2026-03-05", "duration": 30},
+                            "result": {"slots": [f"2026-03-05T{hour:02}:00" for hour in range(9, 17)]}}],
+        })
+    return {
+        "id": "session-0001",
+        "user_id": "user-0001",
+        "state": {"last_task_id": "task-0042", "timezone": "Africa/Johannesburg", "tags": ["booking", "pricing"]},
+        "events": turns,
+        "created_at": started,
+        "updated_at": SERVER_TIMESTAMP if timestamp else started,
+    }
+
+
+def inquiry_document(messages, timestamp):
+    return {
+        "email": "client@example.com",
+        "inquiry_text": "I'd like a quote for a six-week coaching package. " * 20,
+        "category": "Pricing",
+        "conversation_context": [{"role": "user", "text": "Hello, I have a question about pricing. " * 5}
+                                 for _ in range(messages)],
+        "status": "new",
+        "timestamp": SERVER_TIMESTAMP if timestamp else datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc),
+    }
+
+
+def timed(function, document, repeat, fresh):
+    documents = [copy.deepcopy(document) for _ in range(repeat)] if fresh else [document] * repeat
+    started = time.perf_counter()
+    for item in documents:
+        function(item)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentinel sanitization of large documents")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    modes = [
+        ('rebuild', lambda data: sanitize_rebuild(data).copy(), False),
+        ('copy-free', sanitize_sentinel, False),
+        # In place modifies its input, so every call gets its own copy
+        ('in-place', lambda data: sanitize_sentinel(data, in_place=True), True),
+    ]
+    print(f"{'document':<10} {'timestamp':>9} {'mode':<10} {'ms/call':>8} {'same object':>12}")
+    for name, build in [('session', session_document), ('inquiry', inquiry_document)]:
+        for timestamp in (False, True):
+            document = build(args.messages, timestamp)
+            expected = sanitize_rebuild(document)
+            for mode, function, fresh in modes:
+                probe = copy.deepcopy(document)
+                result = function(probe)
+                assert result == expected, f"{mode} sanitized {name} differently"
+                elapsed = timed(function, document, args.repeat, fresh)
+                same = result is probe
+                print(f"{name:<10} {str(timestamp):>9} {mode:<10} {elapsed:>8.3f} {str(same):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Concurrency check: resolving the user and session of tool calls with many live sessions.
+
+Creates --sessions sessions (one user each) in an InMemorySessionService and
+runs one simulated tool call per session concurrently, each with its own
+ToolContext, interleaving at await points as conversations do on one event
+loop. Every call must resolve its own user and session. For comparison, the
+previous lookup (the first user and session of the service's sessions dict)
+is timed and checked the same way. Nothing talks to Firestore:
+
+    python -m benchmarks.session_identity_concurrency --sessions 5000
+"""
+
+import argparse
+import asyncio
+import inspect
+import random
+import statistics
+import sys
+import time
+import uuid
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import ToolContext
+
+from bookings_agent.tools.session_identity import resolve_session_identity
+
+APP_NAME = "bookings_agent"
+
+
+def legacy_identity(tool_context):
+    """The previous lookup in save_user_inquiry and interact_with_firestore."""
+    sessions = tool_context._invocation_context.session_service.__dict__["sessions"]
+    bookings_sessions = sessions[APP_NAME]
+    user_id = list(bookings_sessions.keys())[0]
+    session_id = list(bookings_sessions[user_id].keys())[0]
+    return user_id, session_id
+
+
+async def create_sessions(session_service, count):
+    sessions = []
+    for index in range(count):
+        created = session_service.create_session(app_name=APP_NAME, user_id=f"user-{index:05}",
+                                                 session_id=f"session-{index:05}")
+        sessions.append(await created if inspect.isawaitable(created) else created)
+    return sessions
+
+
+async def tool_call(resolve, session_service, agent, session):
+    context = ToolContext(InvocationContext(
+        session_service=session_service, invocation_id=f"e-{uuid.uuid4()}", agent=agent, session=session))
+    # Let the other conversations run in between, as a model round trip would
+    await asyncio.sleep(random.uniform(0, 0.01))
+    started = time.perf_counter()
+    # A tool call resolves its identity once; a second call in the invocation is a cache hit
+    identity = tuple(resolve(context))
+    identity_again = tuple(resolve(context))
+    elapsed = (time.perf_counter() - started) / 2 * 1000
+    await asyncio.sleep(0)
+    expected = (session.user_id, session.id)
+    return identity == expected and identity_again == expected, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Session identity resolution under concurrency")
+    parser.add_argument("--sessions", type=int, default=5000)
+    args = parser.parse_args()
+
+    session_service = InMemorySessionService()
+    agent = LlmAgent(name=APP_NAME, model="gemini-2.0-flash")
+    sessions = await create_sessions(session_service, args.sessions)
+
+    print(f"{'resolver':<10} {'calls':>6} {'wrong':>6} {'p50 us':>8} {'p95 us':>8}")
+    failed = False
+    for name, resolve in [('previous', legacy_identity), ('context', resolve_session_identity)]:
+        results = await asyncio.gather(*(tool_call(resolve, session_service, agent, session) for session in sessions))
+        wrong = sum(not correct for correct, _ in results)
+        times = [elapsed * 1000 for _, elapsed in results]
+        p95 = statistics.quantiles(times, n=20)[-1]
+        print(f"{name:<10} {len(results):>6} {wrong:>6} {statistics.median(times):>8.2f} {p95:>8.2f}")
+        failed = failed or (name == 'context' and wrong > 0)
+
+    if failed:
+        sys.exit("FAILED: a tool call resolved another conversation's session")
+    print("OK: every tool call resolved its own user and session")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
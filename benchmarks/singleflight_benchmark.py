@@ -0,0 +1,72 @@
+"""
+Benchmark: identical concurrent availability lookups with and without singleflight.
+
+Simulates a burst of conversations asking for the same window at once, as
+threads and as coroutines, against a fake Calendar fetch that takes a fixed
+time. Reports how many fetches were actually made and how long the burst took.
+Runs offline.
+
+Run from the repository root (with the .env variables exported):
+    python -m benchmarks.singleflight_benchmark
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bookings_agent.tools.singleflight import SingleFlight
+
+FETCH_SECONDS = 0.2
+BURSTS = [10, 100, 500]
+KEY = ('events', 'calendar', 0, 86400)
+
+
+def run_threads(callers, coalesce):
+    flight = SingleFlight()
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        time.sleep(FETCH_SECONDS)
+        return [(0, 1800)]
+
+    def lookup(_):
+        return flight.do(KEY, fetch) if coalesce else fetch()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        list(executor.map(lookup, range(callers)))
+    return len(fetches), time.perf_counter() - started, flight.get_stats()
+
+
+def run_coroutines(callers, coalesce):
+    flight = SingleFlight()
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(FETCH_SECONDS)
+        return [(0, 1800)]
+
+    async def lookup():
+        return await flight.do_async(KEY, fetch) if coalesce else await fetch()
+
+    async def burst():
+        await asyncio.gather(*(lookup() for _ in range(callers)))
+
+    started = time.perf_counter()
+    asyncio.run(burst())
+    return len(fetches), time.perf_counter() - started, flight.get_stats()
+
+
+def main():
+    print(f"{'mode':<11} {'callers':>7} {'coalesce':>8} {'fetches':>8} {'seconds':>8} {'coalesced':>10}")
+    for mode, run in [('threads', run_threads), ('coroutines', run_coroutines)]:
+        for callers in BURSTS:
+            for coalesce in (False, True):
+                fetches, elapsed, stats = run(callers, coalesce)
+                print(f"{mode:<11} {callers:>7} {str(coalesce):>8} {fetches:>8} {elapsed:>8.2f} {stats['coalesced']:>10}")
+
+
+if __name__ == "__main__":
+    main()
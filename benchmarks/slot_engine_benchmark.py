@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: nested overlap scan vs. merge + linear sweep slot engine.
+
+Builds synthetic calendars of increasing size and compares the previous
+O(slots x events) loop from get_all_available_slots with
+slot_engine.merge_intervals() + slot_engine.free_slots().
+
+Run from the repository root (with the .env variables exported):
+    python -m benchmarks.slot_engine_benchmark
+"""
+
+import random
+import time
+
+from bookings_agent.tools.slot_engine import free_slots, merge_intervals
+
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+# (events, weeks) combinations to measure
+SCENARIOS = [(50, 3), (500, 12), (2000, 26), (5000, 52)]
+
+
+def synthetic_calendar(event_count, weeks, seed=42):
+    """Random 15-180 minute events spread over the window, in no particular order."""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(event_count):
+        start = rng.randrange(0, weeks * WEEK, 15 * 60)
+        events.append((start, start + rng.choice([15, 30, 60, 90, 180]) * 60))
+    return events
+
+
+def candidate_slots(weeks, duration=30 * 60):
+    """Every half hour from 08:00 to 20:00 on every day of the window."""
+    return [
+        (day * DAY + offset, day * DAY + offset + duration)
+        for day in range(weeks * 7)
+        for offset in range(8 * HOUR, 20 * HOUR, 30 * 60)
+    ]
+
+
+def nested_scan(candidates, busy):
+    """The original per-slot scan over every busy event."""
+    free = []
+    for slot_start, slot_end in candidates:
+        is_available = True
+        for busy_start, busy_end in busy:
+            if max(slot_start, busy_start) < min(slot_end, busy_end):
+                is_available = False
+                break
+        if is_available:
+            free.append((slot_start, slot_end))
+    return free
+
+
+def sweep(candidates, busy):
+    return list(free_slots(candidates, merge_intervals(busy)))
+
+
+def best_of(fn, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    print(f"{'events':>7} {'weeks':>6} {'slots':>7} {'nested ms':>11} {'sweep ms':>10} {'speedup':>8}")
+    for event_count, weeks in SCENARIOS:
+        busy = synthetic_calendar(event_count, weeks)
+        candidates = candidate_slots(weeks)
+        nested_seconds, nested_result = best_of(nested_scan, candidates, busy)
+        sweep_seconds, sweep_result = best_of(sweep, candidates, busy)
+        assert nested_result == sweep_result, "slot engines disagree"
+        print(f"{event_count:>7} {weeks:>6} {len(candidates):>7} "
+              f"{nested_seconds * 1000:>11.2f} {sweep_seconds * 1000:>10.2f} "
+              f"{nested_seconds / sweep_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Concurrency check: many simulated sessions racing to hold and book the same slots.
+
+Each session picks one of a handful of slots at random, tries to hold it and,
+if the hold succeeds, confirms it as booked. Every slot must end up with
+exactly one winner, and every losing session must have been refused.
+Leases are written through FirestoreService, so run it against the Firestore
+emulator rather than a real project:
+
+    gcloud emulators firestore start --host-port=localhost:8081
+    FIRESTORE_EMULATOR_HOST=localhost:8081 GOOGLE_CLOUD_PROJECT=demo-bookings \\
+        python -m benchmarks.slot_lease_concurrency --sessions 500 --slots 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bookings_agent.firestore_service import FirestoreService
+
+SLOT_SECONDS = 1800
+LEASE_TTL_SECONDS = 600
+
+
+def run_session(service: FirestoreService, calendar_id: str, slot_starts, session_id: str):
+    slot_start = random.choice(slot_starts)
+    lease = service.acquire_slot_lease(
+        calendar_id, slot_start, slot_start + SLOT_SECONDS, session_id, LEASE_TTL_SECONDS)
+    if not lease["acquired"]:
+        return slot_start, session_id, False
+    # Simulate the booking round trip before confirming
+    time.sleep(random.uniform(0, 0.05))
+    confirmed = service.confirm_slot_lease(
+        calendar_id, slot_start, slot_start + SLOT_SECONDS, session_id, f"event-{session_id}")
+    return slot_start, session_id, confirmed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=64)
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("FIRESTORE_EMULATOR_HOST is not set; refusing to run against a real Firestore project.")
+
+    service = FirestoreService()
+    # A fresh calendar ID per run keeps runs independent of each other
+    calendar_id = f"lease-check-{uuid.uuid4().hex[:8]}"
+    first_start = int(time.time()) + 7 * 86400
+    slot_starts = [first_start + i * SLOT_SECONDS for i in range(args.slots)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as executor:
+        results = list(executor.map(
+            lambda i: run_session(service, calendar_id, slot_starts, f"session-{i}"), range(args.sessions)))
+    elapsed = time.perf_counter() - started
+
+    winners = Counter(slot_start for slot_start, _, booked in results if booked)
+    contested = Counter(slot_start for slot_start, _, _ in results)
+    print(f"{args.sessions} sessions, {args.slots} slots, {args.workers} workers: {elapsed:.2f}s")
+    failures = 0
+    for slot_start in slot_starts:
+        status = "ok" if winners[slot_start] == (1 if contested[slot_start] else 0) else "DOUBLE BOOKED"
+        failures += status != "ok"
+        print(f"  slot {slot_start}: {contested[slot_start]:4d} attempts, {winners[slot_start]} booked  {status}")
+
+    leases = service.list_slot_leases(calendar_id, slot_starts[0], slot_starts[-1] + SLOT_SECONDS)
+    print(f"  {len(leases)} active leases remain")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
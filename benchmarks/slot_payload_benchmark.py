@@ -0,0 +1,69 @@
+"""
+Benchmark: size of the full vs. compact get_all_available_slots payloads.
+
+Renders the free slots of 3-, 6- and 12-week windows in both response modes
+and reports the JSON size and an approximate token count (about 4 bytes per
+token) of what is sent back to the model each turn. Runs offline: the slots
+come from the availability rules with an empty calendar.
+
+Run from the repository root (with the .env variables exported):
+    python -m benchmarks.slot_payload_benchmark
+"""
+
+import datetime
+import json
+from zoneinfo import ZoneInfo
+
+from bookings_agent.tools.availability_rules import DEFAULT_RULES, AvailabilityRules
+from bookings_agent.tools.google_calendar import (
+    _compact_response,
+    _group_by_date,
+    _slot_payload,
+    time_zone,
+)
+
+# The current Tuesday/Thursday evening schedule and a busier weekday schedule
+RULE_SETS = {
+    'default': DEFAULT_RULES,
+    'weekdays 09-17': {
+        'weekly': {day: [['09:00', '17:00']] for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']},
+        'slot_step_minutes': 30,
+    },
+}
+WINDOWS_WEEKS = [3, 6, 12]
+SLOT_MINUTES = 30
+
+
+def json_size(payload):
+    return len(json.dumps(payload, separators=(',', ':')))
+
+
+def full_response(slots):
+    all_slots = [_slot_payload(start, end) for start, end in slots]
+    grouped_slots, formatted_display = _group_by_date(all_slots)
+    return {
+        'all_slots': all_slots,
+        'grouped_by_date': grouped_slots,
+        'total_slots': len(all_slots),
+        'formatted_display': formatted_display,
+    }
+
+
+def main():
+    tz = ZoneInfo(time_zone)
+    now = datetime.datetime.now(tz)
+    print(f"{'rules':>15} {'weeks':>6} {'slots':>6} {'full B':>8} {'compact B':>10} "
+          f"{'full tok':>9} {'compact tok':>12} {'saved':>6}")
+    for name, rules_data in RULE_SETS.items():
+        rules = AvailabilityRules.from_dict(rules_data).compile(SLOT_MINUTES)
+        for weeks in WINDOWS_WEEKS:
+            candidates = rules.candidate_slots(now, now + datetime.timedelta(weeks=weeks), now)
+            slots = [(start, end) for _, _, start, end in candidates]
+            full_bytes = json_size(full_response(slots))
+            compact_bytes = json_size(_compact_response(slots, SLOT_MINUTES))
+            print(f"{name:>15} {weeks:>6} {len(slots):>6} {full_bytes:>8} {compact_bytes:>10} "
+                  f"{full_bytes // 4:>9} {compact_bytes // 4:>12} {1 - compact_bytes / full_bytes:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: a burst of inquiries saved directly vs. through the write-behind queue.
+
+Saves --inquiries inquiries concurrently through AsyncFirestoreService, once
+with a direct set() per inquiry and once with the write-behind queue, and
+prints how long callers waited for their acknowledgement and how long it took
+until every inquiry was committed. Run it against the Firestore emulator:
+
+    gcloud emulators firestore start --host-port=localhost:8081
+    FIRESTORE_EMULATOR_HOST=localhost:8081 GOOGLE_CLOUD_PROJECT=demo-bookings \\
+        python -m benchmarks.write_behind_benchmark --inquiries 500
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from bookings_agent.firestore_service_async import AsyncFirestoreService
+from bookings_agent.firestore_write_behind import WriteBehindQueue
+
+
+async def save(service, index):
+    started = time.perf_counter()
+    await service.save_inquiry({"email": f"user{index}@example.com", "inquiry_text": "write-behind benchmark"})
+    return (time.perf_counter() - started) * 1000
+
+
+async def run(write_behind, count):
+    service = AsyncFirestoreService()
+    service.write_behind = WriteBehindQueue(service.client) if write_behind else None
+    started = time.perf_counter()
+    acks = await asyncio.gather(*(save(service, index) for index in range(count)))
+    acknowledged = time.perf_counter() - started
+    if service.write_behind is not None:
+        await service.write_behind.stop()
+    committed = time.perf_counter() - started
+    return acks, acknowledged, committed, service.write_behind.get_stats() if write_behind else None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Direct vs. write-behind inquiry writes")
+    parser.add_argument("--inquiries", type=int, default=500)
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("FIRESTORE_EMULATOR_HOST is not set; refusing to run against a real Firestore project.")
+
+    print(f"{'mode':<13} {'writes':>6} {'ack p50 ms':>11} {'ack p95 ms':>11} {'acked s':>8} {'committed s':>12} {'batches':>8}")
+    for mode, write_behind in [('direct', False), ('write-behind', True)]:
+        acks, acknowledged, committed, stats = await run(write_behind, args.inquiries)
+        p95 = statistics.quantiles(acks, n=20)[-1]
+        batches = stats['batches'] if stats else args.inquiries
+        print(f"{mode:<13} {args.inquiries:>6} {statistics.median(acks):>11.2f} {p95:>11.2f} "
+              f"{acknowledged:>8.2f} {committed:>12.2f} {batches:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
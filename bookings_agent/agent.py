@@ -5,7 +5,15 @@ from typing import Optional
 
 from bookings_agent.models import DEFAULT_MODEL
 from bookings_agent.prompts import ROOT_AGENT_PROMPT
-from bookings_agent.tools.google_calendar import create_event, get_all_available_slots
+# Async calendar tools: Calendar HTTP calls run on the event loop instead of blocking a worker thread
+from bookings_agent.tools.google_calendar_async import (
+    book_sessions,
+    create_event,
+    get_all_available_slots,
+    get_next_available_slots,
+    hold_slot,
+    release_slot_holds,
+)
 from bookings_agent.sub_agents.booking_validator import booking_validator_agent
 from bookings_agent.sub_agents.inquiry_collector import inquiry_collector_agent
 from bookings_agent.sub_agents.info_agent import info_agent
@@ -41,7 +49,11 @@ root_agent = LlmAgent(
     ],
     tools=[
         FunctionTool(create_event),
+        FunctionTool(book_sessions),
         FunctionTool(get_all_available_slots),
+        FunctionTool(get_next_available_slots),
+        FunctionTool(hold_slot),
+        FunctionTool(release_slot_holds),
         FunctionTool(validate_email),
         FunctionTool(current_year),
         AgentTool(intent_extractor_agent),
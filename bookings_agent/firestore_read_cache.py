@@ -0,0 +1,212 @@
+"""
+Read-through cache for single-document reads (get_task, get_memory, get_session).
+
+A conversation often reads the same session document several times, and each
+read was a Firestore round trip. FirestoreService and AsyncFirestoreService
+look documents up here first, keyed by document path. Entries are kept for
+FIRESTORE_READ_CACHE_TTL_SECONDS and the least recently used ones are evicted
+beyond FIRESTORE_READ_CACHE_SIZE entries. Every write made through either
+service invalidates the document's entry, and a read that raced with such a
+write is not cached.
+
+Writes made by other instances are only seen once the entry expires, unless
+FIRESTORE_READ_CACHE_LISTEN=true: then every cached document gets an
+on_snapshot listener (one Listen stream each) that drops the entry when the
+document changes, and reads served from the entry after that change are
+counted as stale reads.
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# FIRESTORE_READ_CACHE_SIZE=0 disables the cache
+READ_CACHE_SIZE = int(os.getenv("FIRESTORE_READ_CACHE_SIZE", "1024"))
+READ_CACHE_TTL_SECONDS = float(os.getenv("FIRESTORE_READ_CACHE_TTL_SECONDS", "30"))
+READ_CACHE_LISTEN = os.getenv("FIRESTORE_READ_CACHE_LISTEN", "false").lower() == "true"
+# Hit times kept per entry to count stale reads
+MAX_HIT_TIMES = 100
+
+# Returned by get() when the document is not cached (None is a cached "not found")
+MISS = object()
+
+
+class _Entry:
+    __slots__ = ('value', 'update_time', 'expires_at', 'hit_times', 'watch')
+
+    def __init__(self, value: Optional[Dict[str, Any]], update_time, expires_at: float):
+        self.value = value
+        self.update_time = update_time
+        self.expires_at = expires_at
+        self.hit_times: List[float] = []
+        self.watch = None
+
+
+class ReadCache:
+    """LRU + TTL cache of documents by path, safe to use from threads and coroutines."""
+
+    def __init__(self, max_size: int = READ_CACHE_SIZE, ttl_seconds: float = READ_CACHE_TTL_SECONDS,
+                 listen: bool = READ_CACHE_LISTEN):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.listen = listen
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        # path -> invalidations seen while a read of it was in flight
+        self._reads: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'remote_changes': 0,
+            'stale_reads': 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, path: str) -> Any:
+        """
+        Return a copy of the cached document (or None if it was cached as missing),
+        or MISS. After a MISS, call fill() with what was read.
+        """
+        if not self.enabled:
+            return MISS
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.expires_at <= now:
+                self._drop(path)
+                self._counters['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._counters['misses'] += 1
+                reading = self._reads.setdefault(path, [0, 0])
+                reading[0] += 1
+                return MISS
+            self._counters['hits'] += 1
+            self._entries.move_to_end(path)
+            if self.listen:
+                entry.hit_times = entry.hit_times[-(MAX_HIT_TIMES - 1):] + [time.time()]
+            # Deep copy: callers may mutate nested fields of what they read
+            return copy.deepcopy(entry.value)
+
+    def fill(self, path: str, value: Optional[Dict[str, Any]], update_time=None, ref=None) -> None:
+        """
+        Cache what a read after a MISS returned, unless the document was written meanwhile.
+
+        Args:
+            update_time: The snapshot's update_time, compared with listener updates
+            ref: A DocumentReference of the sync client, to listen on when listening is on
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            reading = self._reads.get(path)
+            if reading is None:
+                return
+            raced = reading[1] > 0
+            reading[0] -= 1
+            if reading[0] <= 0:
+                del self._reads[path]
+            if raced:
+                return
+            self._drop(path)
+            entry = self._entries[path] = _Entry(
+                copy.deepcopy(value), update_time, time.monotonic() + self.ttl_seconds)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+        if self.listen and ref is not None:
+            self._watch(path, entry, ref)
+
+    def abandon(self, path: str) -> None:
+        """Forget an in-flight read that failed or was cancelled (after a MISS); always call fill() or this."""
+        with self._lock:
+            reading = self._reads.get(path)
+            if reading is not None:
+                reading[0] -= 1
+                if reading[0] <= 0:
+                    del self._reads[path]
+
+    def invalidate(self, path: str) -> None:
+        """Drop a document's entry; called for every write made through the services."""
+        if not self.enabled:
+            return
+        with self._lock:
+            reading = self._reads.get(path)
+            if reading is not None:
+                reading[1] += 1
+            if path in self._entries:
+                self._drop(path)
+                self._counters['invalidations'] += 1
+
+    def _drop(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None and entry.watch is not None:
+            # Unsubscribing joins the listener thread, so never do it while holding the lock
+            threading.Thread(target=entry.watch.unsubscribe, daemon=True).start()
+
+    def _watch(self, path: str, entry: _Entry, ref) -> None:
+        def on_snapshot(docs, changes, read_time):
+            docs = docs if isinstance(docs, list) else [docs]
+            for doc in docs:
+                update_time = doc.update_time if doc.exists else None
+                if update_time == entry.update_time:
+                    continue
+                with self._lock:
+                    if self._entries.get(path) is not entry:
+                        return
+                    changed_at = update_time.timestamp() if update_time is not None else read_time.timestamp()
+                    self._counters['stale_reads'] += sum(hit > changed_at for hit in entry.hit_times)
+                    self._counters['remote_changes'] += 1
+                    self._drop(path)
+                return
+
+        try:
+            watch = ref.on_snapshot(on_snapshot)
+        except Exception as e:
+            print(f"[read_cache] Could not listen to {path}: {e}")
+            return
+        with self._lock:
+            if self._entries.get(path) is entry:
+                entry.watch = watch
+                return
+        # Dropped before the listener was attached
+        watch.unsubscribe()
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in list(self._entries):
+                self._drop(path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit ratio, stale-read and eviction counters for monitoring."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats['size'] = len(self._entries)
+            stats['listeners'] = sum(entry.watch is not None for entry in self._entries.values())
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else None
+        stats['enabled'] = self.enabled
+        return stats
+
+
+_cache: Optional[ReadCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_read_cache() -> ReadCache:
+    """Return the process-wide read cache shared by the sync and async services."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReadCache()
+    return _cache
@@ -1,32 +1,356 @@
+import base64
+import json
 import os
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from google.cloud import firestore
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from google.cloud.firestore_v1.transforms import Sentinel
 from google.cloud.firestore_v1 import SERVER_TIMESTAMP
 
-def sanitize_sentinel(data: Any) -> Any:
+from bookings_agent.firestore_read_cache import MISS, get_read_cache
+
+# Optional overrides for the shared client; by default the project comes from the environment
+FIRESTORE_PROJECT = os.getenv("FIRESTORE_PROJECT") or None
+FIRESTORE_DATABASE = os.getenv("FIRESTORE_DATABASE") or None
+FIRESTORE_API_ENDPOINT = os.getenv("FIRESTORE_API_ENDPOINT") or None
+# Multi-tag memory queries read pages of this many times the requested limit...
+MEMORY_TAG_OVERFETCH = int(os.getenv("MEMORY_TAG_OVERFETCH", "5"))
+MEMORY_TAG_MIN_PAGE_SIZE = 50
+# ...and stop after this many documents, even with fewer matches than requested
+MEMORY_TAG_MAX_READS = int(os.getenv("MEMORY_TAG_MAX_READS", "1000"))
+# Default page size of page_tasks() and page_memories()
+LIST_PAGE_SIZE = int(os.getenv("FIRESTORE_LIST_PAGE_SIZE", "100"))
+# Operations write_batch() accepts (a WriteBatch cannot read) and how many it commits at once
+BATCH_OPERATIONS = ("save_task", "update_task", "delete_task", "memorize", "update_memory", "delete_memory",
+                    "save_session", "update_session", "save_inquiry")
+MAX_BATCH_WRITES = 500
+
+# Values sanitize_sentinel() never has to look inside (exact types, checked first as the cheapest test)
+_SANITIZE_LEAF_TYPES = frozenset((str, int, float, bool, bytes, datetime, type(None)))
+_SANITIZE_LEAVES = tuple(_SANITIZE_LEAF_TYPES)
+
+def sanitize_sentinel(data: Any, in_place: bool = False) -> Any:
     """
     Convert Firestore Sentinel objects (like SERVER_TIMESTAMP) to serializable formats.
     
+    Works through dicts, lists, tuples and sets in one pass, copying only the
+    containers on the path to a Sentinel: data without one is returned as it
+    is. Datetimes and other scalars are left unchanged.
+    
     Args:
         data: The data that might contain Sentinel objects
+        in_place: Replace Sentinels inside the given dicts, lists and sets instead
+            of copying them (tuples are still rebuilt)
         
     Returns:
         Serializable data with Sentinels replaced
     """
+    if type(data) in _SANITIZE_LEAF_TYPES or isinstance(data, _SANITIZE_LEAVES):
+        return data
     if isinstance(data, Sentinel):
         return "<SERVER_TIMESTAMP>"
-    elif isinstance(data, dict):
-        return {k: sanitize_sentinel(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_sentinel(item) for item in data]
+    if isinstance(data, dict):
+        changed = None
+        for key, value in data.items():
+            if type(value) in _SANITIZE_LEAF_TYPES:
+                continue
+            clean = sanitize_sentinel(value, in_place)
+            if clean is not value:
+                if changed is None:
+                    changed = {}
+                changed[key] = clean
+        if changed is None:
+            return data
+        result = data if in_place else dict(data)
+        result.update(changed)
+        return result
+    if isinstance(data, list):
+        result = data
+        for index, value in enumerate(data):
+            if type(value) in _SANITIZE_LEAF_TYPES:
+                continue
+            clean = sanitize_sentinel(value, in_place)
+            if clean is not value:
+                if result is data and not in_place:
+                    result = list(data)
+                result[index] = clean
+        return result
+    if isinstance(data, (tuple, set, frozenset)):
+        items = [sanitize_sentinel(value, in_place) for value in data]
+        if all(clean is value for clean, value in zip(items, data)):
+            return data
+        if isinstance(data, tuple):
+            # Named tuples are rebuilt with _make()
+            return data._make(items) if hasattr(data, "_make") else tuple(items)
+        if in_place and isinstance(data, set):
+            data.clear()
+            data.update(items)
+            return data
+        return type(data)(items)
+    return data
+
+def _client_kwargs() -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {}
+    if FIRESTORE_PROJECT:
+        kwargs["project"] = FIRESTORE_PROJECT
+    if FIRESTORE_DATABASE:
+        kwargs["database"] = FIRESTORE_DATABASE
+    if FIRESTORE_API_ENDPOINT:
+        kwargs["client_options"] = {"api_endpoint": FIRESTORE_API_ENDPOINT}
+    return kwargs
+
+def create_firestore_client() -> firestore.Client:
+    """Create a Firestore client with the FIRESTORE_* settings."""
+    return firestore.Client(**_client_kwargs())
+
+def close_firestore_client(client) -> Any:
+    """
+    Close a client's gRPC channel, if it has opened one.
+    
+    Returns:
+        None, or an awaitable for an AsyncClient's channel
+    """
+    transport = getattr(client, "_transport", None)
+    return transport.close() if transport is not None else None
+
+# Document and query building shared by FirestoreService and AsyncFirestoreService
+def _document_data(doc) -> Dict[str, Any]:
+    """A document's data with its ID, with any Sentinel objects sanitized."""
+    data = doc.to_dict()
+    data["id"] = doc.id
+    return sanitize_sentinel(data, in_place=True)
+
+def _prepare_record(collection, data: Dict[str, Any], record_id: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Copy data for a merge write, with a new document ID when record_id is empty,
+    created_at (unless given) and updated_at.
+    """
+    # Create a copy of the data to avoid modifying the original
+    data_copy = data.copy()
+    if not record_id:
+        record_id = collection.document().id
+        data_copy["id"] = record_id
+    if "created_at" not in data_copy:
+        data_copy["created_at"] = SERVER_TIMESTAMP
+    # Always update updated_at
+    data_copy["updated_at"] = SERVER_TIMESTAMP
+    return record_id, data_copy
+
+def _prepare_updates(updates: Dict[str, Any]) -> Dict[str, Any]:
+    # Create a copy of updates to avoid modifying the original
+    updates_copy = updates.copy()
+    updates_copy["updated_at"] = SERVER_TIMESTAMP
+    return updates_copy
+
+def _tasks_query(collection, filters: Optional[Dict[str, Any]]) -> Tuple[Any, int]:
+    """Build the tasks query, without its limit. Returns the query and the number of tasks wanted."""
+    query = collection
+    if filters:
+        if "user_id" in filters:
+            query = query.where("user_id", "==", filters["user_id"])
+        if "session_id" in filters:
+            query = query.where("session_id", "==", filters["session_id"])
+        if "status" in filters:
+            query = query.where("status", "==", filters["status"])
+            
+        limit = filters.get("limit", 20)
     else:
-        return data
+        limit = 20
+        
+    return query.order_by("created_at", direction=firestore.Query.DESCENDING), limit
+
+def _memories_query(collection, filters: Optional[Dict[str, Any]]) -> Tuple[Any, int, List[str]]:
+    """
+    Build the memories query, without its limit.
+    
+    Returns:
+        The query, the number of memories wanted and the tags that still have to be
+        checked per document (a query accepts only one array_contains filter)
+    """
+    query = collection
+    extra_tags: List[str] = []
+    if filters:
+        if "type" in filters:
+            query = query.where("type", "==", filters["type"])
+            
+        tags = filters.get("tags")
+        if isinstance(tags, list) and tags:
+            query = query.where("tags", "array_contains", tags[0])
+            extra_tags = tags[1:]
+            
+        limit = filters.get("limit", 20)
+    else:
+        limit = 20
+        
+    return query.order_by("updated_at", direction=firestore.Query.DESCENDING), limit, extra_tags
+
+def _memory_page(query, limit: int, reads: int, last):
+    """
+    The next page of a multi-tag memories query: over-fetched, since only some
+    documents carry every tag, continued after the last document read and
+    capped so no query reads more than MEMORY_TAG_MAX_READS documents.
+    """
+    page_size = min(max(limit * MEMORY_TAG_OVERFETCH, MEMORY_TAG_MIN_PAGE_SIZE), MEMORY_TAG_MAX_READS - reads)
+    query = query.limit(page_size)
+    return (query.start_after(last) if last is not None else query), page_size
+
+def _tagged_memories(docs, tags: List[str]) -> List[Dict[str, Any]]:
+    results = []
+    for doc in docs:
+        data = doc.to_dict()
+        if all(tag in data.get("tags", []) for tag in tags):
+            data["id"] = doc.id
+            results.append(sanitize_sentinel(data, in_place=True))
+    return results
+
+def _encode_page_token(order_value: Any, doc_id: str) -> str:
+    """Opaque token for the position after a document: its order-by value and ID."""
+    if isinstance(order_value, datetime):
+        order_value = {"ts": order_value.isoformat()}
+    cursor = json.dumps([order_value, doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(cursor.encode()).decode().rstrip("=")
+
+def _decode_page_token(page_token: str, order_field: str) -> Dict[str, Any]:
+    """The start_after() cursor of a token from _encode_page_token()."""
+    try:
+        padded = page_token + "=" * (-len(page_token) % 4)
+        order_value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid page token: {page_token!r}") from e
+    if isinstance(order_value, dict) and "ts" in order_value:
+        order_value = datetime.fromisoformat(order_value["ts"])
+    return {order_field: order_value, firestore.FieldPath.document_id(): doc_id}
+
+def _page_query(query, order_field: str, page_size: int, fields: Optional[List[str]], page_token: Optional[str]):
+    """
+    One page of a query ordered by order_field: tie-broken by document ID so a
+    token always points at one position, projected to fields plus order_field
+    (needed for the next token), and continued after page_token.
+    """
+    query = query.order_by(firestore.FieldPath.document_id(), direction=firestore.Query.DESCENDING)
+    if fields:
+        query = query.select(sorted(set(fields) | {order_field}))
+    if page_token:
+        query = query.start_after(_decode_page_token(page_token, order_field))
+    return query.limit(page_size)
+
+def _page_results(docs, order_field: str, page_size: int, fields: Optional[List[str]],
+                  tags: List[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    The documents of a page (those carrying every tag in tags) and the token
+    for the next page, or None when this page was the last.
+    """
+    results = []
+    for doc in docs:
+        data = doc.to_dict()
+        if not all(tag in data.get("tags", []) for tag in tags):
+            continue
+        if fields and order_field not in fields:
+            data.pop(order_field, None)
+        data["id"] = doc.id
+        results.append(sanitize_sentinel(data, in_place=True))
+    if len(docs) < page_size:
+        return results, None
+    last = docs[-1]
+    return results, _encode_page_token(last.get(order_field), last.id)
+
+def _sessions_collection(client, user_id: str):
+    return client.collection("users").document(user_id).collection("sessions")
+
+def _inquiry_record(args: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'email': args.get('email', ''),
+        'inquiry_text': args.get('inquiry_text', ''),
+        'category': args.get('category', 'General question'),
+        'conversation_context': args.get('conversation_context', ''),
+        'status': args.get('status', 'new'),
+        'timestamp': firestore.SERVER_TIMESTAMP,
+        'user_id': args.get('user_id', ''),
+        'session_id': args.get('session_id', '')
+    }
+
+def _inquiry_saved(inquiry_id: str) -> Dict[str, Any]:
+    return {
+        'success': True,
+        'data': {
+            'inquiry_id': inquiry_id,
+            'message': 'Inquiry saved successfully'
+        }
+    }
+
+def _inquiry_failed(e: Exception) -> Dict[str, Any]:
+    print(f"Error saving inquiry: {e}")
+    return {
+        'success': False,
+        'error': f"Failed to save inquiry: {str(e)}"
+    }
+
+def _batch_required(index: int, operation: str, args: Dict[str, Any], *keys: str) -> List[Any]:
+    missing = [key for key in keys if not args.get(key)]
+    if missing:
+        raise ValueError(f"operations[{index}] ({operation}): {', '.join(missing)} required")
+    return [args[key] for key in keys]
+
+def _batch_writes(client, tasks_collection, memories_collection,
+                  writes: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Any, Optional[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    Validate and build every write of a write_batch() before anything is committed.
+    
+    Returns:
+        Per write: the batch method ("merge", "set", "update" or "delete"), the
+        document reference, the data and the write's result
+    """
+    if not writes:
+        raise ValueError("No operations to write")
+    if len(writes) > MAX_BATCH_WRITES:
+        raise ValueError(f"At most {MAX_BATCH_WRITES} operations can be written at once, got {len(writes)}")
+    planned = []
+    for index, (operation, args) in enumerate(writes):
+        if operation not in BATCH_OPERATIONS:
+            raise ValueError(f"operations[{index}]: '{operation}' cannot be batched; "
+                             f"supported: {', '.join(BATCH_OPERATIONS)}")
+        if not isinstance(args, dict):
+            raise ValueError(f"operations[{index}] ({operation}): args must be an object")
+        if operation in ("save_task", "memorize"):
+            collection = tasks_collection if operation == "save_task" else memories_collection
+            record_id, data = _prepare_record(collection, args, args.get("id"))
+            key = "task_id" if operation == "save_task" else "memory_id"
+            planned.append(("merge", collection.document(record_id), data, {key: record_id}))
+        elif operation in ("update_task", "delete_task", "update_memory", "delete_memory"):
+            collection, key = (tasks_collection, "task_id") if operation.endswith("_task") else (memories_collection, "memory_id")
+            record_id, = _batch_required(index, operation, args, key)
+            if operation.startswith("update_"):
+                planned.append(("update", collection.document(record_id), _prepare_updates(args.get("updates") or {}), {}))
+            else:
+                planned.append(("delete", collection.document(record_id), None, {}))
+        elif operation == "save_session":
+            user_id, = _batch_required(index, operation, args, "user_id")
+            sessions_collection = _sessions_collection(client, user_id)
+            session_id, data = _prepare_record(sessions_collection, args, args.get("id") or args.get("session_id"))
+            planned.append(("merge", sessions_collection.document(session_id), data, {"session_id": session_id}))
+        elif operation == "update_session":
+            user_id, session_id = _batch_required(index, operation, args, "user_id", "session_id")
+            ref = _sessions_collection(client, user_id).document(session_id)
+            planned.append(("update", ref, _prepare_updates(args.get("updates") or {}), {}))
+        else:
+            inquiry_ref = client.collection('inquiries').document()
+            planned.append(("set", inquiry_ref, _inquiry_record(args), {"inquiry_id": inquiry_ref.id}))
+    return planned
+
+def _add_to_batch(batch, method: str, ref, data: Optional[Dict[str, Any]]) -> None:
+    if method == "merge":
+        batch.set(ref, data, merge=True)
+    elif method == "set":
+        batch.set(ref, data)
+    elif method == "update":
+        batch.update(ref, data)
+    else:
+        batch.delete(ref)
 
 class FirestoreService:
-    def __init__(self):
-        self.client = firestore.Client()
+    def __init__(self, client: Optional[firestore.Client] = None):
+        self.client = client if client is not None else create_firestore_client()
         self.memories_collection = self.client.collection("memories")
         self.tasks_collection = self.client.collection("tasks")
 
@@ -41,21 +365,10 @@ class FirestoreService:
         Returns:
             task_id: The ID of the created/updated task
         """
-        # Create a copy of the data to avoid modifying the original
-        task_data_copy = task_data.copy()
-        
-        task_id = task_data_copy.get("id")
-        if not task_id:
-            task_id = self.tasks_collection.document().id
-            task_data_copy["id"] = task_id
-            
-        if "created_at" not in task_data_copy:
-            task_data_copy["created_at"] = SERVER_TIMESTAMP
-        # Always update updated_at
-        task_data_copy["updated_at"] = SERVER_TIMESTAMP
-        
-        # Set without using SERVER_TIMESTAMP
-        self.tasks_collection.document(task_id).set(task_data_copy, merge=True)
+        task_id, task_data_copy = _prepare_record(self.tasks_collection, task_data, task_data.get("id"))
+        ref = self.tasks_collection.document(task_id)
+        ref.set(task_data_copy, merge=True)
+        get_read_cache().invalidate(ref.path)
         return task_id
 
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
@@ -68,13 +381,7 @@ class FirestoreService:
         Returns:
             Task document or None if not found
         """
-        doc = self.tasks_collection.document(task_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            data["id"] = doc.id
-            # Sanitize any Sentinel objects before returning
-            return sanitize_sentinel(data)
-        return None
+        return self._cached_get(self.tasks_collection.document(task_id))
         
     def update_task(self, task_id: str, updates: Dict[str, Any]) -> None:
         """
@@ -84,13 +391,9 @@ class FirestoreService:
             task_id: The ID of the task to update
             updates: Dictionary of fields to update
         """
-        # Create a copy of updates to avoid modifying the original
-        updates_copy = updates.copy()
-        
-        # Use current datetime instead of SERVER_TIMESTAMP
-        updates_copy["updated_at"] = SERVER_TIMESTAMP
-        
-        self.tasks_collection.document(task_id).update(updates_copy)
+        ref = self.tasks_collection.document(task_id)
+        ref.update(_prepare_updates(updates))
+        get_read_cache().invalidate(ref.path)
         
     def delete_task(self, task_id: str) -> None:
         """
@@ -99,7 +402,9 @@ class FirestoreService:
         Args:
             task_id: The ID of the task to delete
         """
-        self.tasks_collection.document(task_id).delete()
+        ref = self.tasks_collection.document(task_id)
+        ref.delete()
+        get_read_cache().invalidate(ref.path)
         
     def list_tasks(self, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
@@ -115,31 +420,27 @@ class FirestoreService:
         Returns:
             List of task documents
         """
-        query = self.tasks_collection
-        
-        if filters:
-            if "user_id" in filters:
-                query = query.where("user_id", "==", filters["user_id"])
-            if "session_id" in filters:
-                query = query.where("session_id", "==", filters["session_id"])
-            if "status" in filters:
-                query = query.where("status", "==", filters["status"])
-                
-            limit = filters.get("limit", 20)
-        else:
-            limit = 20
-            
-        query = query.order_by("created_at", direction=firestore.Query.DESCENDING).limit(limit)
+        query, limit = _tasks_query(self.tasks_collection, filters)
+        return [_document_data(doc) for doc in query.limit(limit).stream()]
+    
+    def page_tasks(self, filters: Optional[Dict[str, Any]] = None, page_size: int = LIST_PAGE_SIZE,
+                   fields: Optional[List[str]] = None,
+                   page_token: Optional[str] = None) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Page through every task matching the filters, newest first, one query per page.
         
-        # Include document IDs in the results
-        results = []
-        for doc in query.stream():
-            data = doc.to_dict()
-            data["id"] = doc.id
-            # Sanitize any Sentinel objects
-            results.append(sanitize_sentinel(data))
+        Args:
+            filters: The list_tasks() filters (its limit is ignored)
+            page_size: Number of tasks per page
+            fields: Only fetch these fields (plus id and created_at)
+            page_token: Continue after the page this token was yielded with
             
-        return results
+        Yields:
+            Each page of task documents, with the token that continues after it
+            (None after the last page)
+        """
+        query, _ = _tasks_query(self.tasks_collection, filters)
+        return self._pages(query, "created_at", page_size, fields, page_token, [])
 
     # MEMORY MANAGEMENT
     def memorize(self, memory_data: Dict[str, Any]) -> str:
@@ -155,19 +456,10 @@ class FirestoreService:
         Returns:
             The ID of the created memory document
         """
-        # Create a copy of the data to avoid modifying the original
-        memory_data_copy = memory_data.copy()
-        
-        memory_id = memory_data_copy.get("id")
-        if not memory_id:
-            memory_id = self.memories_collection.document().id
-            memory_data_copy["id"] = memory_id
-            
-        if "created_at" not in memory_data_copy:
-            memory_data_copy["created_at"] = SERVER_TIMESTAMP
-        memory_data_copy["updated_at"] = SERVER_TIMESTAMP
-        
-        self.memories_collection.document(memory_id).set(memory_data_copy, merge=True)
+        memory_id, memory_data_copy = _prepare_record(self.memories_collection, memory_data, memory_data.get("id"))
+        ref = self.memories_collection.document(memory_id)
+        ref.set(memory_data_copy, merge=True)
+        get_read_cache().invalidate(ref.path)
         return memory_id
     
     def get_memory(self, memory_id: str) -> Optional[Dict[str, Any]]:
@@ -180,13 +472,7 @@ class FirestoreService:
         Returns:
             The memory document or None if not found
         """
-        doc = self.memories_collection.document(memory_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            data["id"] = doc.id
-            # Sanitize any Sentinel objects
-            return sanitize_sentinel(data)
-        return None
+        return self._cached_get(self.memories_collection.document(memory_id))
     
     def update_memory(self, memory_id: str, updates: Dict[str, Any]) -> None:
         """
@@ -196,13 +482,9 @@ class FirestoreService:
             memory_id: The ID of the memory to update
             updates: Dictionary of fields to update
         """
-        # Create a copy of updates to avoid modifying the original
-        updates_copy = updates.copy()
-        
-        # Use current datetime instead of SERVER_TIMESTAMP
-        updates_copy["updated_at"] = SERVER_TIMESTAMP
-        
-        self.memories_collection.document(memory_id).update(updates_copy)
+        ref = self.memories_collection.document(memory_id)
+        ref.update(_prepare_updates(updates))
+        get_read_cache().invalidate(ref.path)
     
     def delete_memory(self, memory_id: str) -> None:
         """
@@ -211,7 +493,9 @@ class FirestoreService:
         Args:
             memory_id: The ID of the memory to delete
         """
-        self.memories_collection.document(memory_id).delete()
+        ref = self.memories_collection.document(memory_id)
+        ref.delete()
+        get_read_cache().invalidate(ref.path)
         
     def list_memories(self, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
@@ -226,34 +510,69 @@ class FirestoreService:
         Returns:
             List of memory documents
         """
-        query = self.memories_collection
+        return self.query_memories(filters)[0]
+    
+    def query_memories(self, filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        list_memories(), also returning the number of documents read.
         
-        if filters:
-            if "type" in filters:
-                query = query.where("type", "==", filters["type"])
-                
-            if "tags" in filters and isinstance(filters["tags"], list) and len(filters["tags"]) == 1:
-                query = query.where("tags", "array_contains", filters["tags"][0])
-                
-            limit = filters.get("limit", 20)
-        else:
-            limit = 20
-            
-        query = query.order_by("updated_at", direction=firestore.Query.DESCENDING).limit(limit)
+        The first tag is filtered by the query. With more tags, pages are read
+        after one another (start_after cursors) and checked for the other tags
+        until enough memories match, the memories run out, or
+        MEMORY_TAG_MAX_READS documents were read.
         
-        # Include document IDs in the results
-        results = []
-        for doc in query.stream():
-            data = doc.to_dict()
-            data["id"] = doc.id
-            # Sanitize any Sentinel objects
-            results.append(sanitize_sentinel(data))
-            
-        # If filtering by multiple tags, we need to do it after the query
-        if filters and "tags" in filters and isinstance(filters["tags"], list) and len(filters["tags"]) > 1:
-            results = [doc for doc in results if all(tag in doc.get("tags", []) for tag in filters["tags"])]
+        Returns:
+            Tuple of the memory documents and the number of documents read
+        """
+        query, limit, extra_tags = _memories_query(self.memories_collection, filters)
+        if not extra_tags:
+            results = [_document_data(doc) for doc in query.limit(limit).stream()]
+            return results, len(results)
+        
+        results, reads, last = [], 0, None
+        while len(results) < limit and reads < MEMORY_TAG_MAX_READS:
+            page, page_size = _memory_page(query, limit, reads, last)
+            docs = list(page.stream())
+            reads += len(docs)
+            results.extend(_tagged_memories(docs, extra_tags))
+            if len(docs) < page_size:
+                break
+            last = docs[-1]
+        return results[:limit], reads
+    
+    def page_memories(self, filters: Optional[Dict[str, Any]] = None, page_size: int = LIST_PAGE_SIZE,
+                      fields: Optional[List[str]] = None,
+                      page_token: Optional[str] = None) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Page through every memory matching the filters, most recently updated first.
+        
+        With several tags, page_size is the number of memories read per page, of
+        which only those carrying every tag are returned, so pages can be short or
+        empty before the last one.
+        
+        Args:
+            filters: The list_memories() filters (its limit is ignored)
+            page_size: Number of memories read per page
+            fields: Only fetch these fields (plus id and updated_at, and tags with several tags)
+            page_token: Continue after the page this token was yielded with
             
-        return results
+        Yields:
+            Each page of memory documents, with the token that continues after it
+            (None after the last page)
+        """
+        query, _, extra_tags = _memories_query(self.memories_collection, filters)
+        if fields and extra_tags:
+            fields = list(fields) + ["tags"]
+        return self._pages(query, "updated_at", page_size, fields, page_token, extra_tags)
+    
+    def _pages(self, query, order_field: str, page_size: int, fields: Optional[List[str]],
+               page_token: Optional[str], tags: List[str]) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        while True:
+            docs = list(_page_query(query, order_field, page_size, fields, page_token).stream())
+            results, page_token = _page_results(docs, order_field, page_size, fields, tags)
+            yield results, page_token
+            if page_token is None:
+                return
 
     # SESSIONS
     def save_session(self, user_id: str, session_data: Dict[str, Any]) -> str:
@@ -276,37 +595,319 @@ class FirestoreService:
         Returns:
             session_id: The ID of the created/updated session
         """
-        sessions_collection = self.client.collection("users").document(user_id).collection("sessions")
-        session_data_copy = session_data.copy()
-        
-        session_id = session_data_copy.get("id") or session_data_copy.get("session_id")
-        if not session_id:
-            session_id = sessions_collection.document().id
-            session_data_copy["id"] = session_id
-        
+        sessions_collection = _sessions_collection(self.client, user_id)
+        session_id, session_data_copy = _prepare_record(
+            sessions_collection, session_data, session_data.get("id") or session_data.get("session_id"))
         # Add user_id reference
         session_data_copy["user_id"] = user_id
         
-        # Add timestamps
-        if "created_at" not in session_data_copy:
-            session_data_copy["created_at"] = SERVER_TIMESTAMP
-        session_data_copy["updated_at"] = SERVER_TIMESTAMP
-        
         # Store the session data
-        sessions_collection.document(session_id).set(session_data_copy, merge=True)
+        ref = sessions_collection.document(session_id)
+        ref.set(session_data_copy, merge=True)
+        get_read_cache().invalidate(ref.path)
         return session_id
     
     def get_session(self, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve a session document.
         """
-        sessions_collection = self.client.collection("users").document(user_id).collection("sessions")
-        doc = sessions_collection.document(session_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            data["id"] = doc.id
-            return sanitize_sentinel(data)
-        return None
+        return self._cached_get(_sessions_collection(self.client, user_id).document(session_id))
+    
+    def update_session(self, user_id: str, session_id: str, updates: Dict[str, Any]) -> None:
+        """
+        Update fields of an existing session document.
+        
+        Args:
+            user_id: The user ID
+            session_id: ID of the session to update
+            updates: Dictionary of fields to update
+        """
+        ref = _sessions_collection(self.client, user_id).document(session_id)
+        ref.update(_prepare_updates(updates))
+        get_read_cache().invalidate(ref.path)
+    
+    def _cached_get(self, ref) -> Optional[Dict[str, Any]]:
+        """Read a document through the read cache (see firestore_read_cache)."""
+        cache = get_read_cache()
+        cached = cache.get(ref.path)
+        if cached is not MISS:
+            return cached
+        filled = False
+        try:
+            doc = ref.get()
+            data = _document_data(doc) if doc.exists else None
+            filled = True
+            cache.fill(ref.path, data, doc.update_time if doc.exists else None, ref)
+            return data
+        finally:
+            if not filled:
+                # Failed or interrupted: release the in-flight read
+                cache.abandon(ref.path)
+
+    # SLOT LEASES
+    def _slot_leases(self, calendar_id: str):
+        """Lease documents live under slot_leases/{calendar_id}/slots/{slot start epoch}."""
+        return self.client.collection("slot_leases").document(calendar_id.replace("/", "_")).collection("slots")
+
+    def acquire_slot_lease(
+        self,
+        calendar_id: str,
+        slot_start: int,
+        slot_end: int,
+        holder: str,
+        ttl_seconds: int
+    ) -> Dict[str, Any]:
+        """
+        Hold a slot for one holder (a conversation) using a transactional compare-and-set.
+        
+        The lease is granted when the slot has no lease, its lease has expired, or the
+        holder already owns it (which extends a held lease). Two holders racing for
+        the same slot cannot both succeed: Firestore retries the losing transaction,
+        which then sees the winner's lease.
+        
+        Args:
+            calendar_id: Calendar the slot belongs to
+            slot_start: Slot start in epoch seconds
+            slot_end: Slot end in epoch seconds
+            holder: Identifier of the holder, e.g. the session ID
+            ttl_seconds: How long the lease is held before it lapses
+            
+        Returns:
+            Dictionary with "acquired" plus the current lease's holder, status and expires_at
+        """
+        ref = self._slot_leases(calendar_id).document(str(int(slot_start)))
+        
+        @firestore.transactional
+        def acquire(transaction) -> Dict[str, Any]:
+            snapshot = ref.get(transaction=transaction)
+            now = datetime.now(timezone.utc)
+            lease = snapshot.to_dict() if snapshot.exists else None
+            if lease and lease["expires_at"] > now:
+                if lease["holder"] != holder:
+                    return {"acquired": False, "holder": lease["holder"], "status": lease["status"], "expires_at": lease["expires_at"]}
+                if lease["status"] == "confirmed":
+                    return {"acquired": True, "holder": holder, "status": "confirmed", "expires_at": lease["expires_at"]}
+            expires_at = now + timedelta(seconds=ttl_seconds)
+            transaction.set(ref, {
+                "calendar_id": calendar_id,
+                "slot_start": int(slot_start),
+                "slot_end": int(slot_end),
+                "holder": holder,
+                "status": "held",
+                "expires_at": expires_at,
+                "updated_at": SERVER_TIMESTAMP,
+            })
+            return {"acquired": True, "holder": holder, "status": "held", "expires_at": expires_at}
+        
+        return acquire(self.client.transaction())
+    
+    def confirm_slot_lease(self, calendar_id: str, slot_start: int, slot_end: int, holder: str, event_id: str) -> bool:
+        """
+        Mark a slot as booked once its calendar event exists.
+        
+        A confirmed lease stays until the slot has passed, which covers the time
+        before every availability cache has seen the new event.
+        
+        Returns:
+            False if another holder owns an unexpired lease on the slot
+        """
+        ref = self._slot_leases(calendar_id).document(str(int(slot_start)))
+        
+        @firestore.transactional
+        def confirm(transaction) -> bool:
+            snapshot = ref.get(transaction=transaction)
+            lease = snapshot.to_dict() if snapshot.exists else None
+            if lease and lease["holder"] != holder and lease["expires_at"] > datetime.now(timezone.utc):
+                return False
+            transaction.set(ref, {
+                "calendar_id": calendar_id,
+                "slot_start": int(slot_start),
+                "slot_end": int(slot_end),
+                "holder": holder,
+                "status": "confirmed",
+                "event_id": event_id,
+                "expires_at": datetime.fromtimestamp(slot_end, timezone.utc),
+                "updated_at": SERVER_TIMESTAMP,
+            })
+            return True
+        
+        return confirm(self.client.transaction())
+    
+    def release_slot_lease(self, calendar_id: str, slot_start: int, holder: str) -> bool:
+        """
+        Release a held (not yet confirmed) lease if it belongs to holder.
+        
+        Returns:
+            True if a lease was released
+        """
+        ref = self._slot_leases(calendar_id).document(str(int(slot_start)))
+        
+        @firestore.transactional
+        def release(transaction) -> bool:
+            snapshot = ref.get(transaction=transaction)
+            lease = snapshot.to_dict() if snapshot.exists else None
+            if not lease or lease["holder"] != holder or lease["status"] != "held":
+                return False
+            transaction.delete(ref)
+            return True
+        
+        return release(self.client.transaction())
+    
+    def release_slot_leases(self, calendar_id: str, holder: str, keep_slot_start: Optional[int] = None) -> int:
+        """
+        Release every held lease that belongs to holder, e.g. when its session ends.
+        
+        Args:
+            calendar_id: Calendar the leases belong to
+            holder: Identifier of the holder
+            keep_slot_start: Optional slot start whose lease should be kept
+            
+        Returns:
+            Number of leases released
+        """
+        query = self._slot_leases(calendar_id).where("holder", "==", holder)
+        released = 0
+        for doc in query.stream():
+            lease = doc.to_dict()
+            if lease.get("status") != "held" or lease.get("slot_start") == keep_slot_start:
+                continue
+            if self.release_slot_lease(calendar_id, lease["slot_start"], holder):
+                released += 1
+        return released
+    
+    def delete_slot_leases_for_events(self, calendar_id: str, event_ids: List[str]) -> int:
+        """
+        Delete the confirmed leases of bookings whose events were cancelled.
+        
+        Returns:
+            Number of leases deleted
+        """
+        deleted = 0
+        # "in" filters accept at most 30 values
+        for offset in range(0, len(event_ids), 30):
+            query = self._slot_leases(calendar_id).where("event_id", "in", event_ids[offset:offset + 30])
+            for doc in query.stream():
+                doc.reference.delete()
+                deleted += 1
+        return deleted
+    
+    def list_slot_leases(self, calendar_id: str, start_ts: float, end_ts: float) -> List[Dict[str, Any]]:
+        """
+        List the unexpired leases on slots overlapping [start_ts, end_ts).
+        
+        Only a single-field range on slot_end is queried, so no composite index is needed.
+        """
+        now = datetime.now(timezone.utc)
+        query = self._slot_leases(calendar_id).where("slot_end", ">", start_ts)
+        results = []
+        for doc in query.stream():
+            lease = doc.to_dict()
+            if lease["slot_start"] < end_ts and lease["expires_at"] > now:
+                results.append(sanitize_sentinel(lease, in_place=True))
+        return results
+    
+    def watch_slot_leases(self, calendar_id: str, since_ts: float, callback):
+        """
+        Listen to the leases on slots ending after since_ts.
+        
+        Args:
+            callback: Called as callback(docs, changes, read_time) with every matching lease document
+            
+        Returns:
+            The Watch; call unsubscribe() to stop listening
+        """
+        return self._slot_leases(calendar_id).where("slot_end", ">", since_ts).on_snapshot(callback)
+
+    # AVAILABILITY SNAPSHOTS
+    def _availability_snapshot(self, key: str):
+        return self.client.collection("availability_snapshots").document(key)
+    
+    def get_availability_snapshot(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the shared availability snapshot document for a calendar.
+        
+        Args:
+            key: Document key, the calendar ID
+            
+        Returns:
+            The snapshot document (version, built_at, expires_at, invalidated_at, data fields) or None
+        """
+        doc = self._availability_snapshot(key).get()
+        return doc.to_dict() if doc.exists else None
+    
+    def mark_availability_snapshot_stale(self, key: str) -> None:
+        """
+        Record that the calendar changed, so snapshots built before now are no longer served.
+        
+        A plain merge write: every instance that sees a change may call it, and the
+        latest timestamp wins.
+        """
+        self._availability_snapshot(key).set(
+            {"invalidated_at": datetime.now(timezone.utc).timestamp()}, merge=True)
+    
+    def claim_availability_snapshot_refresh(self, key: str, instance_id: str, claim_seconds: int) -> Optional[int]:
+        """
+        Claim the right to rebuild the shared snapshot, so only one instance calls the Calendar API.
+        
+        Args:
+            key: Document key, the calendar ID
+            instance_id: Identifier of the claiming instance
+            claim_seconds: How long the claim holds before another instance may take over
+            
+        Returns:
+            The snapshot version the rebuild must be saved against, or None if another
+            instance holds an unexpired claim
+        """
+        ref = self._availability_snapshot(key)
+        
+        @firestore.transactional
+        def claim(transaction) -> Optional[int]:
+            snapshot = ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else {}
+            now = datetime.now(timezone.utc).timestamp()
+            if current.get("refreshing_until", 0) > now and current.get("refreshing_by") != instance_id:
+                return None
+            transaction.set(ref, {
+                "refreshing_by": instance_id,
+                "refreshing_until": now + claim_seconds,
+            }, merge=True)
+            return current.get("version", 0)
+        
+        return claim(self.client.transaction())
+    
+    def save_availability_snapshot(self, key: str, data: Dict[str, Any], expected_version: int) -> Optional[int]:
+        """
+        Save a rebuilt snapshot if nobody saved another one since it was claimed.
+        
+        Args:
+            key: Document key, the calendar ID
+            data: Serialized snapshot fields
+            expected_version: Version returned by claim_availability_snapshot_refresh()
+            
+        Returns:
+            The new version, or None if the document's version moved on (the write is skipped)
+        """
+        ref = self._availability_snapshot(key)
+        
+        @firestore.transactional
+        def save(transaction) -> Optional[int]:
+            snapshot = ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else {}
+            if current.get("version", 0) != expected_version:
+                return None
+            version = expected_version + 1
+            # invalidated_at is kept, so a change made during the rebuild still marks it stale
+            transaction.set(ref, {
+                **data,
+                "version": version,
+                "invalidated_at": current.get("invalidated_at", 0),
+                "refreshing_by": None,
+                "refreshing_until": 0,
+                "updated_at": SERVER_TIMESTAMP,
+            })
+            return version
+        
+        return save(self.client.transaction())
 
     def save_inquiry(self, args):
         """
@@ -326,33 +927,69 @@ class FirestoreService:
             Dictionary with success status and ID of created document
         """
         try:
-            # Prepare data
-            inquiry_data = {
-                'email': args.get('email', ''),
-                'inquiry_text': args.get('inquiry_text', ''),
-                'category': args.get('category', 'General question'),
-                'conversation_context': args.get('conversation_context', ''),
-                'status': args.get('status', 'new'),
-                'timestamp': firestore.SERVER_TIMESTAMP,
-                'user_id': args.get('user_id', ''),
-                'session_id': args.get('session_id', '')
-            }
-            
             # Create document in inquiries collection
             inquiry_ref = self.client.collection('inquiries').document()
-            inquiry_ref.set(inquiry_data)
-            
-            return {
-                'success': True,
-                'data': {
-                    'inquiry_id': inquiry_ref.id,
-                    'message': 'Inquiry saved successfully'
-                }
-            }
-            
+            inquiry_ref.set(_inquiry_record(args))
+            return _inquiry_saved(inquiry_ref.id)
         except Exception as e:
-            print(f"Error saving inquiry: {e}")
-            return {
-                'success': False,
-                'error': f"Failed to save inquiry: {str(e)}"
-            }
\ No newline at end of file
+            return _inquiry_failed(e)
+
+    # BATCHES
+    def write_batch(self, writes: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Commit several writes atomically in one WriteBatch: all of them or none.
+        
+        Every write is validated before anything is sent, so an invalid one
+        raises ValueError without writing. An update of a missing document fails
+        the whole batch.
+        
+        Args:
+            writes: (operation, args) pairs, operation one of BATCH_OPERATIONS and
+                args what the matching method takes (task or memory data for
+                save_task/memorize; task_id/memory_id, plus updates, for the
+                update and delete operations; session data with user_id for
+                save_session; user_id, session_id and updates for update_session;
+                the inquiry for save_inquiry)
+            
+        Returns:
+            Per write, in order: {"task_id"}, {"memory_id"}, {"session_id"} or
+            {"inquiry_id"} for saves, {} otherwise
+        """
+        planned = _batch_writes(self.client, self.tasks_collection, self.memories_collection, writes)
+        batch = self.client.batch()
+        for method, ref, data, _ in planned:
+            _add_to_batch(batch, method, ref, data)
+        batch.commit()
+        cache = get_read_cache()
+        for _, ref, _, _ in planned:
+            cache.invalidate(ref.path)
+        return [result for _, _, _, result in planned]
+
+
+_service: Optional[FirestoreService] = None
+_service_lock = threading.Lock()
+
+
+def get_firestore_service() -> FirestoreService:
+    """
+    Return the process-wide FirestoreService, creating it on first use.
+    
+    The underlying client keeps one gRPC channel (and its credentials) open and
+    multiplexes concurrent calls over it, so tools share it rather than paying
+    for a new channel and auth handshake on every call.
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = FirestoreService()
+    return _service
+
+
+def close_firestore_service() -> None:
+    """Close the shared client's channel (call on shutdown); the next call creates a new one."""
+    global _service
+    with _service_lock:
+        service, _service = _service, None
+    if service is not None:
+        close_firestore_client(service.client)
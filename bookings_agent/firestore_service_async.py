@@ -0,0 +1,273 @@
+"""
+Asyncio-native counterpart of FirestoreService.
+
+AsyncFirestoreService has the same task, memory, session and inquiry methods
+(same arguments and results) as FirestoreService, but awaits Firestore's
+AsyncClient, so many conversations can do Firestore I/O on one event loop
+without holding a worker thread each. Documents and queries are built by the
+same helpers as in firestore_service.
+
+With FIRESTORE_WRITE_BEHIND=true, save_inquiry and save_session hand their
+write to a WriteBehindQueue (see firestore_write_behind) and return at once.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from google.cloud import firestore
+
+from bookings_agent.firestore_read_cache import MISS, get_read_cache
+from bookings_agent.firestore_service import (
+    LIST_PAGE_SIZE,
+    MEMORY_TAG_MAX_READS,
+    _add_to_batch,
+    _batch_writes,
+    _client_kwargs,
+    _document_data,
+    _inquiry_failed,
+    _inquiry_record,
+    _inquiry_saved,
+    _memories_query,
+    _memory_page,
+    _page_query,
+    _page_results,
+    _prepare_record,
+    _prepare_updates,
+    _sessions_collection,
+    _tagged_memories,
+    _tasks_query,
+    close_firestore_client,
+    get_firestore_service,
+)
+from bookings_agent.firestore_write_behind import WRITE_BEHIND_ENABLED, WriteBehindQueue
+
+
+def create_async_firestore_client() -> firestore.AsyncClient:
+    """Create a Firestore AsyncClient with the FIRESTORE_* settings."""
+    return firestore.AsyncClient(**_client_kwargs())
+
+
+class AsyncFirestoreService:
+    def __init__(self, client: Optional[firestore.AsyncClient] = None):
+        self.client = client if client is not None else create_async_firestore_client()
+        self.memories_collection = self.client.collection("memories")
+        self.tasks_collection = self.client.collection("tasks")
+        self.write_behind: Optional[WriteBehindQueue] = WriteBehindQueue(self.client) if WRITE_BEHIND_ENABLED else None
+
+    # TASKS
+    async def save_task(self, task_data: Dict[str, Any]) -> str:
+        """Async variant of FirestoreService.save_task()."""
+        task_id, task_data_copy = _prepare_record(self.tasks_collection, task_data, task_data.get("id"))
+        ref = self.tasks_collection.document(task_id)
+        await ref.set(task_data_copy, merge=True)
+        get_read_cache().invalidate(ref.path)
+        return task_id
+
+    async def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Async variant of FirestoreService.get_task()."""
+        return await self._cached_get(self.tasks_collection.document(task_id))
+
+    async def update_task(self, task_id: str, updates: Dict[str, Any]) -> None:
+        """Async variant of FirestoreService.update_task()."""
+        ref = self.tasks_collection.document(task_id)
+        await ref.update(_prepare_updates(updates))
+        get_read_cache().invalidate(ref.path)
+
+    async def delete_task(self, task_id: str) -> None:
+        """Async variant of FirestoreService.delete_task()."""
+        ref = self.tasks_collection.document(task_id)
+        await ref.delete()
+        get_read_cache().invalidate(ref.path)
+
+    async def list_tasks(self, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Async variant of FirestoreService.list_tasks()."""
+        query, limit = _tasks_query(self.tasks_collection, filters)
+        return [_document_data(doc) async for doc in query.limit(limit).stream()]
+
+    def page_tasks(self, filters: Optional[Dict[str, Any]] = None, page_size: int = LIST_PAGE_SIZE,
+                   fields: Optional[List[str]] = None,
+                   page_token: Optional[str] = None) -> AsyncIterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """Async variant of FirestoreService.page_tasks(), iterated with async for."""
+        query, _ = _tasks_query(self.tasks_collection, filters)
+        return self._pages(query, "created_at", page_size, fields, page_token, [])
+
+    # MEMORY MANAGEMENT
+    async def memorize(self, memory_data: Dict[str, Any]) -> str:
+        """Async variant of FirestoreService.memorize()."""
+        memory_id, memory_data_copy = _prepare_record(self.memories_collection, memory_data, memory_data.get("id"))
+        ref = self.memories_collection.document(memory_id)
+        await ref.set(memory_data_copy, merge=True)
+        get_read_cache().invalidate(ref.path)
+        return memory_id
+
+    async def get_memory(self, memory_id: str) -> Optional[Dict[str, Any]]:
+        """Async variant of FirestoreService.get_memory()."""
+        return await self._cached_get(self.memories_collection.document(memory_id))
+
+    async def update_memory(self, memory_id: str, updates: Dict[str, Any]) -> None:
+        """Async variant of FirestoreService.update_memory()."""
+        ref = self.memories_collection.document(memory_id)
+        await ref.update(_prepare_updates(updates))
+        get_read_cache().invalidate(ref.path)
+
+    async def delete_memory(self, memory_id: str) -> None:
+        """Async variant of FirestoreService.delete_memory()."""
+        ref = self.memories_collection.document(memory_id)
+        await ref.delete()
+        get_read_cache().invalidate(ref.path)
+
+    async def list_memories(self, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Async variant of FirestoreService.list_memories()."""
+        return (await self.query_memories(filters))[0]
+
+    async def query_memories(self, filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Async variant of FirestoreService.query_memories()."""
+        query, limit, extra_tags = _memories_query(self.memories_collection, filters)
+        if not extra_tags:
+            results = [_document_data(doc) async for doc in query.limit(limit).stream()]
+            return results, len(results)
+
+        results, reads, last = [], 0, None
+        while len(results) < limit and reads < MEMORY_TAG_MAX_READS:
+            page, page_size = _memory_page(query, limit, reads, last)
+            docs = [doc async for doc in page.stream()]
+            reads += len(docs)
+            results.extend(_tagged_memories(docs, extra_tags))
+            if len(docs) < page_size:
+                break
+            last = docs[-1]
+        return results[:limit], reads
+
+    def page_memories(self, filters: Optional[Dict[str, Any]] = None, page_size: int = LIST_PAGE_SIZE,
+                      fields: Optional[List[str]] = None,
+                      page_token: Optional[str] = None) -> AsyncIterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """Async variant of FirestoreService.page_memories(), iterated with async for."""
+        query, _, extra_tags = _memories_query(self.memories_collection, filters)
+        if fields and extra_tags:
+            fields = list(fields) + ["tags"]
+        return self._pages(query, "updated_at", page_size, fields, page_token, extra_tags)
+
+    async def _pages(self, query, order_field: str, page_size: int, fields: Optional[List[str]],
+                     page_token: Optional[str], tags: List[str]) -> AsyncIterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        while True:
+            docs = [doc async for doc in _page_query(query, order_field, page_size, fields, page_token).stream()]
+            results, page_token = _page_results(docs, order_field, page_size, fields, tags)
+            yield results, page_token
+            if page_token is None:
+                return
+
+    # SESSIONS
+    async def save_session(self, user_id: str, session_data: Dict[str, Any]) -> str:
+        """Async variant of FirestoreService.save_session()."""
+        sessions_collection = _sessions_collection(self.client, user_id)
+        session_id, session_data_copy = _prepare_record(
+            sessions_collection, session_data, session_data.get("id") or session_data.get("session_id"))
+        session_data_copy["user_id"] = user_id
+        ref = sessions_collection.document(session_id)
+        if self.write_behind is not None:
+            self.write_behind.set(ref, session_data_copy, merge=True)
+        else:
+            await ref.set(session_data_copy, merge=True)
+        get_read_cache().invalidate(ref.path)
+        return session_id
+
+    async def get_session(self, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """Async variant of FirestoreService.get_session()."""
+        ref = _sessions_collection(self.client, user_id).document(session_id)
+        if self.write_behind is not None and self.write_behind.pending(ref):
+            # Read back what this conversation saved
+            await self.write_behind.flush()
+        return await self._cached_get(ref)
+
+    async def update_session(self, user_id: str, session_id: str, updates: Dict[str, Any]) -> None:
+        """Async variant of FirestoreService.update_session()."""
+        ref = _sessions_collection(self.client, user_id).document(session_id)
+        if self.write_behind is not None and self.write_behind.pending(ref):
+            # The session may not exist until its queued save is committed
+            await self.write_behind.flush()
+        await ref.update(_prepare_updates(updates))
+        get_read_cache().invalidate(ref.path)
+
+    async def _cached_get(self, ref) -> Optional[Dict[str, Any]]:
+        """Async variant of FirestoreService._cached_get()."""
+        cache = get_read_cache()
+        cached = cache.get(ref.path)
+        if cached is not MISS:
+            return cached
+        filled = False
+        try:
+            doc = await ref.get()
+            data = _document_data(doc) if doc.exists else None
+            # Listeners run on the sync client, which has on_snapshot
+            listen_ref = get_firestore_service().client.document(ref.path) if cache.listen else None
+            filled = True
+            cache.fill(ref.path, data, doc.update_time if doc.exists else None, listen_ref)
+            return data
+        finally:
+            if not filled:
+                # Failed or cancelled: release the in-flight read
+                cache.abandon(ref.path)
+
+    async def save_inquiry(self, args):
+        """Async variant of FirestoreService.save_inquiry()."""
+        try:
+            inquiry_ref = self.client.collection('inquiries').document()
+            if self.write_behind is not None:
+                self.write_behind.set(inquiry_ref, _inquiry_record(args))
+            else:
+                await inquiry_ref.set(_inquiry_record(args))
+            return _inquiry_saved(inquiry_ref.id)
+        except Exception as e:
+            return _inquiry_failed(e)
+
+    # BATCHES
+    async def write_batch(self, writes: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Async variant of FirestoreService.write_batch(); never goes through the write-behind queue."""
+        planned = _batch_writes(self.client, self.tasks_collection, self.memories_collection, writes)
+        if self.write_behind is not None and any(self.write_behind.pending(ref) for _, ref, _, _ in planned):
+            # Keep queued writes to the same documents ahead of this batch
+            await self.write_behind.flush()
+        batch = self.client.batch()
+        for method, ref, data, _ in planned:
+            _add_to_batch(batch, method, ref, data)
+        await batch.commit()
+        cache = get_read_cache()
+        for _, ref, _, _ in planned:
+            cache.invalidate(ref.path)
+        return [result for _, _, _, result in planned]
+
+
+# One service per event loop, since an AsyncClient's channel belongs to the loop that opened it
+_services: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncFirestoreService]' = weakref.WeakKeyDictionary()
+_services_lock = threading.Lock()
+
+
+def get_async_firestore_service() -> AsyncFirestoreService:
+    """Return the AsyncFirestoreService of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    service = _services.get(loop)
+    if service is None:
+        with _services_lock:
+            service = _services.get(loop)
+            if service is None:
+                service = _services[loop] = AsyncFirestoreService()
+    return service
+
+
+def peek_async_firestore_service() -> Optional[AsyncFirestoreService]:
+    """Return the running event loop's AsyncFirestoreService if it exists, without creating one."""
+    return _services.get(asyncio.get_running_loop())
+
+
+async def close_async_firestore_service() -> None:
+    """Commit queued writes and close the current event loop's client channel (call on shutdown)."""
+    with _services_lock:
+        service = _services.pop(asyncio.get_running_loop(), None)
+    if service is not None:
+        if service.write_behind is not None:
+            await service.write_behind.stop()
+        closing = close_firestore_client(service.client)
+        if closing is not None:
+            await closing
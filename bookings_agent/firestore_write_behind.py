@@ -0,0 +1,237 @@
+"""
+Write-behind queue for Firestore writes that the conversation does not wait on.
+
+With FIRESTORE_WRITE_BEHIND=true, AsyncFirestoreService.save_inquiry and
+save_session return as soon as the document ID is known, and the write is
+queued here. A background task commits queued writes in WriteBatches of up to
+FIRESTORE_WRITE_BEHIND_BATCH_SIZE once that many are waiting or every
+FIRESTORE_WRITE_BEHIND_FLUSH_SECONDS, retrying a failed batch with backoff.
+A batch that keeps failing stays queued for the next flush; a write Firestore
+rejects as invalid is dropped on its own and counted. stop() (called from
+main.py on shutdown) commits everything still queued, retrying for up to
+FIRESTORE_WRITE_BEHIND_SHUTDOWN_SECONDS, before the client is closed.
+
+Reads of a document with a queued write flush the queue first, so a
+conversation always reads back what it saved. Server timestamps in queued
+writes are set when the batch is committed, not when the write was queued.
+"""
+
+import asyncio
+import os
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+from google.api_core import exceptions
+
+# Set FIRESTORE_WRITE_BEHIND=true to acknowledge inquiry and session writes before they are committed
+WRITE_BEHIND_ENABLED = os.getenv("FIRESTORE_WRITE_BEHIND", "false").lower() == "true"
+# A WriteBatch holds at most 500 writes
+WRITE_BEHIND_BATCH_SIZE = min(int(os.getenv("FIRESTORE_WRITE_BEHIND_BATCH_SIZE", "100")), 500)
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("FIRESTORE_WRITE_BEHIND_FLUSH_SECONDS", "1.0"))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("FIRESTORE_WRITE_BEHIND_MAX_RETRIES", "5"))
+# First retry delay; doubled on every further attempt
+WRITE_BEHIND_RETRY_SECONDS = 0.5
+# How long stop() keeps retrying failed batches on shutdown
+WRITE_BEHIND_SHUTDOWN_SECONDS = float(os.getenv("FIRESTORE_WRITE_BEHIND_SHUTDOWN_SECONDS", "30"))
+
+
+class _Write(NamedTuple):
+    ref: Any
+    data: Dict[str, Any]
+    merge: bool
+
+
+class WriteBehindQueue:
+    """
+    Queued set() writes committed in batches by a background task.
+
+    Belongs to one AsyncClient and so to one event loop; enqueue and flush
+    must be called from that loop.
+    """
+
+    def __init__(self, client, batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+                 flush_seconds: float = WRITE_BEHIND_FLUSH_SECONDS,
+                 max_retries: int = WRITE_BEHIND_MAX_RETRIES):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self._queue: Deque[_Write] = deque()
+        # Document paths with a queued or in-flight write
+        self._pending: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        self._flush_ms: List[float] = []
+        self._counters = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'retries': 0,
+            'requeued': 0,
+            'rejected': 0,
+            'dropped': 0,
+        }
+
+    def set(self, ref, data: Dict[str, Any], merge: bool = False) -> None:
+        """Queue ref.set(data, merge=merge) and return without waiting for it."""
+        self._ensure_started()
+        self._queue.append(_Write(ref, data, merge))
+        self._pending[ref.path] += 1
+        self._counters['enqueued'] += 1
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+
+    def pending(self, ref) -> bool:
+        """Whether a write to ref has not been committed yet."""
+        return self._pending[ref.path] > 0
+
+    async def flush(self) -> int:
+        """
+        Commit every queued write now. Returns the number of writes committed.
+
+        A batch that still fails after the retries goes back to the front of the
+        queue, with the writes after it, for the next flush.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        written = 0
+        async with self._flush_lock:
+            while self._queue:
+                chunk = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                try:
+                    committed = await self._commit(chunk)
+                except BaseException:
+                    # Cancelled mid-commit: keep the writes (setting them again is harmless)
+                    self._queue.extendleft(reversed(chunk))
+                    raise
+                if committed is None:
+                    self._queue.extendleft(reversed(chunk))
+                    self._counters['requeued'] += len(chunk)
+                    break
+                written += committed
+        return written
+
+    def _reject(self, chunk: List[_Write], write: _Write, e: Exception) -> None:
+        """Drop a write Firestore will never accept, so it cannot hold up the queue."""
+        chunk.remove(write)
+        self._release(write)
+        self._counters['rejected'] += 1
+        print(f"[write_behind] Rejected write to {write.ref.path}: {e}")
+
+    def _batch(self, chunk: List[_Write]):
+        """A WriteBatch of the chunk, rejecting writes whose data cannot be encoded."""
+        batch = self.client.batch()
+        for write in list(chunk):
+            try:
+                batch.set(write.ref, write.data, merge=write.merge)
+            except (TypeError, ValueError) as e:
+                self._reject(chunk, write, e)
+        return batch
+
+    async def _commit(self, chunk: List[_Write]) -> Optional[int]:
+        """
+        Commit a chunk, retrying with backoff. Returns the number of writes
+        committed, or None if the chunk should be retried later (it stays pending).
+        """
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            batch = self._batch(chunk)
+            if not chunk:
+                return 0
+            try:
+                await batch.commit()
+            except exceptions.InvalidArgument as e:
+                if len(chunk) == 1:
+                    self._reject(chunk, chunk[0], e)
+                    return 0
+                # Commit the writes one by one to find the invalid one(s)
+                committed = 0
+                for write in list(chunk):
+                    single = await self._commit([write])
+                    if single is None:
+                        return None
+                    committed += single
+                    chunk.remove(write)
+                return committed
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"[write_behind] Commit of {len(chunk)} write(s) failed {attempt + 1} times, "
+                          f"keeping them queued: {e}")
+                    return None
+                self._counters['retries'] += 1
+                await asyncio.sleep(WRITE_BEHIND_RETRY_SECONDS * 2 ** attempt)
+                continue
+            for write in chunk:
+                self._release(write)
+            self._counters['written'] += len(chunk)
+            self._counters['batches'] += 1
+            # Keep the most recent flush latencies for the stats
+            self._flush_ms = self._flush_ms[-99:] + [(time.perf_counter() - started) * 1000]
+            return len(chunk)
+
+    def _release(self, write: _Write) -> None:
+        self._pending[write.ref.path] -= 1
+        if self._pending[write.ref.path] <= 0:
+            del self._pending[write.ref.path]
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._queue:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    print(f"[write_behind] Flush failed: {e}")
+
+    async def stop(self, timeout: float = WRITE_BEHIND_SHUTDOWN_SECONDS) -> None:
+        """
+        Commit everything still queued and stop the background task.
+
+        Batches that fail are retried until timeout seconds have passed; only
+        writes still uncommitted then are lost (and logged).
+        """
+        task, self._task = self._task, None
+        if task is not None:
+            self._stopping = True
+            self._wake.set()
+            await task
+        deadline = time.monotonic() + timeout
+        while self._queue:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self.flush(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if self._queue:
+                await asyncio.sleep(min(WRITE_BEHIND_RETRY_SECONDS, max(0.0, deadline - time.monotonic())))
+        if self._queue:
+            self._counters['dropped'] += len(self._queue)
+            print(f"[write_behind] {len(self._queue)} acknowledged write(s) could not be committed "
+                  f"within {timeout}s of shutdown and are lost: "
+                  f"{', '.join(sorted({write.ref.path for write in self._queue}))}")
+            while self._queue:
+                self._release(self._queue.popleft())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue depth, flush latency and counters for monitoring."""
+        stats: Dict[str, Any] = dict(self._counters)
+        stats['queue_depth'] = len(self._queue)
+        stats['last_flush_ms'] = self._flush_ms[-1] if self._flush_ms else None
+        stats['mean_flush_ms'] = sum(self._flush_ms) / len(self._flush_ms) if self._flush_ms else None
+        stats['running'] = self._task is not None and not self._task.done()
+        return stats
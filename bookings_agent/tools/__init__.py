@@ -1,5 +1,5 @@
 from .current_time import current_time, current_year
-from .google_calendar import list_upcoming_events, create_event, get_all_available_slots
+from .google_calendar import list_upcoming_events, create_event, book_sessions, get_all_available_slots, get_next_available_slots, hold_slot, release_slot_holds
 from .natural_date_parser import parse_natural_date
 from .validate_email import validate_email
 
@@ -8,7 +8,11 @@ __all__ = [
     "current_year",
     "list_upcoming_events",
     "create_event",
+    "book_sessions",
     "get_all_available_slots",
+    "get_next_available_slots",
+    "hold_slot",
+    "release_slot_holds",
     "parse_natural_date",
     "validate_email",
     "save_user_inquiry"
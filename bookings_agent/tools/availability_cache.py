@@ -0,0 +1,330 @@
+"""
+In-memory busy-interval store for the booking calendar.
+
+The store is seeded once with a full events().list and then kept current with
+Calendar incremental sync (syncToken), so availability lookups are answered
+from memory instead of re-listing the whole window on every turn.
+
+Freshness is bounded by AVAILABILITY_CACHE_MAX_AGE_SECONDS: once the data is
+older than that (or has been invalidated by our own writes or by an
+events.watch push notification) the next lookup runs an incremental sync first.
+If Google expires the sync token (410 Gone) the store falls back to a full
+resync.
+"""
+
+import asyncio
+import bisect
+import datetime
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from bookings_agent.tools.calendar_client import (
+    BUSY_EVENT_FIELDS,
+    PAGE_SIZE,
+    AsyncCalendarClient,
+    CalendarApiError,
+    CalendarClient,
+    event_busy_interval,
+    get_calendar_client,
+)
+from bookings_agent.tools.singleflight import availability_flight
+from bookings_agent.tools.slot_engine import Interval, merge_intervals
+
+MAX_AGE_SECONDS = float(os.getenv('AVAILABILITY_CACHE_MAX_AGE_SECONDS', '60'))
+# How far back the initial full sync starts; events ending before this are pruned
+LOOKBACK_DAYS = int(os.getenv('AVAILABILITY_CACHE_LOOKBACK_DAYS', '1'))
+
+
+class AvailabilityCache:
+    """
+    Busy intervals of one calendar, kept in sync with Calendar sync tokens.
+
+    Thread-safe: lookups read an immutable sorted snapshot, and only one thread
+    (or one coroutine, for the async path) at a time talks to the Calendar API.
+    """
+
+    def __init__(self, calendar_id: str, max_age_seconds: float = MAX_AGE_SECONDS,
+                 client: Optional[CalendarClient] = None):
+        self.calendar_id = calendar_id
+        self.max_age_seconds = max_age_seconds
+        self._client = client
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._async_sync_lock: Optional[asyncio.Lock] = None
+        self._events: Dict[str, Interval] = {}
+        # (merged busy intervals, their starts, their ends) swapped in atomically
+        self._index: Tuple[List[Interval], List[float], List[float]] = ([], [], [])
+        self._sync_token: Optional[str] = None
+        self._synced_at: Optional[float] = None
+        self._stale = True
+        # Bumped by invalidate() so a sync that raced with a change stays stale
+        self._generation = 0
+        self._channel: Optional[Dict[str, Any]] = None
+        self._invalidation_listeners: List[Callable[[], None]] = []
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'full_syncs': 0,
+            'incremental_syncs': 0,
+            'sync_token_expired': 0,
+            'invalidations': 0,
+            'notifications': 0,
+        }
+        self.last_sync_ms = 0.0
+
+    @property
+    def client(self) -> CalendarClient:
+        return self._client or get_calendar_client()
+
+    # FRESHNESS
+    def age_seconds(self) -> Optional[float]:
+        """Seconds since the last successful sync, or None if never synced."""
+        if self._synced_at is None:
+            return None
+        return time.monotonic() - self._synced_at
+
+    def is_fresh(self) -> bool:
+        age = self.age_seconds()
+        return not self._stale and age is not None and age < self.max_age_seconds
+
+    @property
+    def generation(self) -> int:
+        """Number of invalidations so far; data derived from the calendar is current while it is unchanged."""
+        return self._generation
+
+    def invalidate(self) -> None:
+        """Mark the cached data stale so the next lookup syncs first."""
+        with self._lock:
+            self._stale = True
+            self._generation += 1
+            self._counters['invalidations'] += 1
+        for listener in list(self._invalidation_listeners):
+            listener()
+
+    def add_invalidation_listener(self, listener: Callable[[], None]) -> None:
+        """Call listener (from the invalidating thread) after every invalidate()."""
+        self._invalidation_listeners.append(listener)
+
+    # LOOKUPS
+    def busy_intervals(self, start_ts: float, end_ts: float) -> List[Interval]:
+        """
+        Return merged busy (start, end) epoch-second intervals overlapping [start_ts, end_ts).
+
+        The result is disjoint and ordered, ready for slot_engine.free_slots().
+        Syncs with the Calendar API first if the cached data is stale.
+        """
+        if self.is_fresh():
+            self._count('hits')
+        else:
+            self._count('misses')
+            # Lookups that miss together share one sync (keyed by generation, so a
+            # lookup after an invalidation never joins a sync that started before it)
+            availability_flight.do(self._refresh_key(), self.refresh)
+        return self._lookup(start_ts, end_ts)
+
+    async def busy_intervals_async(self, start_ts: float, end_ts: float,
+                                   client: AsyncCalendarClient) -> List[Interval]:
+        """Async variant of busy_intervals() that syncs over the async HTTP client."""
+        if self.is_fresh():
+            self._count('hits')
+        else:
+            self._count('misses')
+            await availability_flight.do_async(self._refresh_key(), lambda: self.refresh_async(client))
+        return self._lookup(start_ts, end_ts)
+
+    def _refresh_key(self) -> Tuple[str, str, int]:
+        return ('refresh', self.calendar_id, self._generation)
+
+    def _lookup(self, start_ts: float, end_ts: float) -> List[Interval]:
+        intervals, starts, ends = self._index
+        lower = bisect.bisect_right(ends, start_ts)
+        upper = bisect.bisect_left(starts, end_ts)
+        return intervals[lower:upper]
+
+    # SYNC
+    def refresh(self) -> None:
+        """Bring the store up to date, incrementally when a sync token is available."""
+        with self._sync_lock:
+            # Another thread may have synced while we waited
+            if self.is_fresh():
+                return
+            started = time.perf_counter()
+            if self._sync_token:
+                try:
+                    self._sync(full=False)
+                except HttpError as e:
+                    if e.resp.status != 410:
+                        raise
+                    self._on_sync_token_expired()
+                    self._sync(full=True)
+            else:
+                self._sync(full=True)
+            self.last_sync_ms = (time.perf_counter() - started) * 1000
+
+    async def refresh_async(self, client: AsyncCalendarClient) -> None:
+        """Async variant of refresh()."""
+        if self._async_sync_lock is None:
+            self._async_sync_lock = asyncio.Lock()
+        async with self._async_sync_lock:
+            if self.is_fresh():
+                return
+            started = time.perf_counter()
+            if self._sync_token:
+                try:
+                    await self._sync_async(client, full=False)
+                except CalendarApiError as e:
+                    if e.status != 410:
+                        raise
+                    self._on_sync_token_expired()
+                    await self._sync_async(client, full=True)
+            else:
+                await self._sync_async(client, full=True)
+            self.last_sync_ms = (time.perf_counter() - started) * 1000
+
+    def _on_sync_token_expired(self) -> None:
+        # Sync token expired: Google requires a full resync
+        print("[availability_cache] Sync token expired, running full resync")
+        self._count('sync_token_expired')
+
+    def _sync_start(self, full: bool) -> Tuple[Dict[str, Interval], Dict[str, Any]]:
+        """Return the event map to update and the events().list parameters for a sync."""
+        params: Dict[str, Any] = {
+            'singleEvents': True,
+            'maxResults': PAGE_SIZE,
+            'fields': BUSY_EVENT_FIELDS,
+        }
+        if full:
+            time_min = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=LOOKBACK_DAYS)
+            params['timeMin'] = time_min.strftime('%Y-%m-%dT%H:%M:%SZ')
+            return {}, params
+        params['syncToken'] = self._sync_token
+        return dict(self._events), params
+
+    @staticmethod
+    def _apply_page(events: Dict[str, Interval], page: Dict[str, Any]) -> Optional[str]:
+        """Apply one page of changes to events and return its nextSyncToken (last page only)."""
+        for event in page.get('items', []):
+            interval = event_busy_interval(event)
+            if interval is None:
+                events.pop(event['id'], None)
+            else:
+                events[event['id']] = interval
+        return page.get('nextSyncToken')
+
+    def _sync(self, full: bool) -> None:
+        generation = self._generation
+        events, params = self._sync_start(full)
+        next_sync_token = None
+        label = 'availability_full_sync' if full else 'availability_incremental_sync'
+        for page in self.client.iter_event_pages(self.calendar_id, label, **params):
+            next_sync_token = self._apply_page(events, page)
+        self._install(events, next_sync_token, generation)
+        self._count('full_syncs' if full else 'incremental_syncs')
+
+    async def _sync_async(self, client: AsyncCalendarClient, full: bool) -> None:
+        generation = self._generation
+        events, params = self._sync_start(full)
+        next_sync_token = None
+        label = 'availability_full_sync' if full else 'availability_incremental_sync'
+        async for page in client.iter_event_pages(self.calendar_id, label, **params):
+            next_sync_token = self._apply_page(events, page)
+        self._install(events, next_sync_token, generation)
+        self._count('full_syncs' if full else 'incremental_syncs')
+
+    def _install(self, events: Dict[str, Interval], sync_token: Optional[str], generation: int) -> None:
+        # Drop events that ended before the lookback horizon so the store stays small
+        horizon = time.time() - LOOKBACK_DAYS * 86400
+        events = {event_id: interval for event_id, interval in events.items() if interval[1] > horizon}
+        merged = merge_intervals(events.values())
+        with self._lock:
+            self._events = events
+            self._index = (merged, [start for start, _ in merged], [end for _, end in merged])
+            self._sync_token = sync_token
+            self._synced_at = time.monotonic()
+            self._stale = generation != self._generation
+
+    # PUSH NOTIFICATIONS
+    def start_watch(self, address: str, token: Optional[str] = None, ttl_seconds: int = 604800) -> Dict[str, Any]:
+        """
+        Register an events.watch channel that POSTs change notifications to address.
+
+        Args:
+            address (str): HTTPS URL of the notification endpoint
+            token (str, optional): Shared secret echoed back in X-Goog-Channel-Token
+            ttl_seconds (int): Requested channel lifetime (Google caps this)
+
+        Returns:
+            dict: The channel resource returned by the API
+        """
+        body = {
+            'id': str(uuid.uuid4()),
+            'type': 'web_hook',
+            'address': address,
+            'params': {'ttl': str(ttl_seconds)},
+        }
+        if token:
+            body['token'] = token
+        self._channel = self.client.execute(
+            self.client.service.events().watch(calendarId=self.calendar_id, body=body),
+            'availability_watch')
+        return self._channel
+
+    def stop_watch(self) -> None:
+        """Stop the active events.watch channel, if any."""
+        if not self._channel:
+            return
+        channel, self._channel = self._channel, None
+        self.client.execute(
+            self.client.service.channels().stop(body={
+                'id': channel['id'],
+                'resourceId': channel['resourceId'],
+            }),
+            'availability_watch_stop')
+
+    def handle_notification(self, resource_state: str) -> None:
+        """
+        Handle an events.watch push notification.
+
+        The initial 'sync' message only confirms the channel; anything else
+        means the calendar changed.
+        """
+        self._count('notifications')
+        if resource_state != 'sync':
+            self.invalidate()
+
+    # STATS
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss/sync counters and staleness information."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['age_seconds'] = self.age_seconds()
+        stats['stale'] = not self.is_fresh()
+        stats['events_cached'] = len(self._events)
+        stats['last_sync_ms'] = self.last_sync_ms
+        stats['watching'] = self._channel is not None
+        return stats
+
+
+_cache: Optional[AvailabilityCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_availability_cache() -> AvailabilityCache:
+    """Return the process-wide cache for BOOKING_CALENDAR_ID."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AvailabilityCache(os.getenv('BOOKING_CALENDAR_ID'))
+    return _cache
@@ -0,0 +1,310 @@
+"""
+Declarative availability rules for bookable slots.
+
+Rules describe weekly opening windows, per-date overrides, blackout dates, a
+buffer kept free around existing events and a minimum notice period. A window
+is either a [start, end] range, in which slots must fit entirely, or a single
+[start] time at which a slot starts whatever its duration. They are
+compiled once per slot duration into a weekly template of slot start times, so
+expanding candidates over any window is simple per-week arithmetic.
+
+Rules are loaded from (in order of precedence):
+- the JSON file named by AVAILABILITY_RULES_FILE
+- the Firestore document config/availability_rules when
+  AVAILABILITY_RULES_SOURCE is "firestore"
+- DEFAULT_RULES
+
+and cached for AVAILABILITY_RULES_TTL_SECONDS, or until
+invalidate_availability_rules() is called.
+
+Example rules document:
+    {
+        "weekly": {"tuesday": [["18:00", "19:00"]], "thursday": [["18:00"], ["18:30"]]},
+        "overrides": {"2025-06-10": [["10:00", "12:00"]]},
+        "blackout_dates": ["2025-12-25"],
+        "buffer_minutes": 15,
+        "min_notice_minutes": 1440,
+        "slot_step_minutes": 30
+    }
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from bookings_agent.firestore_service import get_firestore_service
+from bookings_agent.tools.slot_engine import Interval, merge_sorted_intervals
+
+RULES_FILE = os.getenv('AVAILABILITY_RULES_FILE')
+RULES_SOURCE = os.getenv('AVAILABILITY_RULES_SOURCE', 'default')
+RULES_TTL_SECONDS = float(os.getenv('AVAILABILITY_RULES_TTL_SECONDS', '300'))
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Sessions start on Tuesdays and Thursdays at 18:00 and 18:30, whatever their duration
+DEFAULT_RULES: Dict[str, Any] = {
+    'weekly': {
+        'tuesday': [['18:00'], ['18:30']],
+        'thursday': [['18:00'], ['18:30']],
+    },
+    'overrides': {},
+    'blackout_dates': [],
+    'buffer_minutes': 0,
+    'min_notice_minutes': 24 * 60,
+    'slot_step_minutes': 30,
+}
+
+# (slot start epoch, slot end epoch, slot start, slot end)
+Candidate = Tuple[float, float, datetime.datetime, datetime.datetime]
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _window_starts(windows: List[List[str]], duration: int, step: int) -> List[int]:
+    """
+    Minutes after midnight at which a slot of duration minutes starts: every step
+    of a [start, end] window it fits inside, and every single [start] time.
+    """
+    starts = set()
+    for window in windows:
+        if len(window) == 1:
+            starts.add(_minutes(window[0]))
+            continue
+        if len(window) != 2:
+            raise ValueError(f"Availability window {window} must be [start] or [start, end]")
+        window_start, window_end = window
+        start, end = _minutes(window_start), _minutes(window_end)
+        if end <= start:
+            raise ValueError(f"Availability window {window_start}-{window_end} ends before it starts")
+        starts.update(range(start, end - duration + 1, step))
+    return sorted(starts)
+
+
+class CompiledRules:
+    """Availability rules pre-expanded into slot start offsets for one slot duration."""
+
+    def __init__(self, rules: 'AvailabilityRules', duration_minutes: int):
+        step = rules.slot_step_minutes
+        self.duration = datetime.timedelta(minutes=duration_minutes)
+        self.buffer_seconds = rules.buffer_minutes * 60
+        self.min_notice = datetime.timedelta(minutes=rules.min_notice_minutes)
+        # Weekly template: (weekday, minutes after midnight) in chronological order
+        self.weekly_starts: List[Tuple[int, int]] = [
+            (weekday, minute)
+            for weekday, windows in sorted(rules.weekly.items())
+            for minute in _window_starts(windows, duration_minutes, step)
+        ]
+        self.override_starts: Dict[datetime.date, List[int]] = {
+            day: _window_starts(windows, duration_minutes, step)
+            for day, windows in rules.overrides.items()
+            if day not in rules.blackout_dates
+        }
+        # Dates the weekly template does not apply to
+        self.closed_dates: Set[datetime.date] = set(rules.blackout_dates) | set(rules.overrides)
+
+    def _slot(self, day: datetime.date, minute: int, tz) -> Candidate:
+        slot_start = datetime.datetime.combine(day, datetime.time(minute // 60, minute % 60), tzinfo=tz)
+        slot_end = slot_start + self.duration
+        return slot_start.timestamp(), slot_end.timestamp(), slot_start, slot_end
+
+    def candidate_slots(self, start: datetime.datetime, end: datetime.datetime,
+                        now: datetime.datetime) -> List[Candidate]:
+        """
+        Expand the rules into candidate slots starting in [start, end), in chronological order.
+
+        Slots starting within the minimum notice period from now are left out.
+        Start and end must be timezone-aware; slots use start's timezone.
+        """
+        tz = start.tzinfo
+        earliest = max(start, now + self.min_notice)
+        first_monday = start.date() - datetime.timedelta(days=start.weekday())
+        last_day = end.date()
+
+        slots = []
+        week_start = first_monday
+        while week_start <= last_day:
+            for weekday, minute in self.weekly_starts:
+                day = week_start + datetime.timedelta(days=weekday)
+                if day not in self.closed_dates:
+                    slots.append(self._slot(day, minute, tz))
+            week_start += datetime.timedelta(weeks=1)
+
+        if self.override_starts:
+            for day, minutes in self.override_starts.items():
+                if first_monday <= day <= last_day:
+                    slots.extend(self._slot(day, minute, tz) for minute in minutes)
+            slots.sort(key=lambda slot: slot[0])
+
+        return [slot for slot in slots if earliest <= slot[2] < end]
+
+    def with_buffer(self, busy: Iterable[Interval]) -> Iterable[Interval]:
+        """
+        Widen merged busy intervals by the configured buffer on both sides.
+
+        Widening keeps the start order, so the result is merged lazily.
+        """
+        if not self.buffer_seconds:
+            return busy
+        return merge_sorted_intervals(
+            (busy_start - self.buffer_seconds, busy_end + self.buffer_seconds)
+            for busy_start, busy_end in busy
+        )
+
+
+class AvailabilityRules:
+    """Weekly windows, per-date overrides, blackouts, buffers and minimum notice."""
+
+    def __init__(
+        self,
+        weekly: Dict[int, List[List[str]]],
+        overrides: Optional[Dict[datetime.date, List[List[str]]]] = None,
+        blackout_dates: Optional[Set[datetime.date]] = None,
+        buffer_minutes: int = 0,
+        min_notice_minutes: int = 0,
+        slot_step_minutes: int = 30,
+    ):
+        if slot_step_minutes <= 0:
+            raise ValueError("slot_step_minutes must be positive")
+        self.weekly = weekly
+        self.overrides = overrides or {}
+        self.blackout_dates = blackout_dates or set()
+        self.buffer_minutes = buffer_minutes
+        self.min_notice_minutes = min_notice_minutes
+        self.slot_step_minutes = slot_step_minutes
+        self._compiled: Dict[int, CompiledRules] = {}
+        self._compile_lock = threading.Lock()
+        self._fingerprint: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AvailabilityRules':
+        """
+        Build rules from a config dictionary (see the module docstring for the format).
+
+        Raises:
+            ValueError: If a weekday, date or time is not recognised
+        """
+        weekly = {}
+        for day_name, windows in data.get('weekly', {}).items():
+            if day_name.lower() not in WEEKDAYS:
+                raise ValueError(f"Unknown weekday in availability rules: {day_name}")
+            weekly[WEEKDAYS.index(day_name.lower())] = windows
+        return cls(
+            weekly=weekly,
+            overrides={
+                datetime.date.fromisoformat(day): windows
+                for day, windows in data.get('overrides', {}).items()
+            },
+            blackout_dates={datetime.date.fromisoformat(day) for day in data.get('blackout_dates', [])},
+            buffer_minutes=int(data.get('buffer_minutes', 0)),
+            min_notice_minutes=int(data.get('min_notice_minutes', 0)),
+            slot_step_minutes=int(data.get('slot_step_minutes', 30)),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'weekly': {WEEKDAYS[weekday]: windows for weekday, windows in self.weekly.items()},
+            'overrides': {day.isoformat(): windows for day, windows in self.overrides.items()},
+            'blackout_dates': sorted(day.isoformat() for day in self.blackout_dates),
+            'buffer_minutes': self.buffer_minutes,
+            'min_notice_minutes': self.min_notice_minutes,
+            'slot_step_minutes': self.slot_step_minutes,
+        }
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable hash of the rules' content, equal for equal rules across reloads and instances."""
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode('utf-8')).hexdigest()
+        return self._fingerprint
+
+    def compile(self, duration_minutes: int) -> CompiledRules:
+        """Return the compiled template for a slot duration, compiling it on first use."""
+        compiled = self._compiled.get(duration_minutes)
+        if compiled is None:
+            with self._compile_lock:
+                compiled = self._compiled.get(duration_minutes)
+                if compiled is None:
+                    compiled = CompiledRules(self, duration_minutes)
+                    self._compiled[duration_minutes] = compiled
+        return compiled
+
+
+_rules: Optional[AvailabilityRules] = None
+_rules_loaded_at = 0.0
+_rules_lock = threading.Lock()
+
+
+def _load_rules_data() -> Dict[str, Any]:
+    if RULES_FILE:
+        with open(RULES_FILE) as f:
+            return json.load(f)
+    if RULES_SOURCE == 'firestore':
+        doc = get_firestore_service().client.collection('config').document('availability_rules').get()
+        if doc.exists:
+            return doc.to_dict()
+        print("No availability rules found in Firestore, using defaults")
+    return DEFAULT_RULES
+
+
+def get_availability_rules() -> AvailabilityRules:
+    """
+    Return the current availability rules, reloading them when the cache has expired.
+
+    If reloading fails the previous rules stay in effect (or the defaults on first load).
+    """
+    global _rules, _rules_loaded_at
+    if _rules is not None and time.monotonic() - _rules_loaded_at < RULES_TTL_SECONDS:
+        return _rules
+    with _rules_lock:
+        if _rules is None or time.monotonic() - _rules_loaded_at >= RULES_TTL_SECONDS:
+            try:
+                _rules = AvailabilityRules.from_dict(_load_rules_data())
+            except Exception as e:
+                print(f"Error loading availability rules: {e}")
+                if _rules is None:
+                    _rules = AvailabilityRules.from_dict(DEFAULT_RULES)
+            _rules_loaded_at = time.monotonic()
+    return _rules
+
+
+async def get_availability_rules_async() -> AvailabilityRules:
+    """
+    Async counterpart of get_availability_rules().
+
+    Returns the cached rules without leaving the event loop; only a reload
+    (which may read Firestore and waits on the reload lock) runs in a thread.
+    """
+    rules = _rules
+    if rules is not None and time.monotonic() - _rules_loaded_at < RULES_TTL_SECONDS:
+        return rules
+    return await asyncio.to_thread(get_availability_rules)
+
+
+def seed_availability_rules(data: Dict[str, Any]) -> AvailabilityRules:
+    """
+    Use previously saved rules (e.g. from the warm state file) until the next reload.
+
+    Only rules kept in Firestore are seeded; file and default rules load
+    without any round trip.
+    """
+    global _rules, _rules_loaded_at
+    if RULES_FILE or RULES_SOURCE != 'firestore':
+        return get_availability_rules()
+    with _rules_lock:
+        _rules = AvailabilityRules.from_dict(data)
+        _rules_loaded_at = time.monotonic()
+    return _rules
+
+
+def invalidate_availability_rules() -> None:
+    """Force the next get_availability_rules() call to reload the rules."""
+    global _rules_loaded_at
+    _rules_loaded_at = 0.0
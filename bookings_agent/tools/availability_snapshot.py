@@ -0,0 +1,384 @@
+"""
+Precomputed availability snapshot, refreshed in the background.
+
+Even with the availability cache, the first lookup after a quiet period pays
+for a Calendar sync. A background task (started from main.py) instead
+rebuilds a snapshot of the next AVAILABILITY_SNAPSHOT_WEEKS weeks every
+AVAILABILITY_SNAPSHOT_REFRESH_SECONDS, and straight away whenever the
+availability cache is invalidated (after create_event, bulk bookings and
+Calendar push notifications). The snapshot holds the merged busy intervals
+and the free slots, plus rendered responses, so a default
+get_all_available_slots call is answered from memory without any Calendar
+work.
+
+A snapshot is only served while it is younger than
+AVAILABILITY_SNAPSHOT_MAX_AGE_SECONDS (or, once, the longer limit it was
+installed with; see warm_state) and no invalidation has happened since it
+was built; otherwise the tools fall back to a live lookup.
+
+With several instances running, each would rebuild the same snapshot from
+the Calendar API. The snapshot is therefore also shared through one Firestore
+document per calendar (the L2 tier, AVAILABILITY_SNAPSHOT_SHARED): instances
+serve their in-memory snapshot first, then the shared one, and only then call
+Calendar. Rebuilding is claimed with a transactional compare-and-set, so one
+instance refreshes while the others adopt its result, and the rebuilt
+snapshot is only written if the document's version has not moved on. An
+instance whose cache is invalidated (e.g. after a booking) marks the shared
+document stale, so no instance keeps serving the snapshot from before it.
+"""
+
+import asyncio
+import bisect
+import datetime
+import os
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from bookings_agent.firestore_service import get_firestore_service
+from bookings_agent.tools.availability_rules import Candidate
+from bookings_agent.tools.slot_engine import Interval
+
+# Set AVAILABILITY_SNAPSHOT_ENABLED=false to always compute availability on demand
+SNAPSHOT_ENABLED = os.getenv('AVAILABILITY_SNAPSHOT_ENABLED', 'true').lower() != 'false'
+SNAPSHOT_WEEKS = int(os.getenv('AVAILABILITY_SNAPSHOT_WEEKS', '3'))
+SNAPSHOT_SLOT_MINUTES = int(os.getenv('AVAILABILITY_SNAPSHOT_SLOT_MINUTES', '30'))
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv('AVAILABILITY_SNAPSHOT_REFRESH_SECONDS', '60'))
+SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv('AVAILABILITY_SNAPSHOT_MAX_AGE_SECONDS', str(SNAPSHOT_REFRESH_SECONDS * 3)))
+# Extra time built past SNAPSHOT_WEEKS so the served window never runs off the end
+SNAPSHOT_MARGIN_SECONDS = 86400
+# How soon to try again when no snapshot was produced (another instance is rebuilding it)
+SNAPSHOT_RETRY_SECONDS = 2
+
+# Set AVAILABILITY_SNAPSHOT_SHARED=false to keep snapshots per instance
+SHARED_SNAPSHOT_ENABLED = os.getenv('AVAILABILITY_SNAPSHOT_SHARED', 'true').lower() != 'false'
+SHARED_SNAPSHOT_TTL_SECONDS = float(os.getenv('AVAILABILITY_SNAPSHOT_SHARED_TTL_SECONDS', str(SNAPSHOT_REFRESH_SECONDS)))
+# How long one instance's claim to rebuild the shared snapshot holds
+SHARED_REFRESH_CLAIM_SECONDS = 30
+# Identifies this process in refresh claims
+INSTANCE_ID = uuid.uuid4().hex
+
+
+class AvailabilitySnapshot:
+    """Busy intervals and free slots of one window, computed at one point in time."""
+
+    def __init__(self, rules_fingerprint: str, slot_minutes: int, free_until: float, busy: List[Interval],
+                 free: List[Candidate], generation: int, build_seconds: float,
+                 built_at: Optional[float] = None, version: int = 0):
+        # AvailabilityRules.fingerprint of the rules the slots were computed with
+        self.rules_fingerprint = rules_fingerprint
+        self.slot_minutes = slot_minutes
+        # Epoch seconds up to which slot starts were computed
+        self.free_until = free_until
+        self.busy = busy
+        self.free = free
+        self.starts = [slot[0] for slot in free]
+        # Availability cache generation this snapshot is valid for
+        self.generation = generation
+        self.build_seconds = build_seconds
+        self.built_at = time.time() if built_at is None else built_at
+        # Version of the shared document this snapshot was saved as or loaded from (0 if neither)
+        self.version = version
+        self._rendered: Dict[Hashable, Dict[str, Any]] = {}
+
+    def age_seconds(self) -> float:
+        # Wall clock, so a snapshot built by another instance ages from when it was built there
+        return time.time() - self.built_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for the shared Firestore document (flat arrays, which Firestore can store)."""
+        return {
+            'rules_fingerprint': self.rules_fingerprint,
+            'slot_minutes': self.slot_minutes,
+            'free_until': self.free_until,
+            'busy_starts': [busy_start for busy_start, _ in self.busy],
+            'busy_ends': [busy_end for _, busy_end in self.busy],
+            'free_starts': self.starts,
+            'built_at': self.built_at,
+            'build_seconds': self.build_seconds,
+            'expires_at': self.built_at + SHARED_SNAPSHOT_TTL_SECONDS,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], tz: datetime.tzinfo, generation: int) -> 'AvailabilitySnapshot':
+        """Rebuild a snapshot saved with to_dict(), for use under the local cache generation."""
+        duration = data['slot_minutes'] * 60
+        free = []
+        for slot_start in data['free_starts']:
+            start = datetime.datetime.fromtimestamp(slot_start, tz)
+            free.append((slot_start, slot_start + duration, start, start + datetime.timedelta(seconds=duration)))
+        return cls(
+            data['rules_fingerprint'], data['slot_minutes'], data['free_until'],
+            list(zip(data['busy_starts'], data['busy_ends'])), free, generation,
+            data['build_seconds'], built_at=data['built_at'], version=data.get('version', 0))
+
+    def window(self, start_ts: float, end_ts: float) -> Tuple[int, int]:
+        """Index range of the free slots starting in [start_ts, end_ts)."""
+        return bisect.bisect_left(self.starts, start_ts), bisect.bisect_left(self.starts, end_ts)
+
+    def rendered(self, key: Hashable, render: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the response rendered for key, rendering it on first use."""
+        response = self._rendered.get(key)
+        if response is None:
+            response = self._rendered[key] = render()
+        return response
+
+
+class AvailabilitySnapshots:
+    """
+    Holds the current snapshot and the background task that rebuilds it.
+
+    The task runs on the event loop that calls start(); request_refresh() may be
+    called from any thread.
+    """
+
+    def __init__(self, refresh_seconds: float = SNAPSHOT_REFRESH_SECONDS,
+                 max_age_seconds: float = SNAPSHOT_MAX_AGE_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self._snapshot: Optional[AvailabilitySnapshot] = None
+        # A snapshot installed with its own age limit, served once under that limit
+        self._serve_once: Optional[AvailabilitySnapshot] = None
+        self._serve_once_max_age = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        self._refresh_listeners: List[Callable[[AvailabilitySnapshot], None]] = []
+        self._counters = {
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'served': 0,
+            'fallbacks': 0,
+        }
+
+    @property
+    def current(self) -> Optional[AvailabilitySnapshot]:
+        """The latest snapshot, or None if there is none recent enough to serve."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        max_age = self._serve_once_max_age if snapshot is self._serve_once else self.max_age_seconds
+        if snapshot.age_seconds() > max_age:
+            return None
+        return snapshot
+
+    @property
+    def latest(self) -> Optional[AvailabilitySnapshot]:
+        """The latest snapshot, however old."""
+        return self._snapshot
+
+    def install(self, snapshot: AvailabilitySnapshot, serve_once_max_age: Optional[float] = None) -> None:
+        """
+        Replace the current snapshot, e.g. with one loaded from the shared tier.
+
+        Args:
+            serve_once_max_age: Serve this snapshot up to this age instead of
+                max_age_seconds, for one request, and rebuild it straight away
+                (used for the snapshot saved by a previous process)
+        """
+        self._snapshot = snapshot
+        self._serve_once = snapshot if serve_once_max_age is not None else None
+        self._serve_once_max_age = serve_once_max_age or 0.0
+        if serve_once_max_age is not None:
+            self.request_refresh()
+
+    def add_refresh_listener(self, listener: Callable[[AvailabilitySnapshot], None]) -> None:
+        """Call listener(snapshot) on the event loop after every successful refresh."""
+        self._refresh_listeners.append(listener)
+
+    def start(self, build: Callable[[], Awaitable[Optional[AvailabilitySnapshot]]]) -> None:
+        """Start rebuilding snapshots with build() on the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(build))
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def request_refresh(self) -> None:
+        """Ask the background task to rebuild now (safe to call from any thread)."""
+        loop, wake = self._loop, self._wake
+        if loop is None or wake is None or loop.is_closed():
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                wake.set()
+                return
+        except RuntimeError:
+            pass
+        loop.call_soon_threadsafe(wake.set)
+
+    async def _run(self, build: Callable[[], Awaitable[Optional[AvailabilitySnapshot]]]) -> None:
+        while True:
+            self._wake.clear()
+            timeout = self.refresh_seconds
+            try:
+                snapshot = await build()
+                if snapshot is None:
+                    # Someone else is rebuilding; keep serving what we have and check back soon
+                    timeout = SNAPSHOT_RETRY_SECONDS
+                else:
+                    self._snapshot = snapshot
+                    self._count('refreshes')
+                    for listener in self._refresh_listeners:
+                        listener(snapshot)
+            except Exception as e:
+                self._count('refresh_failures')
+                print(f"[availability_snapshot] Refresh failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def record_served(self, served: bool) -> None:
+        if served:
+            # Later requests wait for a refresh rather than reuse a snapshot served past the usual limit
+            self._serve_once = None
+        self._count('served' if served else 'fallbacks')
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return snapshot age, last refresh duration and counters for monitoring."""
+        snapshot = self._snapshot
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        stats['running'] = self._task is not None and not self._task.done()
+        stats['age_seconds'] = snapshot.age_seconds() if snapshot else None
+        stats['last_refresh_ms'] = snapshot.build_seconds * 1000 if snapshot else None
+        stats['free_slots'] = len(snapshot.free) if snapshot else None
+        stats['busy_intervals'] = len(snapshot.busy) if snapshot else None
+        stats['version'] = snapshot.version if snapshot else None
+        stats['shared'] = get_shared_snapshot_stats()
+        return stats
+
+
+_snapshots: Optional[AvailabilitySnapshots] = None
+_snapshots_lock = threading.Lock()
+
+
+def get_availability_snapshots() -> AvailabilitySnapshots:
+    """Return the process-wide snapshot holder."""
+    global _snapshots
+    if _snapshots is None:
+        with _snapshots_lock:
+            if _snapshots is None:
+                _snapshots = AvailabilitySnapshots()
+    return _snapshots
+
+
+_shared_lock = threading.Lock()
+_shared_counters = {
+    'loads': 0,
+    'adopted': 0,
+    'claims': 0,
+    'claims_lost': 0,
+    'publishes': 0,
+    'publish_conflicts': 0,
+    'invalidations': 0,
+    'errors': 0,
+}
+
+
+def _count_shared(name: str) -> None:
+    with _shared_lock:
+        _shared_counters[name] += 1
+
+
+def get_shared_snapshot_stats() -> Dict[str, Any]:
+    """Return counters of the shared (Firestore) snapshot tier."""
+    with _shared_lock:
+        stats: Dict[str, Any] = dict(_shared_counters)
+    stats['enabled'] = SHARED_SNAPSHOT_ENABLED
+    return stats
+
+
+def load_shared_snapshot(calendar_id: str, rules_fingerprint: str, slot_minutes: int,
+                         tz: datetime.tzinfo, generation: int) -> Optional[AvailabilitySnapshot]:
+    """
+    Load the shared snapshot of a calendar if it can be served.
+
+    Returns None when there is none, or it has expired, was built before the
+    calendar last changed, or was computed for other rules or slot length.
+    Firestore errors are logged and also return None.
+    """
+    if not SHARED_SNAPSHOT_ENABLED:
+        return None
+    _count_shared('loads')
+    try:
+        data = get_firestore_service().get_availability_snapshot(calendar_id)
+    except Exception as e:
+        _count_shared('errors')
+        print(f"[availability_snapshot] Could not load the shared snapshot: {e}")
+        return None
+    if (not data or 'free_starts' not in data
+            or data['expires_at'] <= time.time()
+            or data.get('invalidated_at', 0) >= data['built_at']
+            or data['rules_fingerprint'] != rules_fingerprint
+            or data['slot_minutes'] != slot_minutes):
+        return None
+    _count_shared('adopted')
+    return AvailabilitySnapshot.from_dict(data, tz, generation)
+
+
+def mark_shared_snapshot_stale(calendar_id: str) -> None:
+    """Tell every instance that the shared snapshot predates a calendar change."""
+    if not SHARED_SNAPSHOT_ENABLED:
+        return
+    _count_shared('invalidations')
+    try:
+        get_firestore_service().mark_availability_snapshot_stale(calendar_id)
+    except Exception as e:
+        _count_shared('errors')
+        print(f"[availability_snapshot] Could not mark the shared snapshot stale: {e}")
+
+
+def claim_shared_refresh(calendar_id: str) -> Tuple[bool, Optional[int]]:
+    """
+    Claim the rebuild of the shared snapshot for this instance.
+
+    Returns:
+        tuple: (claimed, version). claimed is False if another instance is
+               rebuilding; version is None if the rebuild should not be
+               published (sharing disabled or Firestore unreachable).
+    """
+    if not SHARED_SNAPSHOT_ENABLED:
+        return True, None
+    try:
+        version = get_firestore_service().claim_availability_snapshot_refresh(
+            calendar_id, INSTANCE_ID, SHARED_REFRESH_CLAIM_SECONDS)
+    except Exception as e:
+        _count_shared('errors')
+        print(f"[availability_snapshot] Could not claim the shared refresh: {e}")
+        return True, None
+    if version is None:
+        _count_shared('claims_lost')
+        return False, None
+    _count_shared('claims')
+    return True, version
+
+
+def publish_shared_snapshot(calendar_id: str, snapshot: AvailabilitySnapshot, expected_version: int) -> None:
+    """Save a rebuilt snapshot as the shared one, unless its version moved on meanwhile."""
+    try:
+        version = get_firestore_service().save_availability_snapshot(
+            calendar_id, snapshot.to_dict(), expected_version)
+    except Exception as e:
+        _count_shared('errors')
+        print(f"[availability_snapshot] Could not publish the shared snapshot: {e}")
+        return
+    if version is None:
+        _count_shared('publish_conflicts')
+        return
+    snapshot.version = version
+    _count_shared('publishes')
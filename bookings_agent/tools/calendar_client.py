@@ -0,0 +1,495 @@
+"""
+Process-wide Google Calendar client shared by the calendar tools.
+
+Building a Calendar service means reading the service-account file, minting an
+access token and parsing the discovery document. Doing that on every tool call
+adds avoidable latency to each booking turn, so this module does it once per
+process and reuses the result:
+
+- The service is built from the discovery document bundled with
+  google-api-python-client (no discovery fetch over the network).
+- Credentials are loaded once and refreshed proactively, shortly before they
+  expire, under a lock so concurrent calls never mint tokens in parallel.
+- httplib2 connections are not thread-safe, so every thread gets its own
+  authorized HTTP object which keeps its TLS connection alive between calls.
+- Each request records how long was spent on setup versus the API call
+  (see get_stats()); only calls slower than CALENDAR_SLOW_CALL_MS are logged.
+- Bulk operations go out as Calendar batch HTTP requests (up to 50 per round trip).
+
+AsyncCalendarClient offers the same requests over an httpx.AsyncClient with
+keep-alive connections for the asyncio tool path, sharing the credentials and
+timing stats of the synchronous client.
+"""
+
+import asyncio
+import datetime
+import os
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import google_auth_httplib2
+import httplib2
+import httpx
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+# If modifying these SCOPES, delete the file token.json.
+SCOPES = [
+          'https://www.googleapis.com/auth/calendar',]
+
+# Path to your OAuth2 credentials file (downloaded from Google Cloud Console)
+SERVICE_ACCOUNT_FILE = os.path.join(os.path.dirname(__file__), '../../taajirah-agents-service-account.json')
+
+# Refresh the access token this many seconds before it expires
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv('CALENDAR_TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+# Socket timeout for Calendar API requests
+HTTP_TIMEOUT_SECONDS = int(os.getenv('CALENDAR_HTTP_TIMEOUT_SECONDS', '30'))
+# Calendar API calls taking longer than this (setup + API) are logged
+SLOW_CALL_MS = int(os.getenv('CALENDAR_SLOW_CALL_MS', '1000'))
+# Connection pool limits for the async client
+ASYNC_MAX_CONNECTIONS = int(os.getenv('CALENDAR_ASYNC_MAX_CONNECTIONS', '20'))
+ASYNC_MAX_KEEPALIVE = int(os.getenv('CALENDAR_ASYNC_MAX_KEEPALIVE', '10'))
+CALENDAR_API_URL = 'https://www.googleapis.com/calendar/v3'
+# Largest page size events().list accepts
+PAGE_SIZE = 2500
+# Most requests the Calendar API accepts in one batch HTTP request
+BATCH_SIZE = 50
+# Requests the async client keeps in flight at once for bulk operations
+BATCH_CONCURRENCY = int(os.getenv('CALENDAR_BATCH_CONCURRENCY', '10'))
+# Most calendars one freebusy.query accepts
+FREEBUSY_MAX_CALENDARS = 50
+# Longest time range requested per freebusy.query; longer ranges are split
+FREEBUSY_MAX_DAYS = int(os.getenv('CALENDAR_FREEBUSY_MAX_DAYS', '60'))
+# Partial response with only what slot computation needs from each event
+BUSY_EVENT_FIELDS = 'nextPageToken,nextSyncToken,items(id,status,transparency,start/dateTime,end/dateTime)'
+
+
+def _parse_timestamp(value: str) -> float:
+    return datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def event_busy_interval(event: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """
+    Return the (start, end) epoch seconds an event blocks, or None if it does not block time.
+
+    Only timed events block slots; all-day, cancelled and "show as available"
+    (transparent) events are ignored.
+    """
+    if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+        return None
+    start = event.get('start', {})
+    end = event.get('end', {})
+    if 'dateTime' not in start or 'dateTime' not in end:
+        return None
+    return _parse_timestamp(start['dateTime']), _parse_timestamp(end['dateTime'])
+
+
+def _rfc3339_utc(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def freebusy_queries(calendar_ids: Sequence[str], start_ts: float, end_ts: float) -> List[Dict[str, Any]]:
+    """
+    Split a free/busy lookup into freebusy.query bodies.
+
+    Each body covers at most FREEBUSY_MAX_CALENDARS calendars and
+    FREEBUSY_MAX_DAYS days. Bodies are ordered by time window, so collecting
+    the responses in order keeps every calendar's busy list sorted.
+    """
+    step = FREEBUSY_MAX_DAYS * 86400
+    queries = []
+    window_start = start_ts
+    while window_start < end_ts:
+        window_end = min(window_start + step, end_ts)
+        for offset in range(0, len(calendar_ids), FREEBUSY_MAX_CALENDARS):
+            queries.append({
+                'timeMin': _rfc3339_utc(window_start),
+                'timeMax': _rfc3339_utc(window_end),
+                'items': [{'id': calendar} for calendar in calendar_ids[offset:offset + FREEBUSY_MAX_CALENDARS]],
+            })
+        window_start = window_end
+    return queries
+
+
+def collect_freebusy(responses: Sequence[Dict[str, Any]]) -> Tuple[Dict[str, List[Tuple[float, float]]], Dict[str, Any]]:
+    """
+    Gather freebusy.query responses (in query order) into busy intervals per calendar.
+
+    Returns:
+        (busy, errors): sorted (start, end) epoch-second intervals per calendar ID,
+        and the API's error list for every calendar that could not be read.
+    """
+    busy: Dict[str, List[Tuple[float, float]]] = {}
+    errors: Dict[str, Any] = {}
+    for response in responses:
+        for calendar, result in response.get('calendars', {}).items():
+            if result.get('errors'):
+                errors[calendar] = result['errors']
+                continue
+            busy.setdefault(calendar, []).extend(
+                (_parse_timestamp(period['start']), _parse_timestamp(period['end'])) for period in result.get('busy', []))
+    for intervals in busy.values():
+        # Periods come back in order; sorting again is linear on sorted input
+        intervals.sort()
+    return busy, errors
+
+
+class CalendarClient:
+    """
+    Thread-safe holder for the Calendar service, credentials and connections.
+
+    Use the shared instance from get_calendar_client() rather than creating
+    new ones, otherwise nothing is pooled.
+    """
+
+    def __init__(self, service_account_file: str = SERVICE_ACCOUNT_FILE, scopes=SCOPES):
+        self.service_account_file = service_account_file
+        self.scopes = scopes
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._credentials = None
+        self._service = None
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self.build_seconds = 0.0
+
+    @property
+    def credentials(self):
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    self._credentials = service_account.Credentials.from_service_account_file(
+                        self.service_account_file, scopes=self.scopes)
+        return self._credentials
+
+    @property
+    def service(self):
+        """The shared Calendar v3 service, built once from the static discovery document."""
+        if self._service is None:
+            credentials = self.credentials
+            with self._lock:
+                if self._service is None:
+                    started = time.perf_counter()
+                    self._service = build(
+                        'calendar', 'v3',
+                        http=google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http()),
+                        static_discovery=True,
+                        cache_discovery=False,
+                    )
+                    self.build_seconds = time.perf_counter() - started
+        return self._service
+
+    def _ensure_fresh_token(self) -> None:
+        credentials = self.credentials
+        if not self._needs_refresh(credentials):
+            return
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._needs_refresh(credentials):
+                credentials.refresh(Request())
+
+    @staticmethod
+    def _needs_refresh(credentials) -> bool:
+        if not credentials.token or credentials.expiry is None:
+            return True
+        # google-auth stores expiry as a naive UTC datetime
+        remaining = credentials.expiry - datetime.datetime.utcnow()
+        return remaining.total_seconds() < TOKEN_REFRESH_MARGIN_SECONDS
+
+    def warm_up(self) -> None:
+        """Build the service and mint a token now, so the first request does not pay for either."""
+        self.service
+        self._ensure_fresh_token()
+
+    def authorized_http(self) -> google_auth_httplib2.AuthorizedHttp:
+        """
+        Return this thread's authorized HTTP object, refreshing the token if needed.
+
+        Each thread keeps its own httplib2.Http so keep-alive connections are
+        reused without being shared across threads.
+        """
+        self._ensure_fresh_token()
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+            self._local.http = http
+        return http
+
+    def execute(self, request, label: str = 'calendar') -> Any:
+        """
+        Execute a request built from self.service on this thread's connection.
+
+        Args:
+            request: An unexecuted googleapiclient request (e.g. service.events().list(...))
+            label (str): Name used when recording timings
+
+        Returns:
+            The decoded API response.
+        """
+        started = time.perf_counter()
+        http = self.authorized_http()
+        setup_done = time.perf_counter()
+        try:
+            return request.execute(http=http)
+        finally:
+            self._record(label, setup_done - started, time.perf_counter() - setup_done)
+
+    def execute_batch(self, requests: Sequence[Any], label: str = 'calendar_batch') -> List[Tuple[Any, Optional[Exception]]]:
+        """
+        Execute many requests as Calendar batch HTTP requests, BATCH_SIZE per round trip.
+
+        Args:
+            requests: Unexecuted googleapiclient requests built from self.service
+            label (str): Name used when recording timings (one entry per batch)
+
+        Returns:
+            A (response, exception) pair per request, in order. One failing
+            request does not affect the others.
+        """
+        results: List[Tuple[Any, Optional[Exception]]] = [(None, None)] * len(requests)
+        for offset in range(0, len(requests), BATCH_SIZE):
+            def callback(request_id, response, exception, offset=offset):
+                results[offset + int(request_id)] = (response, exception)
+
+            started = time.perf_counter()
+            http = self.authorized_http()
+            batch = self.service.new_batch_http_request(callback=callback)
+            for index, request in enumerate(requests[offset:offset + BATCH_SIZE]):
+                batch.add(request, request_id=str(index))
+            setup_done = time.perf_counter()
+            try:
+                batch.execute(http=http)
+            finally:
+                self._record(label, setup_done - started, time.perf_counter() - setup_done)
+        return results
+
+    def freebusy(self, calendar_ids: Sequence[str], start_ts: float, end_ts: float,
+                 label: str = 'freebusy') -> Tuple[Dict[str, List[Tuple[float, float]]], Dict[str, Any]]:
+        """
+        Busy intervals of many calendars, from freebusy.query requests sent as one batch.
+
+        Returns:
+            See collect_freebusy().
+        """
+        service = self.service
+        outcomes = self.execute_batch(
+            [service.freebusy().query(body=body) for body in freebusy_queries(calendar_ids, start_ts, end_ts)], label)
+        for _, error in outcomes:
+            if error is not None:
+                raise error
+        return collect_freebusy([response for response, _ in outcomes])
+
+    def iter_event_pages(self, calendar_id: str, label: str = 'events_list', **params) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield events().list response pages, following nextPageToken.
+
+        The next page is only requested once the caller asks for it, so
+        stopping early saves the remaining API calls.
+
+        Args:
+            calendar_id (str): Calendar to list
+            label (str): Name used when recording timings
+            **params: Any other events().list parameters (timeMin, fields, ...)
+        """
+        service = self.service
+        page_token = None
+        while True:
+            page = self.execute(
+                service.events().list(calendarId=calendar_id, pageToken=page_token, **params), label)
+            yield page
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return
+
+    def iter_events(self, calendar_id: str, label: str = 'events_list', **params) -> Iterator[Dict[str, Any]]:
+        """Lazily yield events across all pages (see iter_event_pages)."""
+        for page in self.iter_event_pages(calendar_id, label, **params):
+            yield from page.get('items', [])
+
+    def _record(self, label: str, setup_seconds: float, api_seconds: float) -> None:
+        with self._lock:
+            entry = self._stats.setdefault(label, {
+                'calls': 0,
+                'setup_seconds_total': 0.0,
+                'api_seconds_total': 0.0,
+            })
+            entry['calls'] += 1
+            entry['setup_seconds_total'] += setup_seconds
+            entry['api_seconds_total'] += api_seconds
+            entry['last_setup_ms'] = setup_seconds * 1000
+            entry['last_api_ms'] = api_seconds * 1000
+        if (setup_seconds + api_seconds) * 1000 >= SLOW_CALL_MS:
+            print(f"[calendar] Slow call {label}: setup {setup_seconds * 1000:.1f} ms, api {api_seconds * 1000:.1f} ms")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per-label call counts and setup/API timings."""
+        with self._lock:
+            return {
+                'service_build_ms': self.build_seconds * 1000,
+                'calls': {label: dict(entry) for label, entry in self._stats.items()},
+            }
+
+
+class CalendarApiError(Exception):
+    """An error response from the Calendar REST API on the async path."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Calendar API error {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class AsyncCalendarClient:
+    """
+    Calendar REST calls over a keep-alive httpx.AsyncClient.
+
+    One httpx client is kept per event loop, since its connections belong to
+    the loop that opened them.
+    """
+
+    def __init__(self, calendar_client: Optional[CalendarClient] = None):
+        self._calendar_client = calendar_client
+        self._http_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = \
+            weakref.WeakKeyDictionary()
+
+    @property
+    def calendar_client(self) -> CalendarClient:
+        return self._calendar_client or get_calendar_client()
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        http = self._http_clients.get(loop)
+        if http is None or http.is_closed:
+            http = httpx.AsyncClient(
+                base_url=CALENDAR_API_URL,
+                timeout=HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=ASYNC_MAX_CONNECTIONS,
+                    max_keepalive_connections=ASYNC_MAX_KEEPALIVE,
+                ),
+            )
+            self._http_clients[loop] = http
+        return http
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        calendar_client = self.calendar_client
+        credentials = calendar_client.credentials
+        if calendar_client._needs_refresh(credentials):
+            # google-auth refreshes synchronously; keep it off the event loop
+            await asyncio.to_thread(calendar_client._ensure_fresh_token)
+        return {'Authorization': f'Bearer {credentials.token}'}
+
+    async def request(self, method: str, path: str, label: str = 'calendar',
+                      params: Optional[Dict[str, Any]] = None,
+                      body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Send one Calendar API request and return the decoded JSON response.
+
+        Raises:
+            CalendarApiError: If the API answers with an error status
+        """
+        started = time.perf_counter()
+        headers = await self._auth_headers()
+        http = self.http
+        setup_done = time.perf_counter()
+        try:
+            response = await http.request(method, path, params=params, json=body, headers=headers)
+            if response.status_code >= 400:
+                raise CalendarApiError(response.status_code, response.text)
+            return response.json() if response.content else {}
+        finally:
+            self.calendar_client._record(label, setup_done - started, time.perf_counter() - setup_done)
+
+    async def request_many(self, requests: Sequence[Dict[str, Any]],
+                           concurrency: int = BATCH_CONCURRENCY) -> List[Tuple[Any, Optional[Exception]]]:
+        """
+        Send many requests over the shared connection pool, at most concurrency at a time.
+
+        Args:
+            requests: Keyword arguments for request() (method, path, label, params, body)
+            concurrency (int): Requests in flight at once
+
+        Returns:
+            A (response, exception) pair per request, in order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(kwargs):
+            async with semaphore:
+                try:
+                    return await self.request(**kwargs), None
+                except CalendarApiError as e:
+                    return None, e
+
+        return list(await asyncio.gather(*(send(kwargs) for kwargs in requests)))
+
+    async def freebusy(self, calendar_ids: Sequence[str], start_ts: float, end_ts: float,
+                       label: str = 'freebusy') -> Tuple[Dict[str, List[Tuple[float, float]]], Dict[str, Any]]:
+        """Async variant of CalendarClient.freebusy(); the queries run concurrently."""
+        outcomes = await self.request_many([
+            {'method': 'POST', 'path': '/freeBusy', 'label': label, 'body': body}
+            for body in freebusy_queries(calendar_ids, start_ts, end_ts)
+        ])
+        for _, error in outcomes:
+            if error is not None:
+                raise error
+        return collect_freebusy([response for response, _ in outcomes])
+
+    @staticmethod
+    def events_path(calendar_id: str) -> str:
+        return f"/calendars/{quote(calendar_id, safe='')}/events"
+
+    async def iter_event_pages(self, calendar_id: str, label: str = 'events_list',
+                               **params) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of CalendarClient.iter_event_pages()."""
+        params = {key: value for key, value in params.items() if value is not None}
+        while True:
+            page = await self.request('GET', self.events_path(calendar_id), label, params=params)
+            yield page
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return
+            params['pageToken'] = page_token
+
+    async def iter_events(self, calendar_id: str, label: str = 'events_list',
+                          **params) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of CalendarClient.iter_events()."""
+        async for page in self.iter_event_pages(calendar_id, label, **params):
+            for event in page.get('items', []):
+                yield event
+
+    async def aclose(self) -> None:
+        """Close the connection pool of the current event loop."""
+        http = self._http_clients.pop(asyncio.get_running_loop(), None)
+        if http is not None:
+            await http.aclose()
+
+
+_client: Optional[CalendarClient] = None
+_client_lock = threading.Lock()
+_async_client: Optional[AsyncCalendarClient] = None
+
+
+def get_calendar_client() -> CalendarClient:
+    """Return the process-wide CalendarClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = CalendarClient()
+    return _client
+
+
+def get_async_calendar_client() -> AsyncCalendarClient:
+    """Return the process-wide AsyncCalendarClient, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncCalendarClient()
+    return _async_client
@@ -1,17 +1,48 @@
 import os
 import datetime
+import time
+import hashlib
+import itertools
+import json
 import re
-from typing import Optional, List
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from typing import Dict, Iterable, Iterator, Optional, List, Tuple
 from zoneinfo import ZoneInfo
 
-# If modifying these SCOPES, delete the file token.json.
-SCOPES = [
-          'https://www.googleapis.com/auth/calendar',]
+from google.adk.tools import ToolContext
+from googleapiclient.errors import HttpError
+
+from bookings_agent.tools.availability_cache import get_availability_cache
+from bookings_agent.tools.availability_snapshot import (
+    SNAPSHOT_ENABLED,
+    SNAPSHOT_SLOT_MINUTES,
+    get_availability_snapshots,
+    load_shared_snapshot,
+)
+from bookings_agent.tools.availability_rules import AvailabilityRules, Candidate, CompiledRules, get_availability_rules
+from bookings_agent.tools.calendar_client import (
+    BUSY_EVENT_FIELDS,
+    CalendarApiError,
+    PAGE_SIZE,
+    SCOPES,
+    SERVICE_ACCOUNT_FILE,
+    event_busy_interval,
+    get_calendar_client,
+)
+from bookings_agent.tools.singleflight import availability_flight
+from bookings_agent.tools.slot_engine import Interval, free_slots, merge_busy_lists, merge_sorted_intervals
+from bookings_agent.tools.slot_leases import (
+    SLOT_LEASE_TTL_SECONDS,
+    acquire_slot,
+    acquire_slots,
+    clear_booked_slots,
+    confirm_slot,
+    confirm_slots,
+    lease_holder,
+    leased_intervals,
+    release_slot,
+    release_slots,
+)
 
-# Path to your OAuth2 credentials file (downloaded from Google Cloud Console)
-SERVICE_ACCOUNT_FILE = os.path.join(os.path.dirname(__file__), '../../taajirah-agents-service-account.json')
 calendar_id = os.getenv('BOOKING_CALENDAR_ID')
 time_zone = os.getenv('BOOKING_TIMEZONE')
 
@@ -20,11 +51,19 @@ if not calendar_id:
 if not time_zone:
     raise RuntimeError("BOOKING_TIMEZONE environment variable is not set!")
 
+# Set AVAILABILITY_CACHE_ENABLED=false to stream busy data from the API on every lookup instead
+USE_AVAILABILITY_CACHE = os.getenv('AVAILABILITY_CACHE_ENABLED', 'true').lower() != 'false'
+# How far get_next_available_slots searches before giving up
+NEXT_SLOTS_MAX_WEEKS = int(os.getenv('NEXT_SLOTS_MAX_WEEKS', '26'))
+# Set to "true"/"false" if you know whether the service account can invite attendees
+# (Domain-Wide Delegation); otherwise it is learned from the first booking with attendees
+CAN_INVITE_ATTENDEES = os.getenv('CALENDAR_CAN_INVITE_ATTENDEES')
+# (calendar ID, service account email) -> whether attendee invitations are accepted
+_attendee_support: Dict[Tuple[str, str], bool] = {}
+
 def get_calendar_service():
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    service = build('calendar', 'v3', credentials=credentials)
-    return service
+    """Return the shared Calendar service (built once per process)."""
+    return get_calendar_client().service
 
 def list_upcoming_events(max_results: int):
     """
@@ -32,39 +71,78 @@ def list_upcoming_events(max_results: int):
     Args:
         max_results (int): The maximum number of events to return.
     """
-    service = get_calendar_service()
     now = datetime.datetime.utcnow().isoformat() + 'Z'  # 'Z' indicates UTC time
-    events_result = service.events().list(calendarId=calendar_id, timeMin=now,
-                                          maxResults=max_results, singleEvents=True,
-                                          orderBy='startTime',
-                                          timeZone=time_zone).execute()
-    events = events_result.get('items', [])
+    # Pages are fetched lazily, so only as many pages as max_results needs are requested
+    events = get_calendar_client().iter_events(
+        calendar_id, 'list_upcoming_events',
+        timeMin=now,
+        maxResults=min(max_results, PAGE_SIZE),
+        singleEvents=True,
+        orderBy='startTime',
+        timeZone=time_zone,
+        fields='nextPageToken,items(summary,start)')
     return [{
         'summary': event.get('summary'),
         'start': event['start'].get('dateTime', event['start'].get('date'))
-    } for event in events]
+    } for event in itertools.islice(events, max_results)]
 
-def create_event(
+def _to_rfc3339(value: str) -> str:
+    """Accept either an RFC3339 string or epoch seconds (as returned in compact slot lists)."""
+    value = str(value).strip()
+    if value.isdigit():
+        return datetime.datetime.fromtimestamp(int(value), ZoneInfo(time_zone)).isoformat()
+    return value
+
+def _to_epoch(value: str) -> int:
+    """Epoch seconds for an RFC3339 string or epoch seconds."""
+    return int(datetime.datetime.fromisoformat(_to_rfc3339(value).replace('Z', '+00:00')).timestamp())
+
+def _event_id(calendar: str, summary: str, start_time: str, end_time: str,
+              description: Optional[str], attendees: Optional[List[str]]) -> str:
+    """
+    Deterministic event ID for a booking request, so a retried create_event
+    call cannot insert the same booking twice.
+
+    Calendar event IDs must use base32hex characters (0-9, a-v); a hex digest qualifies.
+    """
+    start_ts = datetime.datetime.fromisoformat(start_time.replace('Z', '+00:00')).timestamp()
+    end_ts = datetime.datetime.fromisoformat(end_time.replace('Z', '+00:00')).timestamp()
+    key = "|".join([
+        calendar, summary, str(int(start_ts)), str(int(end_ts)),
+        description or "", ",".join(sorted(email.lower() for email in attendees or [])),
+    ])
+    return "bk" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _can_invite_attendees(service_account_email: str) -> bool:
+    """Whether to send attendees with the insert, from config or what an earlier insert taught us."""
+    if CAN_INVITE_ATTENDEES:
+        return CAN_INVITE_ATTENDEES.lower() == 'true'
+    return _attendee_support.get((calendar_id, service_account_email), True)
+
+
+def _is_attendee_rejection(error_text: str) -> bool:
+    return "Service accounts cannot invite attendees" in error_text
+
+
+def _build_event(
     summary: str,
     start_time: str,
     end_time: str,
-    description: Optional[str] = None,
-    attendees: Optional[List[str]] = None
-):
+    description: Optional[str],
+    attendees: Optional[List[str]] = None,
+    invite_attendees: bool = True
+) -> dict:
     """
-    Create a new event on the specified Google Calendar.
-    Args:
-        summary (str): The event title.
-        start_time (str): RFC3339 start time (e.g., '2025-04-28T10:00:00-07:00').
-        end_time (str): RFC3339 end time (e.g., '2025-04-28T11:00:00-07:00').
-        description (str, optional): Event description.
-        attendees (List[str], optional): List of attendee email addresses.
-                  Note: Adding attendees requires Domain-Wide Delegation for service accounts.
-                  If you encounter a 403 error, try without attendees.
-    Returns:
-        dict: Created event's summary and htmlLink.
+    Build the complete events().insert body shared by the sync and async tools.
+
+    The body carries a deterministic ID and its final description, so one
+    insert is all that is needed. If attendees cannot be invited they are
+    listed in the description for manual follow-up instead.
     """
-    service = get_calendar_service()
+    start_time = _to_rfc3339(start_time)
+    end_time = _to_rfc3339(end_time)
+    event_id = _event_id(calendar_id, summary, start_time, end_time, description, attendees)
     
     # Parse the start time to extract date information for clarity
     start_dt = datetime.datetime.fromisoformat(start_time.replace('Z', '+00:00'))
@@ -74,6 +152,7 @@ def create_event(
         summary = f"{summary} ({start_dt.year})"
         
     event = {
+        'id': event_id,
         'summary': summary,
         'start': {'dateTime': start_time, 'timeZone': time_zone},
         'end': {'dateTime': end_time, 'timeZone': time_zone},
@@ -90,48 +169,336 @@ def create_event(
     desc_parts.append(f"Date: {date_str}")
     desc_parts.append(f"Time: {time_str}")
     
+    if attendees and invite_attendees:
+        event['attendees'] = [{'email': email} for email in attendees]
+    elif attendees:
+        desc_parts.append(f"Could not automatically add attendees. Please manually invite: {', '.join(attendees)}")
+    
     event['description'] = "\n\n".join(desc_parts)
+    return event
+
+
+ATTENDEES_WARNING = "Service account cannot add attendees. You'll need to add them manually or enable Domain-Wide Delegation."
+
+
+def _created_response(created_event: dict, attendees: Optional[List[str]], invited: bool) -> dict:
+    response = {
+        'summary': created_event.get('summary'),
+        'htmlLink': created_event.get('htmlLink'),
+        'event_id': created_event.get('id'),
+    }
+    if attendees and not invited:
+        response['attendees_warning'] = ATTENDEES_WARNING
+    return response
+
+
+def _insert_event(client, event: dict) -> dict:
+    """
+    Insert an event, treating an existing event with the same ID as success.
+
+    A 409 means an earlier attempt of this booking already succeeded; that
+    event is returned (and restored if it had been cancelled).
+    """
+    service = client.service
+    try:
+        return client.execute(service.events().insert(calendarId=calendar_id, body=event), 'create_event')
+    except HttpError as e:
+        if e.resp.status != 409:
+            raise
+    return _existing_event(client, event)
+
+
+def _existing_event(client, event: dict) -> dict:
+    """Return the event an earlier insert with the same ID created, restoring it if cancelled."""
+    service = client.service
+    existing = client.execute(
+        service.events().get(calendarId=calendar_id, eventId=event['id']), 'create_event_existing')
+    if existing.get('status') == 'cancelled':
+        return client.execute(
+            service.events().update(calendarId=calendar_id, eventId=event['id'], body=dict(event, status='confirmed')),
+            'create_event_existing')
+    return existing
+
+
+def _slot_taken_response() -> dict:
+    return {
+        'slot_unavailable': True,
+        'message': "This slot has just been reserved by someone else. Please offer the user another slot."
+    }
+
+
+def _no_holder_response() -> dict:
+    return {
+        'error': 'no_session',
+        'message': "This conversation has no session to hold slots for. Book the slot directly instead."
+    }
+
+
+def create_event(
+    summary: str,
+    start_time: str,
+    end_time: str,
+    description: Optional[str] = None,
+    attendees: Optional[List[str]] = None,
+    tool_context: Optional[ToolContext] = None
+):
+    """
+    Create a new event on the specified Google Calendar.
+    Safe to retry: repeating a call with the same arguments returns the event
+    created the first time instead of booking it twice.
+    Args:
+        summary (str): The event title.
+        start_time (str): RFC3339 start time (e.g., '2025-04-28T10:00:00-07:00'),
+                          or epoch seconds from a compact slot list.
+        end_time (str): RFC3339 end time (e.g., '2025-04-28T11:00:00-07:00'),
+                        or epoch seconds.
+        description (str, optional): Event description.
+        attendees (List[str], optional): List of attendee email addresses.
+                  Note: Adding attendees requires Domain-Wide Delegation for service accounts.
+                  Without it, attendees are listed in the description for manual invitation.
+    Returns:
+        dict: Created event's summary, htmlLink and event_id, or 'slot_unavailable'
+              if another conversation is holding the slot.
+    """
+    client = get_calendar_client()
+    account = client.credentials.service_account_email
+    invite = bool(attendees) and _can_invite_attendees(account)
+    event = _build_event(summary, start_time, end_time, description, attendees, invite)
+    
+    # Callers outside a conversation hold the slot under the booking's own ID
+    holder = lease_holder(tool_context) or event['id']
+    start_ts, end_ts = _to_epoch(start_time), _to_epoch(end_time)
+    if not acquire_slot(calendar_id, start_ts, end_ts, holder)['acquired']:
+        return _slot_taken_response()
     
-    # First try to create the event with attendees if provided
-    event_with_attendees = event.copy()
-    if attendees:
-        event_with_attendees['attendees'] = [{'email': email} for email in attendees]
-        
     try:
-        # Try to create event with attendees first
-        if attendees:
-            created_event = service.events().insert(calendarId=calendar_id, body=event_with_attendees).execute()
-        else:
-            created_event = service.events().insert(calendarId=calendar_id, body=event).execute()
-            
-        return {
-            'summary': created_event.get('summary'),
-            'htmlLink': created_event.get('htmlLink')
-        }
-    except Exception as e:
-        # If failed and has attendees, try again without attendees
-        if attendees and "Service accounts cannot invite attendees" in str(e):
+        try:
+            created_event = _insert_event(client, event)
+        except HttpError as e:
+            if not (invite and _is_attendee_rejection(str(e))):
+                raise
+            # Remember the rejection so later bookings skip straight to a single insert
             print(f"Warning: Service account cannot add attendees without Domain-Wide Delegation. Creating event without attendees.")
-            # Create without attendees
-            created_event = service.events().insert(calendarId=calendar_id, body=event).execute()
-            
-            # Add note about attendees in description
-            if description:
-                event['description'] = f"{description}\n\nCould not automatically add attendees. Please manually invite: {', '.join(attendees)}"
-            else:
-                event['description'] = f"Could not automatically add attendees. Please manually invite: {', '.join(attendees)}"
-                
-            # Update the event with the new description
-            service.events().update(calendarId=calendar_id, eventId=created_event['id'], body=event).execute()
-            
-            return {
-                'summary': created_event.get('summary'),
-                'htmlLink': created_event.get('htmlLink'),
-                'attendees_warning': "Service account cannot add attendees. You'll need to add them manually or enable Domain-Wide Delegation."
-            }
-        else:
-            # If it's a different error, re-raise
-            raise
+            _attendee_support[(calendar_id, account)] = False
+            invite = False
+            event = _build_event(summary, start_time, end_time, description, attendees, invite)
+            created_event = _insert_event(client, event)
+    except Exception:
+        release_slot(calendar_id, start_ts, holder)
+        raise
+    
+    if invite:
+        _attendee_support[(calendar_id, account)] = True
+    get_availability_cache().invalidate()
+    confirm_slot(calendar_id, start_ts, end_ts, holder, created_event.get('id'))
+    return _created_response(created_event, attendees, invite)
+
+
+def _operation_request(service, operation: dict):
+    action = operation['action']
+    if action == 'create':
+        return service.events().insert(calendarId=calendar_id, body=operation['event'])
+    if action == 'update':
+        return service.events().patch(calendarId=calendar_id, eventId=operation['event_id'], body=operation['event'])
+    if action == 'cancel':
+        return service.events().delete(calendarId=calendar_id, eventId=operation['event_id'])
+    raise ValueError(f"Unknown event operation: {action}")
+
+
+def _error_status(error: Exception) -> Optional[int]:
+    if isinstance(error, HttpError):
+        return error.resp.status
+    if isinstance(error, CalendarApiError):
+        return error.status
+    return None
+
+
+def _operation_result(operation: dict, response: Optional[dict], error: Optional[Exception]) -> dict:
+    result = {
+        'action': operation['action'],
+        'event_id': operation.get('event_id') or operation.get('event', {}).get('id'),
+        'ok': error is None,
+    }
+    if error is not None:
+        result['error'] = str(error)
+    elif response and response.get('htmlLink'):
+        result['htmlLink'] = response['htmlLink']
+    return result
+
+
+def _operations_applied(operations: List[dict], results: List[dict]) -> List[dict]:
+    """Bookkeeping shared by the sync and async bulk paths once the requests have run."""
+    cancelled = [result['event_id'] for result in results if result['ok'] and result['action'] == 'cancel']
+    clear_booked_slots(calendar_id, cancelled)
+    if any(result['ok'] for result in results):
+        get_availability_cache().invalidate()
+    failed = sum(not result['ok'] for result in results)
+    print(f"Applied {len(operations)} event operation(s): {len(operations) - failed} succeeded, {failed} failed")
+    return results
+
+
+def apply_event_operations(operations: List[dict]) -> List[dict]:
+    """
+    Create, update or cancel many events with Calendar batch requests
+    (up to 50 operations per HTTP round trip instead of one each).
+    
+    Args:
+        operations: One dict per operation:
+            {'action': 'create', 'event': <events.insert body, with an 'id'>}
+            {'action': 'update', 'event_id': ..., 'event': <fields to patch>}
+            {'action': 'cancel', 'event_id': ...}
+    
+    Returns:
+        list: One result per operation, in order: action, event_id, ok and
+              htmlLink or error. A failed operation does not stop the others.
+    """
+    client = get_calendar_client()
+    outcomes = client.execute_batch(
+        [_operation_request(client.service, operation) for operation in operations], 'event_batch')
+    results = []
+    for operation, (response, error) in zip(operations, outcomes):
+        status = _error_status(error)
+        if operation['action'] == 'create' and status == 409:
+            # An earlier attempt already created this event
+            try:
+                response, error = _existing_event(client, operation['event']), None
+            except HttpError as e:
+                error = e
+        elif operation['action'] == 'cancel' and status == 410:
+            # Already cancelled
+            error = None
+        results.append(_operation_result(operation, response, error))
+    return _operations_applied(operations, results)
+
+
+def _session_events(
+    summary: str,
+    start_times: List[str],
+    slot_duration_minutes: int,
+    description: Optional[str],
+    attendees: Optional[List[str]],
+    invite: bool
+) -> List[Tuple[int, int, dict]]:
+    sessions = []
+    for start_time in start_times:
+        start_ts = _to_epoch(start_time)
+        end_ts = start_ts + slot_duration_minutes * 60
+        sessions.append((start_ts, end_ts, _build_event(
+            summary, str(start_ts), str(end_ts), description, attendees, invite)))
+    return sessions
+
+
+def _session_results(
+    sessions: List[Tuple[int, int, dict]],
+    results: List[Optional[dict]],
+    attendees: Optional[List[str]] = None,
+    invited: bool = False
+) -> dict:
+    """Per-session results plus totals, shared by the sync and async book_sessions."""
+    items = []
+    for (start_ts, _, _), result in zip(sessions, results):
+        item = {'start': _utc_rfc3339(start_ts)}
+        item.update(result or {'ok': False, 'slot_unavailable': True})
+        item.pop('action', None)
+        items.append(item)
+    booked = sum(item['ok'] for item in items)
+    response = {'booked': booked, 'failed': len(items) - booked, 'results': items}
+    if attendees and not invited:
+        response['attendees_warning'] = ATTENDEES_WARNING
+    return response
+
+
+def book_sessions(
+    summary: str,
+    start_times: List[str],
+    slot_duration_minutes: int = 30,
+    description: Optional[str] = None,
+    attendees: Optional[List[str]] = None,
+    tool_context: Optional[ToolContext] = None
+) -> dict:
+    """
+    Book a series of sessions (e.g. a weekly course) in one go.
+    Safe to retry: sessions that were already booked are not booked twice.
+    Args:
+        summary (str): The event title used for every session.
+        start_times (List[str]): RFC3339 start time or epoch seconds of each session.
+        slot_duration_minutes (int): Length of each session in minutes (default 30).
+        description (str, optional): Event description.
+        attendees (List[str], optional): List of attendee email addresses.
+    Returns:
+        dict: 'booked' and 'failed' counts, and per-session 'results' with
+              event_id and htmlLink, or the error / slot_unavailable flag.
+    """
+    client = get_calendar_client()
+    account = client.credentials.service_account_email
+    invite = bool(attendees) and _can_invite_attendees(account)
+    sessions = _session_events(summary, start_times, slot_duration_minutes, description, attendees, invite)
+    if not sessions:
+        return _session_results(sessions, [])
+    
+    holder = lease_holder(tool_context) or sessions[0][2]['id']
+    acquired = acquire_slots(calendar_id, [(start_ts, end_ts) for start_ts, end_ts, _ in sessions], holder)
+    pending = [index for index, ok in enumerate(acquired) if ok]
+    results: List[Optional[dict]] = [None] * len(sessions)
+    
+    operations = [{'action': 'create', 'event': sessions[index][2]} for index in pending]
+    for index, result in zip(pending, apply_event_operations(operations)):
+        results[index] = result
+    
+    rejected = [index for index in pending
+                if invite and not results[index]['ok'] and _is_attendee_rejection(results[index]['error'])]
+    if rejected:
+        print(f"Warning: Service account cannot add attendees without Domain-Wide Delegation. Creating events without attendees.")
+        _attendee_support[(calendar_id, account)] = False
+        invite = False
+        retry = _session_events(
+            summary, [str(sessions[index][0]) for index in rejected], slot_duration_minutes, description, attendees, False)
+        for index, result in zip(rejected, apply_event_operations([{'action': 'create', 'event': event} for _, _, event in retry])):
+            results[index] = result
+    elif invite and any(results[index]['ok'] for index in pending):
+        _attendee_support[(calendar_id, account)] = True
+    
+    for index in pending:
+        if not results[index]['ok']:
+            release_slot(calendar_id, sessions[index][0], holder)
+    confirm_slots(calendar_id, [
+        (sessions[index][0], sessions[index][1], results[index]['event_id']) for index in pending if results[index]['ok']
+    ], holder)
+    return _session_results(sessions, results, attendees, invite)
+
+
+def hold_slot(start_time: str, end_time: str, tool_context: ToolContext) -> dict:
+    """
+    Reserve the slot the user picked while the booking is completed, so other
+    conversations cannot book it. Any slot this conversation held before is released.
+    Args:
+        start_time (str): RFC3339 start time, or epoch seconds from a compact slot list.
+        end_time (str): RFC3339 end time, or epoch seconds.
+    Returns:
+        dict: 'held' and how long the hold lasts, 'slot_unavailable' if someone else holds it,
+              or an 'error' if the conversation has no session.
+    """
+    holder = lease_holder(tool_context)
+    if not holder:
+        return _no_holder_response()
+    start_ts = _to_epoch(start_time)
+    if not acquire_slot(calendar_id, start_ts, _to_epoch(end_time), holder)['acquired']:
+        return _slot_taken_response()
+    release_slots(calendar_id, holder, keep_start_ts=start_ts)
+    return {'held': True, 'expires_in_seconds': SLOT_LEASE_TTL_SECONDS}
+
+
+def release_slot_holds(tool_context: ToolContext) -> dict:
+    """
+    Release any slot this conversation is holding, e.g. when the user decides
+    not to book or the conversation ends.
+    Returns:
+        dict: The number of holds released, or an 'error' if the conversation has no session.
+    """
+    holder = lease_holder(tool_context)
+    if not holder:
+        return _no_holder_response()
+    return {'released': release_slots(calendar_id, holder)}
 
 def ensure_rfc3339_z(dt: str) -> str:
     # If already ends with Z, return as is
@@ -148,141 +515,145 @@ def ensure_rfc3339_z(dt: str) -> str:
     raise ValueError(f"Invalid datetime string: {dt}")
 
 
-def get_all_available_slots(
-    slot_duration_minutes: int = 30,
-    weeks_ahead: int = 3,
-    start_from_date_iso: str = ""
-) -> dict:
+def _utc_rfc3339(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _stream_busy_intervals(start_ts: float, end_ts: float) -> Iterator[Interval]:
     """
-    Find all available time slots for the next specified weeks.
-    
-    Args:
-        slot_duration_minutes (int): Duration of each slot in minutes (default 30)
-        weeks_ahead (int): Number of weeks to look ahead (default 3)
-        start_from_date_iso (str, optional): If provided, only show slots from this date forward (ISO format)
-        
-    Returns:
-        dict: Dictionary containing all slots, slots grouped by date, and total count
+    Lazily fetch merged busy intervals in a window, one events().list page at a time.
+
+    Events are requested in start order with a minimal field projection, so
+    they can be merged as they arrive without holding the window in memory.
     """
-    # Get the current date/time in the correct timezone
-    tz = ZoneInfo(time_zone)
-    now = datetime.datetime.now(tz)
-    
-    print(f"Current datetime in {time_zone}: {now.isoformat()}")
+    events = get_calendar_client().iter_events(
+        calendar_id, 'availability_stream',
+        timeMin=_utc_rfc3339(start_ts),
+        timeMax=_utc_rfc3339(end_ts),
+        singleEvents=True,
+        orderBy='startTime',
+        maxResults=PAGE_SIZE,
+        fields=BUSY_EVENT_FIELDS)
+    return merge_sorted_intervals(
+        interval for interval in map(event_busy_interval, events) if interval is not None)
+
+
+def _fetch_busy_intervals(start_ts: float, end_ts: float) -> List[Interval]:
+    """Merged busy intervals in a window; concurrent identical lookups share one fetch."""
+    return availability_flight.do(
+        ('events', calendar_id, start_ts, end_ts), lambda: list(_stream_busy_intervals(start_ts, end_ts)))
+
+
+def _fetch_freebusy(calendars: List[str], start_ts: float, end_ts: float) -> Tuple[Dict[str, List[Interval]], dict]:
+    """CalendarClient.freebusy(); concurrent identical lookups share one request."""
+    return availability_flight.do(
+        ('freebusy', tuple(calendars), start_ts, end_ts),
+        lambda: get_calendar_client().freebusy(calendars, start_ts, end_ts))
+
+
+def _slot_candidates(
+    rules_set: AvailabilityRules,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    slot_duration_minutes: int,
+    now: datetime.datetime
+) -> Tuple[CompiledRules, List[Candidate], float, float]:
+    """Return the compiled rules, candidate slots and the busy-data window they need (no I/O)."""
+    rules = rules_set.compile(slot_duration_minutes)
+    candidates = rules.candidate_slots(start_date, end_date, now)
+    if not candidates:
+        return rules, candidates, 0.0, 0.0
+    return rules, candidates, candidates[0][0] - rules.buffer_seconds, candidates[-1][1] + rules.buffer_seconds
+
+
+def _other_calendars(calendar_ids: Optional[List[str]]) -> List[str]:
+    """Distinct calendar IDs besides the booking calendar, in the order given."""
+    return [calendar for calendar in dict.fromkeys(calendar_ids or []) if calendar and calendar != calendar_id]
+
+
+def _calendar_busy_lists(freebusy: Tuple[Dict[str, List[Interval]], dict], calendars: List[str]) -> List[List[Interval]]:
+    """Per-calendar busy lists from CalendarClient.freebusy(); unreadable calendars are an error."""
+    busy, errors = freebusy
+    if errors:
+        raise ValueError(f"Could not read free/busy information for: {', '.join(sorted(errors))}")
+    return [busy.get(calendar, []) for calendar in calendars]
+
+
+def iter_available_slots(
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    slot_duration_minutes: int,
+    now: datetime.datetime,
+    holder: Optional[str] = None,
+    calendar_ids: Optional[List[str]] = None
+) -> Iterator[Tuple[datetime.datetime, datetime.datetime]]:
+    """
+    Lazily yield free (slot_start, slot_end) pairs starting in [start_date, end_date), in order.
+
+    Busy data comes from the availability cache, or is fetched from the
+    Calendar API when the cache is disabled; concurrent lookups of the same
+    window share one fetch. Slots held by conversations other than holder are
+    left out.
+
+    Any other calendar_ids must be free as well. Their busy periods come from
+    batched FreeBusy queries and are k-way merged with the booking calendar's.
+    """
+    rules, candidates, busy_start, busy_end = _slot_candidates(
+        get_availability_rules(), start_date, end_date, slot_duration_minutes, now)
+    if not candidates:
+        return
     
-    # If start_from_date is not provided, calculate next Tuesday (May 13, 2025)
-    if not start_from_date_iso:
-        # Find next Tuesday (weekday 1)
-        days_until_next_tuesday = (1 - now.weekday()) % 7
-        if days_until_next_tuesday == 0:  # If today is Tuesday, use next week
-            days_until_next_tuesday = 7
-            
-        # Calculate the date for next Tuesday
-        next_tuesday = now + datetime.timedelta(days=days_until_next_tuesday)
-        
-        # Set to midnight of next Tuesday
-        start_date = datetime.datetime(
-            next_tuesday.year, next_tuesday.month, next_tuesday.day, 0, 0, 0, 
-            tzinfo=tz
-        )
-        print(f"Starting from next Tuesday: {start_date.strftime('%A, %B %d, %Y')}")
+    busy: Iterable[Interval]
+    if USE_AVAILABILITY_CACHE:
+        # Merged busy intervals from memory; the cache syncs incrementally when stale
+        busy = get_availability_cache().busy_intervals(busy_start, busy_end)
     else:
-        # Parse the provided ISO date string
-        try:
-            start_date = datetime.datetime.fromisoformat(start_from_date_iso)
-            # Ensure timezone is set
-            if start_date.tzinfo is None:
-                start_date = start_date.replace(tzinfo=tz)
-            print(f"Starting from provided date: {start_date.strftime('%A, %B %d, %Y')}")
-        except ValueError:
-            # If parsing fails, fall back to next Tuesday
-            days_until_next_tuesday = (1 - now.weekday()) % 7
-            if days_until_next_tuesday == 0:
-                days_until_next_tuesday = 7
-            next_tuesday = now + datetime.timedelta(days=days_until_next_tuesday)
-            start_date = datetime.datetime(
-                next_tuesday.year, next_tuesday.month, next_tuesday.day, 0, 0, 0, 
-                tzinfo=tz
-            )
-            print(f"Invalid date format, falling back to next Tuesday: {start_date.strftime('%A, %B %d, %Y')}")
-    
-    # Set to X weeks from the start date at midnight
-    end_date = start_date + datetime.timedelta(weeks=weeks_ahead)
-    
-    print(f"Searching for slots from {start_date.isoformat()} to {end_date.isoformat()}")
-    
-    # Format dates to ISO strings with Z for API calls
-    start_time_window = start_date.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-    end_time_window = end_date.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        busy = _fetch_busy_intervals(busy_start, busy_end)
     
-    # Get calendar service
-    service = get_calendar_service()
+    others = _other_calendars(calendar_ids)
+    if others:
+        freebusy = _fetch_freebusy(others, busy_start, busy_end)
+        busy = merge_busy_lists([busy, *_calendar_busy_lists(freebusy, others)])
     
-    # Fetch existing events in the date range
-    existing_events = service.events().list(
-        calendarId=calendar_id,
-        timeMin=start_time_window,
-        timeMax=end_time_window,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-    
-    # Create a list of busy time slots from existing events
-    busy_slots = []
-    for event in existing_events.get('items', []):
-        if 'dateTime' in event['start'] and 'dateTime' in event['end']:
-            start = datetime.datetime.fromisoformat(
-                event['start']['dateTime'].replace('Z', '+00:00')
-            ).astimezone(tz)
-            end = datetime.datetime.fromisoformat(
-                event['end']['dateTime'].replace('Z', '+00:00')
-            ).astimezone(tz)
-            busy_slots.append((start, end))
-    
-    print(f"Found {len(busy_slots)} existing events in calendar")
-    
-    # Generate all possible slots for Tuesdays and Thursdays
-    all_slots = []
-    current_date = start_date
-    while current_date < end_date:
-        # Only consider Tuesdays (1) and Thursdays (3)
-        if current_date.weekday() in [1, 3]:
-            # Add slots at 18:00 and 18:30
-            for hour, minute in [(18, 0), (18, 30)]:
-                slot_start = current_date.replace(hour=hour, minute=minute)
-                slot_end = slot_start + datetime.timedelta(minutes=slot_duration_minutes)
-                
-                # Skip slots that are in the past
-                if slot_start < now:
-                    continue
-                
-                # Check if slot overlaps with any existing event
-                is_available = True
-                for busy_start, busy_end in busy_slots:
-                    # Check for overlap
-                    if max(slot_start, busy_start) < min(slot_end, busy_end):
-                        is_available = False
-                        print(f"Slot {slot_start.strftime('%Y-%m-%d %H:%M')} is busy")
-                        break
-                        
-                if is_available:
-                    # Convert to UTC for storage
-                    slot_start_utc = slot_start.astimezone(datetime.timezone.utc)
-                    slot_end_utc = slot_end.astimezone(datetime.timezone.utc)
-                    
-                    all_slots.append({
-                        "start": slot_start_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                        "end": slot_end_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                        "display": f"{slot_start.strftime('%A, %d %b %Y, %H:%M')}-{slot_end.strftime('%H:%M')}",
-                        "date": slot_start.strftime("%d %b %Y"),
-                        "day": slot_start.strftime("%A"),
-                        "time": f"{slot_start.strftime('%H:%M')}-{slot_end.strftime('%H:%M')}"
-                    })
-                    print(f"Added available slot: {slot_start.strftime('%A, %d %b %Y, %H:%M')}-{slot_end.strftime('%H:%M')}")
-        
-        # Move to next day
-        current_date = current_date + datetime.timedelta(days=1)
+    leased = leased_intervals(calendar_id, candidates[0][0], candidates[-1][1], holder)
     
+    # Keep the candidates that do not overlap any busy period or held slot (linear sweeps)
+    for _, _, slot_start, slot_end in free_slots(free_slots(candidates, rules.with_buffer(busy)), leased):
+        yield slot_start, slot_end
+
+
+def _resolve_start(start_from_date_iso: str, now: datetime.datetime, tz: ZoneInfo) -> datetime.datetime:
+    """Parse an optional ISO start date in tz, falling back to now."""
+    if not start_from_date_iso:
+        return now
+    try:
+        start_date = datetime.datetime.fromisoformat(start_from_date_iso)
+        # Ensure timezone is set
+        if start_date.tzinfo is None:
+            start_date = start_date.replace(tzinfo=tz)
+        print(f"Starting from provided date: {start_date.strftime('%A, %B %d, %Y')}")
+        return start_date
+    except ValueError:
+        print(f"Invalid date format, falling back to today: {now.strftime('%A, %B %d, %Y')}")
+        return now
+
+
+def _slot_payload(slot_start: datetime.datetime, slot_end: datetime.datetime) -> dict:
+    # Convert to UTC for storage
+    slot_start_utc = slot_start.astimezone(datetime.timezone.utc)
+    slot_end_utc = slot_end.astimezone(datetime.timezone.utc)
+    return {
+        "start": slot_start_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "end": slot_end_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "display": f"{slot_start.strftime('%A, %d %b %Y, %H:%M')}-{slot_end.strftime('%H:%M')}",
+        "date": slot_start.strftime("%d %b %Y"),
+        "day": slot_start.strftime("%A"),
+        "time": f"{slot_start.strftime('%H:%M')}-{slot_end.strftime('%H:%M')}"
+    }
+
+
+def _group_by_date(all_slots: List[dict]) -> Tuple[dict, List[str]]:
+    """Group slot payloads by date and render one display line per date."""
     # Group slots by date for easier display
     grouped_slots = {}
     for slot in all_slots:
@@ -311,12 +682,210 @@ def get_all_available_slots(
             
             # Create the full entry
             formatted_display.append(f"{formatted_date} at {time_str}")
-    
-    print(f"Total available slots: {len(all_slots)}")
-            
+    return grouped_slots, formatted_display
+
+
+def _compact_response(
+    slots: List[Tuple[datetime.datetime, datetime.datetime]],
+    slot_duration_minutes: int
+) -> dict:
+    """
+    Build the compact slot payload: epoch start times plus one rendered line per date.
+
+    Each slot is referenced only by its start in epoch seconds; the end is
+    start + slot_minutes * 60. The payload size and a rough token estimate
+    (about 4 bytes per token) are attached.
+    """
+    display = []
+    for date, day_slots in itertools.groupby(slots, key=lambda slot: slot[0].date()):
+        times = " and ".join(f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in day_slots)
+        display.append(f"**{date.strftime('%A, %B %d, %Y')}** at {times}")
+    payload = {
+        'slot_minutes': slot_duration_minutes,
+        'starts': [int(start.timestamp()) for start, _ in slots],
+        'display': display,
+        'total_slots': len(slots),
+    }
+    payload_bytes = len(json.dumps(payload, separators=(',', ':')))
+    payload['payload_bytes'] = payload_bytes
+    payload['approx_tokens'] = payload_bytes // 4
+    return payload
+
+
+def _full_response(free: List[Tuple[datetime.datetime, datetime.datetime]]) -> dict:
+    """Build the full get_all_available_slots payload."""
+    all_slots = [_slot_payload(slot_start, slot_end) for slot_start, slot_end in free]
+    grouped_slots, formatted_display = _group_by_date(all_slots)
     return {
         'all_slots': all_slots,
         'grouped_by_date': grouped_slots,
         'total_slots': len(all_slots),
         'formatted_display': formatted_display
-    } 
\ No newline at end of file
+    }
+
+
+def _snapshot_response(
+    slot_duration_minutes: int,
+    weeks_ahead: int,
+    start_from_date_iso: str,
+    compact: bool,
+    calendar_ids: Optional[List[str]],
+    holder: Optional[str]
+) -> Optional[dict]:
+    """
+    Answer get_all_available_slots from the background availability snapshot.
+
+    Returns None (so the caller does a live lookup) for requests the snapshot
+    does not cover, or when it is missing, too old or older than the last
+    invalidation. When this instance has no recent snapshot, the shared one
+    is tried first. Slots held by other conversations are still filtered out,
+    using the in-memory lease copy (see slot_leases) rather than a query.
+    """
+    if not SNAPSHOT_ENABLED or start_from_date_iso or _other_calendars(calendar_ids):
+        return None
+    snapshots = get_availability_snapshots()
+    snapshot = snapshots.current
+    rules_set = get_availability_rules()
+    rules = rules_set.compile(slot_duration_minutes)
+    generation = get_availability_cache().generation
+    if snapshot is None and slot_duration_minutes == SNAPSHOT_SLOT_MINUTES:
+        snapshot = load_shared_snapshot(
+            calendar_id, rules_set.fingerprint, slot_duration_minutes, ZoneInfo(time_zone), generation)
+        if snapshot is not None:
+            snapshots.install(snapshot)
+    if (snapshot is None
+            or snapshot.slot_minutes != slot_duration_minutes
+            or snapshot.rules_fingerprint != rules_set.fingerprint
+            or snapshot.generation != generation
+            or weeks_ahead * 7 * 86400 + time.time() > snapshot.free_until):
+        snapshots.record_served(False)
+        return None
+    
+    now = time.time()
+    lower, upper = snapshot.window(now + rules.min_notice.total_seconds(), now + weeks_ahead * 7 * 86400)
+    candidates = snapshot.free[lower:upper]
+    leased = leased_intervals(calendar_id, candidates[0][0], candidates[-1][1], holder) if candidates else []
+    snapshots.record_served(True)
+    if leased:
+        candidates = list(free_slots(candidates, leased))
+        key = None
+    else:
+        key = (compact, lower, upper)
+    
+    def render() -> dict:
+        free = [(slot_start, slot_end) for _, _, slot_start, slot_end in candidates]
+        return _compact_response(free, slot_duration_minutes) if compact else _full_response(free)
+    
+    response = render() if key is None else snapshot.rendered(key, render)
+    print(f"Served {response['total_slots']} slot(s) from the availability snapshot ({snapshot.age_seconds():.0f}s old)")
+    return dict(response)
+
+
+def get_all_available_slots(
+    slot_duration_minutes: int = 30,
+    weeks_ahead: int = 3,
+    start_from_date_iso: str = "",
+    compact: bool = False,
+    calendar_ids: Optional[List[str]] = None,
+    tool_context: Optional[ToolContext] = None
+) -> dict:
+    """
+    Find all available time slots for the next specified weeks.
+    
+    Args:
+        slot_duration_minutes (int): Duration of each slot in minutes (default 30)
+        weeks_ahead (int): Number of weeks to look ahead (default 3)
+        start_from_date_iso (str, optional): If provided, only show slots from this date forward (ISO format)
+        compact (bool, optional): If true, return only epoch start times ('starts') and one
+            display line per date ('display'). Pass a start and start + slot_minutes * 60
+            straight to create_event.
+        calendar_ids (List[str], optional): Other calendars (e.g. co-host, room) that must also
+            be free; the booking calendar is always checked
+        
+    Returns:
+        dict: Dictionary containing all slots, slots grouped by date, and total count
+              (or the compact payload with its size and approximate token count)
+    """
+    holder = lease_holder(tool_context)
+    snapshot_response = _snapshot_response(
+        slot_duration_minutes, weeks_ahead, start_from_date_iso, compact, calendar_ids, holder)
+    if snapshot_response is not None:
+        return snapshot_response
+    
+    # Get the current date/time in the correct timezone
+    tz = ZoneInfo(time_zone)
+    now = datetime.datetime.now(tz)
+    
+    print(f"Current datetime in {time_zone}: {now.isoformat()}")
+    
+    # Start from now unless a start date was provided; the rules' minimum notice
+    # period keeps slots that are too soon out of the results
+    start_date = _resolve_start(start_from_date_iso, now, tz)
+    
+    # Set to X weeks from the start date
+    end_date = start_date + datetime.timedelta(weeks=weeks_ahead)
+    
+    print(f"Searching for slots from {start_date.isoformat()} to {end_date.isoformat()}")
+    
+    free = list(iter_available_slots(
+        start_date, end_date, slot_duration_minutes, now, holder, calendar_ids))
+    print(f"Total available slots: {len(free)}")
+    if compact:
+        return _compact_response(free, slot_duration_minutes)
+    return _full_response(free)
+
+
+def get_next_available_slots(
+    n: int = 3,
+    slot_duration_minutes: int = 30,
+    after_iso: str = "",
+    compact: bool = False,
+    calendar_ids: Optional[List[str]] = None,
+    tool_context: Optional[ToolContext] = None
+) -> dict:
+    """
+    Find the next n available time slots, searching forward one week at a time.
+    Use this when the user asks for the next or earliest opening(s); it stops as
+    soon as n slots are found, so it is faster than get_all_available_slots.
+    
+    Args:
+        n (int): Number of slots to return (default 3)
+        slot_duration_minutes (int): Duration of each slot in minutes (default 30)
+        after_iso (str, optional): If provided, only return slots from this date/time forward (ISO format)
+        compact (bool, optional): If true, return the compact payload described in get_all_available_slots
+        calendar_ids (List[str], optional): Other calendars that must also be free (see get_all_available_slots)
+        
+    Returns:
+        dict: The next slots in chronological order, a formatted display and the number of weeks searched
+    """
+    tz = ZoneInfo(time_zone)
+    now = datetime.datetime.now(tz)
+    window_start = _resolve_start(after_iso, now, tz)
+    
+    holder = lease_holder(tool_context)
+    slots = []
+    weeks_searched = 0
+    while len(slots) < n and weeks_searched < NEXT_SLOTS_MAX_WEEKS:
+        window_end = window_start + datetime.timedelta(weeks=1)
+        for slot_start, slot_end in iter_available_slots(
+                window_start, window_end, slot_duration_minutes, now, holder, calendar_ids):
+            slots.append((slot_start, slot_end))
+            if len(slots) >= n:
+                break
+        window_start = window_end
+        weeks_searched += 1
+    
+    print(f"Found {len(slots)} of {n} requested slots after searching {weeks_searched} week(s)")
+    
+    if compact:
+        response = _compact_response(slots, slot_duration_minutes)
+        response['weeks_searched'] = weeks_searched
+        return response
+    
+    payloads = [_slot_payload(slot_start, slot_end) for slot_start, slot_end in slots]
+    return {
+        'slots': payloads,
+        'total_slots': len(payloads),
+        'formatted_display': _group_by_date(payloads)[1],
+        'weeks_searched': weeks_searched
+    }
@@ -0,0 +1,528 @@
+"""
+Asyncio-native versions of the Calendar tools.
+
+These mirror the tools in google_calendar (same names, arguments and results,
+so the model sees identical tools) but talk to the Calendar REST API through
+the shared keep-alive AsyncCalendarClient instead of blocking a worker thread
+for every HTTP round trip.
+"""
+
+import asyncio
+import datetime
+import time
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from google.adk.tools import ToolContext
+
+from bookings_agent.tools.availability_cache import get_availability_cache
+from bookings_agent.tools.availability_rules import (
+    AvailabilityRules,
+    Candidate,
+    CompiledRules,
+    get_availability_rules_async,
+)
+from bookings_agent.tools.availability_snapshot import (
+    SNAPSHOT_MARGIN_SECONDS,
+    SNAPSHOT_SLOT_MINUTES,
+    SNAPSHOT_WEEKS,
+    AvailabilitySnapshot,
+    claim_shared_refresh,
+    get_availability_snapshots,
+    load_shared_snapshot,
+    mark_shared_snapshot_stale,
+    publish_shared_snapshot,
+)
+from bookings_agent.tools.calendar_client import (
+    BUSY_EVENT_FIELDS,
+    PAGE_SIZE,
+    CalendarApiError,
+    event_busy_interval,
+    get_async_calendar_client,
+)
+from bookings_agent.tools.google_calendar import (
+    NEXT_SLOTS_MAX_WEEKS,
+    USE_AVAILABILITY_CACHE,
+    _attendee_support,
+    _build_event,
+    _calendar_busy_lists,
+    _can_invite_attendees,
+    _compact_response,
+    _created_response,
+    _error_status,
+    _full_response,
+    _group_by_date,
+    _is_attendee_rejection,
+    _no_holder_response,
+    _operation_result,
+    _operations_applied,
+    _other_calendars,
+    _resolve_start,
+    _slot_candidates,
+    _session_events,
+    _session_results,
+    _slot_payload,
+    _slot_taken_response,
+    _snapshot_response,
+    _to_epoch,
+    _utc_rfc3339,
+    calendar_id,
+    time_zone,
+)
+from bookings_agent.tools.singleflight import availability_flight
+from bookings_agent.tools.slot_engine import free_slots, merge_busy_lists, merge_sorted_intervals
+from bookings_agent.tools.slot_leases import (
+    SLOT_LEASE_TTL_SECONDS,
+    acquire_slot,
+    acquire_slots,
+    confirm_slot,
+    confirm_slots,
+    lease_holder,
+    leased_intervals,
+    release_slot,
+    release_slots,
+)
+
+
+async def list_upcoming_events(max_results: int):
+    """
+    Lists the next max_results events on the specified calendar.
+    Args:
+        max_results (int): The maximum number of events to return.
+    """
+    now = datetime.datetime.utcnow().isoformat() + 'Z'  # 'Z' indicates UTC time
+    events = get_async_calendar_client().iter_events(
+        calendar_id, 'list_upcoming_events',
+        timeMin=now,
+        maxResults=min(max_results, PAGE_SIZE),
+        singleEvents=True,
+        orderBy='startTime',
+        timeZone=time_zone,
+        fields='nextPageToken,items(summary,start)')
+    results = []
+    async for event in events:
+        results.append({
+            'summary': event.get('summary'),
+            'start': event['start'].get('dateTime', event['start'].get('date'))
+        })
+        if len(results) >= max_results:
+            break
+    return results
+
+
+async def _insert_event(client, event: dict) -> dict:
+    """Async counterpart of google_calendar._insert_event()."""
+    events_path = client.events_path(calendar_id)
+    try:
+        return await client.request('POST', events_path, 'create_event', body=event)
+    except CalendarApiError as e:
+        if e.status != 409:
+            raise
+    return await _existing_event(client, event)
+
+
+async def _existing_event(client, event: dict) -> dict:
+    """Async counterpart of google_calendar._existing_event()."""
+    events_path = client.events_path(calendar_id)
+    existing = await client.request('GET', f"{events_path}/{event['id']}", 'create_event_existing')
+    if existing.get('status') == 'cancelled':
+        return await client.request(
+            'PUT', f"{events_path}/{event['id']}", 'create_event_existing', body=dict(event, status='confirmed'))
+    return existing
+
+
+async def create_event(
+    summary: str,
+    start_time: str,
+    end_time: str,
+    description: Optional[str] = None,
+    attendees: Optional[List[str]] = None,
+    tool_context: Optional[ToolContext] = None
+):
+    """
+    Create a new event on the specified Google Calendar.
+    Safe to retry: repeating a call with the same arguments returns the event
+    created the first time instead of booking it twice.
+    Args:
+        summary (str): The event title.
+        start_time (str): RFC3339 start time (e.g., '2025-04-28T10:00:00-07:00'),
+                          or epoch seconds from a compact slot list.
+        end_time (str): RFC3339 end time (e.g., '2025-04-28T11:00:00-07:00'),
+                        or epoch seconds.
+        description (str, optional): Event description.
+        attendees (List[str], optional): List of attendee email addresses.
+                  Note: Adding attendees requires Domain-Wide Delegation for service accounts.
+                  Without it, attendees are listed in the description for manual invitation.
+    Returns:
+        dict: Created event's summary, htmlLink and event_id, or 'slot_unavailable'
+              if another conversation is holding the slot.
+    """
+    client = get_async_calendar_client()
+    account = client.calendar_client.credentials.service_account_email
+    invite = bool(attendees) and _can_invite_attendees(account)
+    event = _build_event(summary, start_time, end_time, description, attendees, invite)
+
+    # Callers outside a conversation hold the slot under the booking's own ID
+    holder = lease_holder(tool_context) or event['id']
+    start_ts, end_ts = _to_epoch(start_time), _to_epoch(end_time)
+    lease = await asyncio.to_thread(acquire_slot, calendar_id, start_ts, end_ts, holder)
+    if not lease['acquired']:
+        return _slot_taken_response()
+
+    try:
+        try:
+            created_event = await _insert_event(client, event)
+        except CalendarApiError as e:
+            if not (invite and _is_attendee_rejection(e.message)):
+                raise
+            # Remember the rejection so later bookings skip straight to a single insert
+            print(f"Warning: Service account cannot add attendees without Domain-Wide Delegation. Creating event without attendees.")
+            _attendee_support[(calendar_id, account)] = False
+            invite = False
+            event = _build_event(summary, start_time, end_time, description, attendees, invite)
+            created_event = await _insert_event(client, event)
+    except Exception:
+        await asyncio.to_thread(release_slot, calendar_id, start_ts, holder)
+        raise
+
+    if invite:
+        _attendee_support[(calendar_id, account)] = True
+    get_availability_cache().invalidate()
+    await asyncio.to_thread(confirm_slot, calendar_id, start_ts, end_ts, holder, created_event.get('id'))
+    return _created_response(created_event, attendees, invite)
+
+
+def _operation_call(client, operation: dict) -> dict:
+    events_path = client.events_path(calendar_id)
+    action = operation['action']
+    if action == 'create':
+        return {'method': 'POST', 'path': events_path, 'label': 'create_event', 'body': operation['event']}
+    if action == 'update':
+        return {'method': 'PATCH', 'path': f"{events_path}/{operation['event_id']}", 'label': 'update_event',
+                'body': operation['event']}
+    if action == 'cancel':
+        return {'method': 'DELETE', 'path': f"{events_path}/{operation['event_id']}", 'label': 'cancel_event'}
+    raise ValueError(f"Unknown event operation: {action}")
+
+
+async def apply_event_operations(operations: List[dict]) -> List[dict]:
+    """
+    Async counterpart of google_calendar.apply_event_operations(): the
+    operations are sent over the shared connection pool, CALENDAR_BATCH_CONCURRENCY
+    at a time, instead of as batch HTTP requests.
+    """
+    client = get_async_calendar_client()
+    outcomes = await client.request_many([_operation_call(client, operation) for operation in operations])
+    results = []
+    for operation, (response, error) in zip(operations, outcomes):
+        status = _error_status(error)
+        if operation['action'] == 'create' and status == 409:
+            # An earlier attempt already created this event
+            try:
+                response, error = await _existing_event(client, operation['event']), None
+            except CalendarApiError as e:
+                error = e
+        elif operation['action'] == 'cancel' and status == 410:
+            # Already cancelled
+            error = None
+        results.append(_operation_result(operation, response, error))
+    return await asyncio.to_thread(_operations_applied, operations, results)
+
+
+async def book_sessions(
+    summary: str,
+    start_times: List[str],
+    slot_duration_minutes: int = 30,
+    description: Optional[str] = None,
+    attendees: Optional[List[str]] = None,
+    tool_context: Optional[ToolContext] = None
+) -> dict:
+    """
+    Book a series of sessions (e.g. a weekly course) in one go.
+    Safe to retry: sessions that were already booked are not booked twice.
+    Args:
+        summary (str): The event title used for every session.
+        start_times (List[str]): RFC3339 start time or epoch seconds of each session.
+        slot_duration_minutes (int): Length of each session in minutes (default 30).
+        description (str, optional): Event description.
+        attendees (List[str], optional): List of attendee email addresses.
+    Returns:
+        dict: 'booked' and 'failed' counts, and per-session 'results' with
+              event_id and htmlLink, or the error / slot_unavailable flag.
+    """
+    client = get_async_calendar_client()
+    account = client.calendar_client.credentials.service_account_email
+    invite = bool(attendees) and _can_invite_attendees(account)
+    sessions = _session_events(summary, start_times, slot_duration_minutes, description, attendees, invite)
+    if not sessions:
+        return _session_results(sessions, [])
+
+    holder = lease_holder(tool_context) or sessions[0][2]['id']
+    acquired = await asyncio.to_thread(
+        acquire_slots, calendar_id, [(start_ts, end_ts) for start_ts, end_ts, _ in sessions], holder)
+    pending = [index for index, ok in enumerate(acquired) if ok]
+    results: List[Optional[dict]] = [None] * len(sessions)
+
+    operations = [{'action': 'create', 'event': sessions[index][2]} for index in pending]
+    for index, result in zip(pending, await apply_event_operations(operations)):
+        results[index] = result
+
+    rejected = [index for index in pending
+                if invite and not results[index]['ok'] and _is_attendee_rejection(results[index]['error'])]
+    if rejected:
+        print(f"Warning: Service account cannot add attendees without Domain-Wide Delegation. Creating events without attendees.")
+        _attendee_support[(calendar_id, account)] = False
+        invite = False
+        retry = _session_events(
+            summary, [str(sessions[index][0]) for index in rejected], slot_duration_minutes, description, attendees, False)
+        retry_results = await apply_event_operations([{'action': 'create', 'event': event} for _, _, event in retry])
+        for index, result in zip(rejected, retry_results):
+            results[index] = result
+    elif invite and any(results[index]['ok'] for index in pending):
+        _attendee_support[(calendar_id, account)] = True
+
+    def settle_leases():
+        for index in pending:
+            if not results[index]['ok']:
+                release_slot(calendar_id, sessions[index][0], holder)
+        confirm_slots(calendar_id, [
+            (sessions[index][0], sessions[index][1], results[index]['event_id']) for index in pending if results[index]['ok']
+        ], holder)
+
+    await asyncio.to_thread(settle_leases)
+    return _session_results(sessions, results, attendees, invite)
+
+
+async def hold_slot(start_time: str, end_time: str, tool_context: ToolContext) -> dict:
+    """
+    Reserve the slot the user picked while the booking is completed, so other
+    conversations cannot book it. Any slot this conversation held before is released.
+    Args:
+        start_time (str): RFC3339 start time, or epoch seconds from a compact slot list.
+        end_time (str): RFC3339 end time, or epoch seconds.
+    Returns:
+        dict: 'held' and how long the hold lasts, 'slot_unavailable' if someone else holds it,
+              or an 'error' if the conversation has no session.
+    """
+    holder = lease_holder(tool_context)
+    if not holder:
+        return _no_holder_response()
+    start_ts = _to_epoch(start_time)
+    lease = await asyncio.to_thread(acquire_slot, calendar_id, start_ts, _to_epoch(end_time), holder)
+    if not lease['acquired']:
+        return _slot_taken_response()
+    await asyncio.to_thread(release_slots, calendar_id, holder, start_ts)
+    return {'held': True, 'expires_in_seconds': SLOT_LEASE_TTL_SECONDS}
+
+
+async def release_slot_holds(tool_context: ToolContext) -> dict:
+    """
+    Release any slot this conversation is holding, e.g. when the user decides
+    not to book or the conversation ends.
+    Returns:
+        dict: The number of holds released, or an 'error' if the conversation has no session.
+    """
+    holder = lease_holder(tool_context)
+    if not holder:
+        return _no_holder_response()
+    return {'released': await asyncio.to_thread(release_slots, calendar_id, holder)}
+
+
+async def _fetch_busy_intervals(client, start_ts: float, end_ts: float) -> List[Tuple[float, float]]:
+    """Async counterpart of google_calendar._stream_busy_intervals(), collected into a list."""
+    intervals = []
+    events = client.iter_events(
+        calendar_id, 'availability_stream',
+        timeMin=_utc_rfc3339(start_ts),
+        timeMax=_utc_rfc3339(end_ts),
+        singleEvents=True,
+        orderBy='startTime',
+        maxResults=PAGE_SIZE,
+        fields=BUSY_EVENT_FIELDS)
+    async for event in events:
+        interval = event_busy_interval(event)
+        if interval is not None:
+            intervals.append(interval)
+    return list(merge_sorted_intervals(intervals))
+
+
+async def _free_candidates(
+    rules_set: AvailabilityRules,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    slot_duration_minutes: int,
+    now: datetime.datetime,
+    calendar_ids: Optional[List[str]] = None
+) -> Tuple[CompiledRules, List[Tuple[float, float]], List[Candidate]]:
+    """Compiled rules, merged busy intervals and free candidates (before slot holds are applied)."""
+    rules, candidates, busy_start, busy_end = _slot_candidates(
+        rules_set, start_date, end_date, slot_duration_minutes, now)
+    if not candidates:
+        return rules, [], []
+
+    client = get_async_calendar_client()
+    if USE_AVAILABILITY_CACHE:
+        busy = await get_availability_cache().busy_intervals_async(busy_start, busy_end, client)
+    else:
+        busy = await availability_flight.do_async(
+            ('events', calendar_id, busy_start, busy_end), lambda: _fetch_busy_intervals(client, busy_start, busy_end))
+
+    others = _other_calendars(calendar_ids)
+    if others:
+        freebusy = await availability_flight.do_async(
+            ('freebusy', tuple(others), busy_start, busy_end), lambda: client.freebusy(others, busy_start, busy_end))
+        busy = list(merge_busy_lists([busy, *_calendar_busy_lists(freebusy, others)]))
+
+    return rules, busy, list(free_slots(candidates, rules.with_buffer(busy)))
+
+
+async def _available_slots(
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    slot_duration_minutes: int,
+    now: datetime.datetime,
+    holder: Optional[str] = None,
+    calendar_ids: Optional[List[str]] = None
+) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+    """Async counterpart of google_calendar.iter_available_slots()."""
+    rules_set = await get_availability_rules_async()
+    _, _, candidates = await _free_candidates(rules_set, start_date, end_date, slot_duration_minutes, now, calendar_ids)
+    if not candidates:
+        return []
+    leased = await asyncio.to_thread(leased_intervals, calendar_id, candidates[0][0], candidates[-1][1], holder)
+    return [(slot_start, slot_end) for _, _, slot_start, slot_end in free_slots(candidates, leased)]
+
+
+async def _compute_availability_snapshot(rules_set: AvailabilityRules, generation: int) -> AvailabilitySnapshot:
+    started = time.perf_counter()
+    now = datetime.datetime.now(ZoneInfo(time_zone))
+    end_date = now + datetime.timedelta(weeks=SNAPSHOT_WEEKS, seconds=SNAPSHOT_MARGIN_SECONDS)
+    _, busy, free = await _free_candidates(rules_set, now, end_date, SNAPSHOT_SLOT_MINUTES, now)
+    return AvailabilitySnapshot(
+        rules_set.fingerprint, SNAPSHOT_SLOT_MINUTES, end_date.timestamp(), busy, free, generation,
+        time.perf_counter() - started)
+
+
+async def build_availability_snapshot() -> Optional[AvailabilitySnapshot]:
+    """
+    Produce the availability snapshot served by get_all_available_slots (see availability_snapshot).
+
+    Adopts the shared snapshot when it is still current; otherwise claims the
+    rebuild and computes it from the Calendar API. Returns None when another
+    instance holds the claim, so the caller retries shortly and picks up its result.
+    """
+    generation = get_availability_cache().generation
+    rules_set = await get_availability_rules_async()
+    rules_fingerprint = rules_set.fingerprint
+    latest = get_availability_snapshots().latest
+    if latest is not None and latest.generation != generation:
+        # This instance saw a calendar change since its last snapshot
+        await asyncio.to_thread(mark_shared_snapshot_stale, calendar_id)
+
+    shared = await asyncio.to_thread(
+        load_shared_snapshot, calendar_id, rules_fingerprint, SNAPSHOT_SLOT_MINUTES, ZoneInfo(time_zone), generation)
+    if shared is not None:
+        return shared
+
+    claimed, version = await asyncio.to_thread(claim_shared_refresh, calendar_id)
+    if not claimed:
+        return None
+    snapshot = await _compute_availability_snapshot(rules_set, generation)
+    if version is not None:
+        await asyncio.to_thread(publish_shared_snapshot, calendar_id, snapshot, version)
+    return snapshot
+
+
+async def get_all_available_slots(
+    slot_duration_minutes: int = 30,
+    weeks_ahead: int = 3,
+    start_from_date_iso: str = "",
+    compact: bool = False,
+    calendar_ids: Optional[List[str]] = None,
+    tool_context: Optional[ToolContext] = None
+) -> dict:
+    """
+    Find all available time slots for the next specified weeks.
+
+    Args:
+        slot_duration_minutes (int): Duration of each slot in minutes (default 30)
+        weeks_ahead (int): Number of weeks to look ahead (default 3)
+        start_from_date_iso (str, optional): If provided, only show slots from this date forward (ISO format)
+        compact (bool, optional): If true, return only epoch start times ('starts') and one
+            display line per date ('display'). Pass a start and start + slot_minutes * 60
+            straight to create_event.
+        calendar_ids (List[str], optional): Other calendars (e.g. co-host, room) that must also
+            be free; the booking calendar is always checked
+
+    Returns:
+        dict: Dictionary containing all slots, slots grouped by date, and total count
+              (or the compact payload with its size and approximate token count)
+    """
+    holder = lease_holder(tool_context)
+    snapshot_response = await asyncio.to_thread(
+        _snapshot_response, slot_duration_minutes, weeks_ahead, start_from_date_iso, compact, calendar_ids, holder)
+    if snapshot_response is not None:
+        return snapshot_response
+
+    tz = ZoneInfo(time_zone)
+    now = datetime.datetime.now(tz)
+    start_date = _resolve_start(start_from_date_iso, now, tz)
+    end_date = start_date + datetime.timedelta(weeks=weeks_ahead)
+
+    free = await _available_slots(start_date, end_date, slot_duration_minutes, now, holder, calendar_ids)
+    print(f"Total available slots: {len(free)}")
+    if compact:
+        return _compact_response(free, slot_duration_minutes)
+    return _full_response(free)
+
+
+async def get_next_available_slots(
+    n: int = 3,
+    slot_duration_minutes: int = 30,
+    after_iso: str = "",
+    compact: bool = False,
+    calendar_ids: Optional[List[str]] = None,
+    tool_context: Optional[ToolContext] = None
+) -> dict:
+    """
+    Find the next n available time slots, searching forward one week at a time.
+    Use this when the user asks for the next or earliest opening(s); it stops as
+    soon as n slots are found, so it is faster than get_all_available_slots.
+
+    Args:
+        n (int): Number of slots to return (default 3)
+        slot_duration_minutes (int): Duration of each slot in minutes (default 30)
+        after_iso (str, optional): If provided, only return slots from this date/time forward (ISO format)
+        compact (bool, optional): If true, return the compact payload described in get_all_available_slots
+        calendar_ids (List[str], optional): Other calendars that must also be free (see get_all_available_slots)
+
+    Returns:
+        dict: The next slots in chronological order, a formatted display and the number of weeks searched
+    """
+    tz = ZoneInfo(time_zone)
+    now = datetime.datetime.now(tz)
+    window_start = _resolve_start(after_iso, now, tz)
+
+    holder = lease_holder(tool_context)
+    slots = []
+    weeks_searched = 0
+    while len(slots) < n and weeks_searched < NEXT_SLOTS_MAX_WEEKS:
+        window_end = window_start + datetime.timedelta(weeks=1)
+        slots.extend(await _available_slots(
+            window_start, window_end, slot_duration_minutes, now, holder, calendar_ids))
+        window_start = window_end
+        weeks_searched += 1
+    slots = slots[:n]
+
+    if compact:
+        response = _compact_response(slots, slot_duration_minutes)
+        response['weeks_searched'] = weeks_searched
+        return response
+
+    payloads = [_slot_payload(slot_start, slot_end) for slot_start, slot_end in slots]
+    return {
+        'slots': payloads,
+        'total_slots': len(payloads),
+        'formatted_display': _group_by_date(payloads)[1],
+        'weeks_searched': weeks_searched
+    }
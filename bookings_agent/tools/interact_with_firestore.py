@@ -1,18 +1,12 @@
-from bookings_agent.firestore_service import FirestoreService, sanitize_sentinel
-from typing import Optional, Dict, Any, List, Union
+from bookings_agent.firestore_service import BATCH_OPERATIONS, sanitize_sentinel
+from bookings_agent.firestore_service_async import get_async_firestore_service
+from bookings_agent.tools.session_identity import resolve_session_identity
+from typing import Optional, Dict, Any, List, Tuple, Union
 from google.cloud.firestore_v1.transforms import Sentinel
 import datetime
 import os
 from google.adk.tools import ToolContext
 
-# Try to import ADK functions for session management
-try:
-    from google.adk import get_session_id
-    ADK_SESSION_AVAILABLE = True
-except ImportError:
-    ADK_SESSION_AVAILABLE = False
-    get_session_id = lambda: None  # Dummy function
-
 def sanitize_firestore_data(data: Any) -> Any:
     """
     Sanitize Firestore data to make it serializable.
@@ -27,7 +21,41 @@ def sanitize_firestore_data(data: Any) -> Any:
     # We now use the centralized sanitize_sentinel function from firestore_service
     return sanitize_sentinel(data)
 
-def interact_with_firestore(
+def _batch_write(index: int, entry: Any, user_id: Optional[str], session_id: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """
+    One entry of a batch as an (operation, args) write, with the defaults and
+    session information the single-operation form adds.
+    """
+    if not isinstance(entry, dict) or not isinstance(entry.get("operation"), str):
+        raise ValueError(f"operations[{index}] must be an object with an 'operation' and its 'args'")
+    operation = entry["operation"]
+    if operation not in BATCH_OPERATIONS:
+        raise ValueError(f"operations[{index}]: '{operation}' cannot be batched; "
+                         f"supported: {', '.join(BATCH_OPERATIONS)}")
+    args = dict(entry.get("args") or {})
+    now = datetime.datetime.now().isoformat()
+    if operation == "save_task":
+        args.setdefault("status", "pending")
+        args.setdefault("created_at", now)
+    elif operation == "memorize":
+        args.setdefault("created_at", now)
+    elif operation == "save_session":
+        args["user_id"] = args.get("user_id") or user_id
+        session_id = args.get("session_id") or session_id or args.get("id")
+        if session_id:
+            args["id"] = session_id
+        args.setdefault("created_at", now)
+    elif operation == "update_session":
+        args["user_id"] = args.get("user_id") or user_id
+        args["session_id"] = args.get("session_id") or session_id
+    elif operation == "save_inquiry":
+        if user_id and "user_id" not in args:
+            args["user_id"] = user_id
+        if session_id and "session_id" not in args:
+            args["session_id"] = session_id
+    return operation, args
+
+async def interact_with_firestore(
     operation: str,
     args: Dict[str, Any],
     tool_context: ToolContext = None
@@ -40,13 +68,17 @@ def interact_with_firestore(
     Args:
         operation (str): The Firestore operation to perform:
             - "save_inquiry": Save a user inquiry to the inquiries collection
+            - "batch": Commit several writes at once, all or none. args holds
+              "operations": a list of {"operation": ..., "args": {...}} using any of
+              save_task, update_task, delete_task, memorize, update_memory,
+              delete_memory, save_session, update_session and save_inquiry
         args (Dict): Arguments required for the specific operation
         tool_context (ToolContext, optional): The ADK tool context, containing session information
         
     Returns:
         Dict: Response containing success status and any requested data
     """
-    service = FirestoreService()
+    service = get_async_firestore_service()
     
     # Initialize response
     response = {
@@ -56,63 +88,14 @@ def interact_with_firestore(
     }
     
     try:
-        # Sanitize any Sentinel objects in the input arguments
-        args = sanitize_firestore_data(args)
-        
-        # Create a copy to avoid modifying the original args
-        args_copy = args.copy()
+        # Sanitize any Sentinel objects in the input arguments. The sanitizer returns
+        # args itself when there are none, so copy the top level we add fields to
+        args_copy = dict(sanitize_firestore_data(args))
         
-        # Extract session information from tool_context if available
-        user_id = None
-        session_id = None
+        # Resolve the user and session this call belongs to
+        user_id, session_id = resolve_session_identity(tool_context)
         
         if tool_context:
-            try:
-                # Access session information through the internal session service
-                if hasattr(tool_context, "_invocation_context") and hasattr(tool_context._invocation_context, "session_service"):
-                    session_service = tool_context._invocation_context.session_service
-                    
-                    # The session service contains a 'sessions' dictionary with app_name as key
-                    if hasattr(session_service, "__dict__") and "sessions" in session_service.__dict__:
-                        sessions_dict = session_service.__dict__["sessions"]
-                        
-                        # Get the bookings_agent sessions
-                        if "bookings_agent" in sessions_dict:
-                            bookings_sessions = sessions_dict["bookings_agent"]
-                            
-                            # The first key is the user_id
-                            if bookings_sessions:
-                                user_id = list(bookings_sessions.keys())[0]
-                                user_sessions = bookings_sessions[user_id]
-                                
-                                # The first key in user_sessions is the session_id
-                                if user_sessions:
-                                    session_id = list(user_sessions.keys())[0]
-                
-                print(f"Extracted from session service - user_id: {user_id}, session_id: {session_id}")
-            except Exception as e:
-                print(f"Error extracting session info: {e}")
-                
-                # Fall back to the old methods if the new approach fails
-                # First try to get from session object directly
-                if hasattr(tool_context, "session") and tool_context.session:
-                    user_id = getattr(tool_context.session, "user_id", None)
-                    session_id = getattr(tool_context.session, "id", None)
-                
-                # Then try from state
-                if not user_id and hasattr(tool_context, "state"):
-                    user_id = tool_context.state.get("user_id")
-                
-                if not session_id and hasattr(tool_context, "state"):
-                    session_id = tool_context.state.get("session_id")
-                
-                # Fallback to direct attributes
-                if not user_id and hasattr(tool_context, "user_id"):
-                    user_id = tool_context.user_id
-                
-                if not session_id and hasattr(tool_context, "session_id"):
-                    session_id = tool_context.session_id
-            
             # For creation operations, ensure user_id and session_id are set
             if operation in ["save_inquiry"]:
                 if user_id and "user_id" not in args_copy:
@@ -122,26 +105,47 @@ def interact_with_firestore(
             
             # For filtering operations, add user_id and session_id to filters
             if operation in ["list_tasks", "list_memories"]:
-                if "filters" not in args_copy:
-                    args_copy["filters"] = {}
+                # Copied, as the caller's filters may be shared
+                args_copy["filters"] = dict(args_copy.get("filters") or {})
                     
-                if user_id and "user_id" not in args_copy.get("filters", {}):
-                    args_copy.setdefault("filters", {})["user_id"] = user_id
-                if session_id and "session_id" not in args_copy.get("filters", {}):
-                    args_copy.setdefault("filters", {})["session_id"] = session_id
+                if user_id and "user_id" not in args_copy["filters"]:
+                    args_copy["filters"]["user_id"] = user_id
+                if session_id and "session_id" not in args_copy["filters"]:
+                    args_copy["filters"]["session_id"] = session_id
             
             # Debug: log session information for troubleshooting
             print(f"Using session info - user_id: {user_id}, session_id: {session_id}")
         
+        # Several writes in one WriteBatch, validated before any is committed
+        if operation == "batch":
+            operations = args_copy.get("operations")
+            if not isinstance(operations, list) or not operations:
+                raise ValueError("batch requires a non-empty 'operations' list")
+            writes = [_batch_write(index, entry, user_id, session_id) for index, entry in enumerate(operations)]
+            results = await service.write_batch(writes)
+            response["success"] = True
+            response["data"] = {
+                "results": [{"operation": operation, "success": True, "data": result}
+                            for (operation, _), result in zip(writes, results)]
+            }
+            
+            # Same session state as the single operations
+            if tool_context and hasattr(tool_context, "state"):
+                for result in results:
+                    for key, state_key in (("task_id", "last_task_id"), ("memory_id", "last_memory_id"),
+                                           ("session_id", "session_id")):
+                        if key in result:
+                            tool_context.state[state_key] = result[key]
+            
         # Task operations
-        if operation == "save_task":
+        elif operation == "save_task":
             # Set defaults for required fields
             if "status" not in args_copy:
                 args_copy["status"] = "pending"
             if "created_at" not in args_copy:
                 args_copy["created_at"] = datetime.datetime.now().isoformat()
                 
-            task_id = service.save_task(args_copy)
+            task_id = await service.save_task(args_copy)
             response["success"] = True
             response["data"] = {"task_id": task_id}
             
@@ -150,20 +154,20 @@ def interact_with_firestore(
                 tool_context.state["last_task_id"] = task_id
                 
         elif operation == "get_task":
-            task = service.get_task(args_copy.get("task_id"))
+            task = await service.get_task(args_copy.get("task_id"))
             response["success"] = True
             response["data"] = task  # Already sanitized by the service
             
         elif operation == "update_task":
-            service.update_task(args_copy.get("task_id"), args_copy.get("updates", {}))
+            await service.update_task(args_copy.get("task_id"), args_copy.get("updates", {}))
             response["success"] = True
             
         elif operation == "delete_task":
-            service.delete_task(args_copy.get("task_id"))
+            await service.delete_task(args_copy.get("task_id"))
             response["success"] = True
             
         elif operation == "list_tasks":
-            tasks = service.list_tasks(args_copy.get("filters"))
+            tasks = await service.list_tasks(args_copy.get("filters"))
             response["success"] = True
             response["data"] = tasks  # Already sanitized by the service
             
@@ -172,7 +176,7 @@ def interact_with_firestore(
             if "created_at" not in args_copy:
                 args_copy["created_at"] = datetime.datetime.now().isoformat()
                 
-            memory_id = service.memorize(args_copy)
+            memory_id = await service.memorize(args_copy)
             response["success"] = True
             response["data"] = {"memory_id": memory_id}
             
@@ -181,20 +185,20 @@ def interact_with_firestore(
                 tool_context.state["last_memory_id"] = memory_id
                 
         elif operation == "get_memory":
-            memory = service.get_memory(args_copy.get("memory_id"))
+            memory = await service.get_memory(args_copy.get("memory_id"))
             response["success"] = True
             response["data"] = memory  # Already sanitized by the service
             
         elif operation == "update_memory":
-            service.update_memory(args_copy.get("memory_id"), args_copy.get("updates", {}))
+            await service.update_memory(args_copy.get("memory_id"), args_copy.get("updates", {}))
             response["success"] = True
             
         elif operation == "delete_memory":
-            service.delete_memory(args_copy.get("memory_id"))
+            await service.delete_memory(args_copy.get("memory_id"))
             response["success"] = True
             
         elif operation == "list_memories":
-            memories = service.list_memories(args_copy.get("filters"))
+            memories = await service.list_memories(args_copy.get("filters"))
             response["success"] = True
             response["data"] = memories  # Already sanitized by the service
   
@@ -215,7 +219,7 @@ def interact_with_firestore(
                 args_copy["created_at"] = datetime.datetime.now().isoformat()
                 
             # Save the session data
-            session_id = service.save_session(user_id, args_copy)
+            session_id = await service.save_session(user_id, args_copy)
             response["success"] = True
             response["data"] = {"session_id": session_id}
             
@@ -232,7 +236,7 @@ def interact_with_firestore(
             if not user_id or not session_id:
                 raise ValueError("user_id and session_id are required for get_session")
                 
-            session = service.get_session(user_id, session_id)
+            session = await service.get_session(user_id, session_id)
             response["success"] = True
             response["data"] = session
             
@@ -246,11 +250,11 @@ def interact_with_firestore(
             if not user_id or not session_id:
                 raise ValueError("user_id and session_id are required for update_session")
                 
-            service.update_session(user_id, session_id, updates)
+            await service.update_session(user_id, session_id, updates)
             response["success"] = True
 
         elif operation == "save_inquiry":
-            result = service.save_inquiry(args_copy)
+            result = await service.save_inquiry(args_copy)
             response["success"] = result.get("success", False)
             response["data"] = result.get("data")
             if not response["success"]:
@@ -263,6 +267,12 @@ def interact_with_firestore(
                 "message": f"The operation '{operation}' is not supported by the interact_with_firestore tool."
             }
             
+    except ValueError as e:
+        # Invalid arguments (for a batch, nothing was written)
+        response["error"] = {
+            "code": "invalid_arguments",
+            "message": str(e)
+        }
     except Exception as e:
         response["error"] = {
             "code": "execution_error",
@@ -0,0 +1,71 @@
+"""
+Which user and session a tool call belongs to.
+
+The Firestore tools used to walk the session service's process-wide sessions
+dict and take its first user and first session, which costs time with every
+stored session and, with several conversations live, picks someone else's.
+The session a tool runs in is on its invocation context, so it is read from
+there instead. The identity is cached per invocation ID, since every tool call
+of one invocation belongs to the same session.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+
+# Invocations whose identity is kept; older ones are resolved again if needed
+MAX_CACHED_INVOCATIONS = 1024
+
+
+class SessionIdentity(NamedTuple):
+    user_id: Optional[str]
+    session_id: Optional[str]
+
+
+_identities: 'OrderedDict[str, SessionIdentity]' = OrderedDict()
+_identities_lock = threading.Lock()
+
+
+def _read_identity(tool_context: Any, invocation: Any) -> SessionIdentity:
+    session = getattr(invocation, "session", None)
+    user_id = getattr(session, "user_id", None)
+    session_id = getattr(session, "id", None)
+
+    # Contexts without a session (tests, direct calls) may carry the IDs themselves
+    state = getattr(tool_context, "state", None)
+    if state is not None:
+        user_id = user_id or state.get("user_id")
+        session_id = session_id or state.get("session_id")
+    user_id = user_id or getattr(tool_context, "user_id", None)
+    session_id = session_id or getattr(tool_context, "session_id", None)
+    return SessionIdentity(user_id, session_id)
+
+
+def resolve_session_identity(tool_context: Any) -> SessionIdentity:
+    """
+    Resolve the user and session of a tool call from its ToolContext.
+
+    Args:
+        tool_context: The ADK tool context, or None
+
+    Returns:
+        SessionIdentity(user_id, session_id); either may be None when unknown
+    """
+    if tool_context is None:
+        return SessionIdentity(None, None)
+    invocation = getattr(tool_context, "_invocation_context", None)
+    invocation_id = getattr(invocation, "invocation_id", None)
+    if invocation_id:
+        with _identities_lock:
+            identity = _identities.get(invocation_id)
+            if identity is not None:
+                _identities.move_to_end(invocation_id)
+                return identity
+
+    identity = _read_identity(tool_context, invocation)
+    if invocation_id and identity.user_id and identity.session_id:
+        with _identities_lock:
+            _identities[invocation_id] = identity
+            while len(_identities) > MAX_CACHED_INVOCATIONS:
+                _identities.popitem(last=False)
+    return identity
@@ -0,0 +1,118 @@
+"""
+In-process request coalescing ("singleflight") for availability lookups.
+
+At busy times many conversations ask for the same availability within a few
+seconds, and each would send an identical Calendar request for the same
+window. A SingleFlight lets the first caller for a key do the work while
+every concurrent caller with the same key waits for, and shares, that
+caller's result (or exception). Nothing is cached: once the call finishes the
+next caller starts a new one.
+
+Thread callers (do) share calls with other threads; coroutines (do_async)
+share calls with other coroutines on the same event loop.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._counters = {
+            'calls': 0,
+            'executions': 0,
+            'coalesced': 0,
+            'errors': 0,
+        }
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn() unless a call with the same key is already in flight, in which
+        case wait for it and return its result (or raise its exception).
+
+        Args:
+            key: Identifies equivalent calls, e.g. ('events', calendar_id, start, end)
+            fn: Does the work; called at most once per concurrent group of callers
+        """
+        with self._lock:
+            self._counters['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters['executions'] += 1
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._counters['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async variant of do(): await fn() unless a coroutine on this event loop
+        is already running it for the same key.
+
+        The shared call runs as its own task, so one caller being cancelled
+        does not cancel the call for the others.
+        """
+        task_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            self._counters['calls'] += 1
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                self._tasks[task_key] = task
+                self._counters['executions'] += 1
+                task.add_done_callback(lambda done: self._forget(task_key, done))
+            else:
+                self._counters['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, task_key: Tuple[int, Hashable], task: asyncio.Future) -> None:
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+            if not task.cancelled() and task.exception() is not None:
+                self._counters['errors'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return call counters; 'coalesced' calls shared another caller's request."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._calls) + len(self._tasks)
+        return stats
+
+
+# Shared by the availability cache and the slot tools
+availability_flight = SingleFlight()
@@ -0,0 +1,98 @@
+"""
+Interval helpers for finding free booking slots.
+
+Busy intervals are sorted and merged once into disjoint, ordered intervals;
+candidate slots are then checked against them in a single linear sweep
+instead of testing every slot against every event. Both steps also work
+lazily on iterators, so busy data streamed page by page from the Calendar API
+can be consumed without holding the whole window in memory.
+
+Busy lists from several calendars are combined with a k-way heap merge.
+
+All intervals are (start, end) pairs in epoch seconds with end exclusive.
+"""
+
+import heapq
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+Interval = Tuple[float, float]
+
+
+def merge_sorted_intervals(intervals: Iterable[Interval]) -> Iterator[Interval]:
+    """
+    Lazily merge overlapping or touching intervals that are already ordered by start.
+
+    Args:
+        intervals: (start, end) pairs ordered by start
+
+    Yields:
+        Disjoint intervals ordered by start (and therefore also by end).
+    """
+    current_start = current_end = None
+    for start, end in intervals:
+        if current_start is None:
+            current_start, current_end = start, end
+        elif start <= current_end:
+            if end > current_end:
+                current_end = end
+        else:
+            yield current_start, current_end
+            current_start, current_end = start, end
+    if current_start is not None:
+        yield current_start, current_end
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """
+    Sort and merge overlapping or touching intervals.
+
+    Args:
+        intervals: (start, end) pairs in any order
+
+    Returns:
+        Disjoint intervals ordered by start (and therefore also by end).
+    """
+    return list(merge_sorted_intervals(sorted(intervals)))
+
+
+def merge_busy_lists(busy_lists: Iterable[Iterable[Interval]]) -> Iterator[Interval]:
+    """
+    Lazily union several busy lists (e.g. one per calendar) into merged intervals.
+
+    Uses a k-way heap merge, so k sorted lists holding n intervals in total
+    take O(n log k) rather than a full re-sort or a pairwise comparison.
+
+    Args:
+        busy_lists: Iterables of (start, end) pairs, each ordered by start
+
+    Yields:
+        Disjoint intervals ordered by start.
+    """
+    return merge_sorted_intervals(heapq.merge(*busy_lists))
+
+
+def free_slots(candidates: Iterable[Sequence], busy: Iterable[Interval]) -> Iterator[Sequence]:
+    """
+    Yield the candidate slots that do not overlap any busy interval.
+
+    Runs in O(len(candidates) + len(busy)). Busy intervals are pulled from the
+    iterable only as far as the current candidate requires.
+
+    Args:
+        candidates: Tuples whose first two items are the slot's start and end,
+                    ordered by start. Any extra items are passed through untouched.
+        busy: Merged busy intervals, as produced by merge_intervals() or
+              merge_sorted_intervals()
+
+    Yields:
+        The free candidates, in order.
+    """
+    busy = iter(busy)
+    current = next(busy, None)
+    for candidate in candidates:
+        slot_start, slot_end = candidate[0], candidate[1]
+        # Skip busy intervals that end before this slot starts; later slots start later
+        while current is not None and current[1] <= slot_start:
+            current = next(busy, None)
+        if current is None or current[0] >= slot_end:
+            yield candidate
@@ -0,0 +1,241 @@
+"""
+Short-lived slot leases that stop two conversations from booking the same slot.
+
+When a user picks a slot, the conversation takes a lease on it in Firestore
+(a transactional compare-and-set, see FirestoreService.acquire_slot_lease).
+While the lease is unexpired, slot queries from other conversations hide the
+slot, and create_event for it is refused. The lease is confirmed when the event
+is created, or released when the conversation lets it go; abandoned leases
+simply lapse after SLOT_LEASE_TTL_SECONDS.
+
+Leases are an optimisation over the calendar, not the source of truth, so if
+Firestore is unreachable these helpers log the error and let the booking flow
+continue as it did before leases existed.
+
+Slot queries check leases against an in-memory copy of each calendar's leases
+that a Firestore listener keeps current (SLOT_LEASES_LISTEN), so serving slots
+does not cost a Firestore query per call. Until the listener has delivered its
+first snapshot, or if it cannot be started, leases are queried instead.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from bookings_agent.firestore_service import get_firestore_service
+from bookings_agent.tools.session_identity import resolve_session_identity
+from bookings_agent.tools.slot_engine import Interval, merge_intervals
+
+# Set SLOT_LEASES_ENABLED=false to turn slot holds off entirely
+SLOT_LEASES_ENABLED = os.getenv("SLOT_LEASES_ENABLED", "true").lower() != "false"
+# How long a held slot stays reserved while the user finishes booking
+SLOT_LEASE_TTL_SECONDS = int(os.getenv("SLOT_LEASE_TTL_SECONDS", "600"))
+# Lease transactions run in parallel when a series of sessions is booked at once
+LEASE_CONCURRENCY = 10
+# Set SLOT_LEASES_LISTEN=false to query leases on every slot lookup instead of listening
+SLOT_LEASES_LISTEN = os.getenv("SLOT_LEASES_LISTEN", "true").lower() != "false"
+# How long to wait before trying again to start a listener that failed
+LEASE_LISTEN_RETRY_SECONDS = 60
+
+def lease_holder(tool_context) -> Optional[str]:
+    """
+    The session ID of the conversation calling a tool, used as the lease holder.
+
+    Resolved like the session saved with Firestore records, so leases and records
+    name the same conversation. None when the tool context has no session.
+    """
+    return resolve_session_identity(tool_context).session_id
+
+
+def acquire_slots(calendar_id: str, slots: List[Tuple[int, int]], holder: str) -> List[bool]:
+    """
+    Take holder's leases on several slots at once (one transaction per slot, run concurrently).
+
+    Returns:
+        list: Whether each slot was acquired, in order
+    """
+    if not SLOT_LEASES_ENABLED or not slots:
+        return [True] * len(slots)
+    with ThreadPoolExecutor(max_workers=min(len(slots), LEASE_CONCURRENCY)) as executor:
+        leases = executor.map(lambda slot: acquire_slot(calendar_id, slot[0], slot[1], holder), slots)
+        return [lease["acquired"] for lease in leases]
+
+
+def acquire_slot(calendar_id: str, start_ts: int, end_ts: int, holder: str) -> dict:
+    """
+    Take (or extend) holder's lease on a slot.
+
+    Returns:
+        dict: FirestoreService.acquire_slot_lease() result; "acquired" is True
+              when leases are disabled or Firestore cannot be reached.
+    """
+    if not SLOT_LEASES_ENABLED:
+        return {"acquired": True}
+    try:
+        return get_firestore_service().acquire_slot_lease(
+            calendar_id, start_ts, end_ts, holder, SLOT_LEASE_TTL_SECONDS)
+    except Exception as e:
+        print(f"[slot_leases] Could not acquire lease on {start_ts}: {e}")
+        return {"acquired": True}
+
+
+def confirm_slot(calendar_id: str, start_ts: int, end_ts: int, holder: str, event_id: str) -> None:
+    """Mark holder's lease as booked and release any other slots it was holding."""
+    confirm_slots(calendar_id, [(start_ts, end_ts, event_id)], holder)
+
+
+def confirm_slots(calendar_id: str, bookings: List[Tuple[int, int, str]], holder: str) -> None:
+    """
+    Mark holder's leases on several booked slots as confirmed, then release
+    any other slots it was holding.
+
+    Args:
+        bookings: (start_ts, end_ts, event_id) of each booked slot
+    """
+    if not SLOT_LEASES_ENABLED or not bookings:
+        return
+    try:
+        service = get_firestore_service()
+        for start_ts, end_ts, event_id in bookings:
+            service.confirm_slot_lease(calendar_id, start_ts, end_ts, holder, event_id)
+        # Booked slots are confirmed by now, so only the other holds are released
+        service.release_slot_leases(calendar_id, holder)
+    except Exception as e:
+        print(f"[slot_leases] Could not confirm leases for {holder}: {e}")
+
+
+def release_slot(calendar_id: str, start_ts: int, holder: str) -> bool:
+    """Release holder's lease on one slot, if it still holds it."""
+    if not SLOT_LEASES_ENABLED:
+        return False
+    try:
+        return get_firestore_service().release_slot_lease(calendar_id, start_ts, holder)
+    except Exception as e:
+        print(f"[slot_leases] Could not release lease on {start_ts}: {e}")
+        return False
+
+
+def release_slots(calendar_id: str, holder: str, keep_start_ts: Optional[int] = None) -> int:
+    """Release every slot holder is holding (except keep_start_ts). Returns the number released."""
+    if not SLOT_LEASES_ENABLED or not holder:
+        return 0
+    try:
+        return get_firestore_service().release_slot_leases(calendar_id, holder, keep_slot_start=keep_start_ts)
+    except Exception as e:
+        print(f"[slot_leases] Could not release leases for {holder}: {e}")
+        return 0
+
+
+def clear_booked_slots(calendar_id: str, event_ids: List[str]) -> None:
+    """Drop the leases of cancelled bookings so their slots are offered again."""
+    if not SLOT_LEASES_ENABLED or not event_ids:
+        return
+    try:
+        get_firestore_service().delete_slot_leases_for_events(calendar_id, event_ids)
+    except Exception as e:
+        print(f"[slot_leases] Could not clear leases of cancelled events: {e}")
+
+
+class _LeaseView:
+    """A calendar's leases, kept current by a listener on its slot_leases collection."""
+
+    def __init__(self, calendar_id: str):
+        self.calendar_id = calendar_id
+        # (slot_start, slot_end, holder, expires_at) per lease document
+        self._leases: List[Tuple[int, int, str, datetime]] = []
+        self._ready = False
+        self._watch = None
+        self._failed_at: Optional[float] = None
+        self._starting = False
+        self._lock = threading.Lock()
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        leases = []
+        for doc in docs:
+            lease = doc.to_dict() or {}
+            if "slot_start" in lease and "expires_at" in lease:
+                leases.append((lease["slot_start"], lease["slot_end"], lease.get("holder"), lease["expires_at"]))
+        with self._lock:
+            self._leases = leases
+            self._ready = True
+
+    def start(self) -> None:
+        with self._lock:
+            if self._watch is not None or self._starting or (
+                    self._failed_at is not None and time.monotonic() - self._failed_at < LEASE_LISTEN_RETRY_SECONDS):
+                return
+            self._starting = True
+        # Started outside the lock, which the listener's first callback takes
+        try:
+            # Leases on slots that already ended never matter to slot queries
+            watch = get_firestore_service().watch_slot_leases(self.calendar_id, time.time(), self._on_snapshot)
+        except Exception as e:
+            print(f"[slot_leases] Could not listen to leases, querying them instead: {e}")
+            watch = None
+        with self._lock:
+            self._watch = watch
+            self._starting = False
+            self._failed_at = None if watch is not None else time.monotonic()
+
+    def leases(self, start_ts: float, end_ts: float) -> Optional[List[Tuple[int, int, str]]]:
+        """(slot_start, slot_end, holder) of unexpired leases overlapping [start_ts, end_ts), or None if not ready."""
+        with self._lock:
+            if not self._ready:
+                return None
+            leases = self._leases
+        now = datetime.now(timezone.utc)
+        return [(slot_start, slot_end, holder) for slot_start, slot_end, holder, expires_at in leases
+                if slot_end > start_ts and slot_start < end_ts and expires_at > now]
+
+    def stop(self) -> None:
+        with self._lock:
+            watch, self._watch = self._watch, None
+            self._ready = False
+        if watch is not None:
+            watch.unsubscribe()
+
+
+_views: Dict[str, _LeaseView] = {}
+_views_lock = threading.Lock()
+
+
+def _lease_view(calendar_id: str) -> _LeaseView:
+    view = _views.get(calendar_id)
+    if view is None:
+        with _views_lock:
+            view = _views.setdefault(calendar_id, _LeaseView(calendar_id))
+    view.start()
+    return view
+
+
+def stop_lease_listeners() -> None:
+    """Stop every lease listener (call on shutdown)."""
+    with _views_lock:
+        views = list(_views.values())
+        _views.clear()
+    for view in views:
+        view.stop()
+
+
+def leased_intervals(calendar_id: str, start_ts: float, end_ts: float, holder: Optional[str] = None) -> List[Interval]:
+    """
+    Merged intervals of slots leased by anyone other than holder in [start_ts, end_ts).
+
+    Answered from the calendar's lease listener once it is up, otherwise by a query.
+    The result can be passed to slot_engine.free_slots() like busy intervals.
+    """
+    if not SLOT_LEASES_ENABLED:
+        return []
+    leases = _lease_view(calendar_id).leases(start_ts, end_ts) if SLOT_LEASES_LISTEN else None
+    if leases is None:
+        try:
+            leases = [(lease["slot_start"], lease["slot_end"], lease["holder"])
+                      for lease in get_firestore_service().list_slot_leases(calendar_id, start_ts, end_ts)]
+        except Exception as e:
+            print(f"[slot_leases] Could not list leases: {e}")
+            return []
+    return merge_intervals(
+        (slot_start, slot_end) for slot_start, slot_end, lease_holder in leases if lease_holder != holder)
@@ -0,0 +1,119 @@
+"""
+Warm state persisted to local disk so a new process can answer its first
+availability request from memory.
+
+On a cold start the first get_all_available_slots call would otherwise wait
+for the availability rules (a Firestore read when AVAILABILITY_RULES_SOURCE is
+"firestore") and a full Calendar lookup. The state file (WARM_STATE_FILE)
+keeps the availability rules and the latest availability snapshot: main.py
+loads it before serving traffic, and saves it again after snapshot refreshes
+(at most every WARM_STATE_SAVE_SECONDS) and on shutdown.
+
+A loaded snapshot is usually older than AVAILABILITY_SNAPSHOT_MAX_AGE_SECONDS,
+so it gets its own limit, WARM_STATE_MAX_AGE_SECONDS: it answers the first
+request and is rebuilt straight away, after which the usual limit applies.
+Slots it offers that have been booked since are still refused by
+create_event's lease and conflict checks. A state file older than that only
+contributes the rules. On Cloud Run /tmp is an in-memory filesystem that
+starts empty on every instance, so the default path only helps a process
+restarted within the same instance; point WARM_STATE_FILE at a mounted volume
+for the state to carry over to new instances.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from bookings_agent.tools.availability_cache import get_availability_cache
+from bookings_agent.tools.availability_rules import get_availability_rules, seed_availability_rules
+from bookings_agent.tools.availability_snapshot import (
+    SNAPSHOT_SLOT_MINUTES,
+    AvailabilitySnapshot,
+    get_availability_snapshots,
+)
+from bookings_agent.tools.google_calendar import time_zone
+
+# Set WARM_STATE_FILE="" to disable the warm state file
+WARM_STATE_FILE = os.getenv('WARM_STATE_FILE', '/tmp/bookings_agent_warm_state.json')
+WARM_STATE_SAVE_SECONDS = float(os.getenv('WARM_STATE_SAVE_SECONDS', '300'))
+# Oldest saved snapshot still served (once) to the first request after startup
+WARM_STATE_MAX_AGE_SECONDS = float(os.getenv('WARM_STATE_MAX_AGE_SECONDS', '3600'))
+# Bumped whenever the file layout changes; files of another format are ignored
+WARM_STATE_FORMAT = 1
+
+_save_lock = threading.Lock()
+_saved_at = 0.0
+
+
+def load_warm_state(path: Optional[str] = None) -> bool:
+    """
+    Seed the availability rules and snapshot from the state file.
+
+    Returns:
+        bool: True if a snapshot was installed
+    """
+    path = WARM_STATE_FILE if path is None else path
+    if not path or not os.path.exists(path):
+        return False
+    started = time.perf_counter()
+    try:
+        with open(path, 'rb') as f:
+            state = json.loads(f.read())
+        if state.get('format') != WARM_STATE_FORMAT:
+            print(f"[warm_state] Ignoring {path}: unknown format {state.get('format')}")
+            return False
+        rules = seed_availability_rules(state['rules'])
+        data = state.get('snapshot')
+        if (not data
+                or data['rules_fingerprint'] != rules.fingerprint
+                or data['slot_minutes'] != SNAPSHOT_SLOT_MINUTES
+                or time.time() - data['built_at'] > WARM_STATE_MAX_AGE_SECONDS):
+            return False
+        snapshot = AvailabilitySnapshot.from_dict(data, ZoneInfo(time_zone), get_availability_cache().generation)
+        get_availability_snapshots().install(snapshot, serve_once_max_age=WARM_STATE_MAX_AGE_SECONDS)
+    except Exception as e:
+        print(f"[warm_state] Could not load {path}: {e}")
+        return False
+    print(f"[warm_state] Loaded {len(snapshot.free)} slot(s) built {snapshot.age_seconds():.0f}s ago "
+          f"in {(time.perf_counter() - started) * 1000:.1f}ms")
+    return True
+
+
+def save_warm_state(snapshot: Optional[AvailabilitySnapshot] = None, path: Optional[str] = None) -> bool:
+    """
+    Write the current rules and snapshot (or the one given) to the state file.
+
+    The file is written to a temporary name and renamed, so a reader never
+    sees a partial file.
+    """
+    global _saved_at
+    path = WARM_STATE_FILE if path is None else path
+    if not path:
+        return False
+    snapshot = get_availability_snapshots().latest if snapshot is None else snapshot
+    state = {
+        'format': WARM_STATE_FORMAT,
+        'saved_at': time.time(),
+        'rules': get_availability_rules().to_dict(),
+        'snapshot': snapshot.to_dict() if snapshot is not None else None,
+    }
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with _save_lock:
+            with open(temporary, 'w') as f:
+                json.dump(state, f, separators=(',', ':'))
+            os.replace(temporary, path)
+            _saved_at = time.monotonic()
+    except Exception as e:
+        print(f"[warm_state] Could not save {path}: {e}")
+        return False
+    return True
+
+
+def snapshot_refreshed(snapshot: AvailabilitySnapshot) -> None:
+    """Snapshot refresh listener: save the state unless it was saved recently."""
+    if time.monotonic() - _saved_at >= WARM_STATE_SAVE_SECONDS:
+        save_warm_state(snapshot)
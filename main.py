@@ -1,3 +1,6 @@
+import asyncio
+import contextlib
+import inspect
 import os
 
 import uvicorn
@@ -6,6 +9,17 @@ from google.adk.cli.fast_api import get_fast_api_app
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 
+from bookings_agent.firestore_read_cache import get_read_cache
+from bookings_agent.firestore_service import close_firestore_service
+from bookings_agent.firestore_service_async import close_async_firestore_service, peek_async_firestore_service
+from bookings_agent.tools.availability_cache import get_availability_cache
+from bookings_agent.tools.availability_snapshot import SNAPSHOT_ENABLED, get_availability_snapshots
+from bookings_agent.tools.calendar_client import get_async_calendar_client, get_calendar_client
+from bookings_agent.tools.google_calendar_async import build_availability_snapshot
+from bookings_agent.tools.singleflight import availability_flight
+from bookings_agent.tools.slot_leases import stop_lease_listeners
+from bookings_agent.tools.warm_state import load_warm_state, save_warm_state, snapshot_refreshed
+
 IS_DEV_MODE = os.getenv("ENV").lower() == "development"
 DEPLOYED_CLOUD_SERVICE_URL = os.getenv("DEPLOYED_CLOUD_SERVICE_URL")
 
@@ -19,6 +33,10 @@ SESSION_DB_URL = "sqlite:///./sessions.db"
 ALLOWED_ORIGINS = ["https://tjr-scheduler.web.app", DEPLOYED_CLOUD_SERVICE_URL]
 # Set web=True if you intend to serve a web interface, False otherwise
 SERVE_WEB_INTERFACE = False
+# Optional Calendar push notifications (events.watch) that invalidate the availability cache.
+# Must be the public HTTPS URL of the /calendar/notifications endpoint below.
+CALENDAR_WATCH_URL = os.getenv("CALENDAR_WATCH_URL")
+CALENDAR_WATCH_TOKEN = os.getenv("CALENDAR_WATCH_TOKEN")
 
 app: FastAPI = get_fast_api_app(
     agent_dir=AGENT_DIR,
@@ -27,6 +45,60 @@ app: FastAPI = get_fast_api_app(
     web=SERVE_WEB_INTERFACE,
 )
 
+# Wrap the ADK app's lifespan so our own startup/shutdown work runs alongside it
+_adk_lifespan = app.router.lifespan_context
+
+async def _shutdown_step(description: str, step) -> None:
+    """Run one shutdown step (sync or async), logging a failure so the remaining steps still run."""
+    try:
+        result = step()
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        print(f"Could not {description}: {e}")
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up = None
+    try:
+        # Serve the first requests from the state saved by the previous process, while the
+        # Calendar service and token are prepared off the request path
+        if SNAPSHOT_ENABLED:
+            load_warm_state()
+        warm_up = asyncio.create_task(asyncio.to_thread(get_calendar_client().warm_up))
+        if CALENDAR_WATCH_URL:
+            try:
+                channel = await asyncio.to_thread(
+                    get_availability_cache().start_watch, CALENDAR_WATCH_URL, CALENDAR_WATCH_TOKEN)
+                print(f"Watching calendar for changes (channel {channel.get('id')})")
+            except Exception as e:
+                print(f"Could not start calendar watch channel: {e}")
+        if SNAPSHOT_ENABLED:
+            # Rebuild the served availability snapshot on a schedule and after every calendar change
+            get_availability_cache().add_invalidation_listener(get_availability_snapshots().request_refresh)
+            get_availability_snapshots().add_refresh_listener(snapshot_refreshed)
+            get_availability_snapshots().start(build_availability_snapshot)
+        async with _adk_lifespan(app):
+            yield
+    finally:
+        # Runs even when startup or the ADK lifespan raised; each step is attempted regardless of the others
+        await _shutdown_step("stop the availability snapshot task", lambda: get_availability_snapshots().stop())
+        if SNAPSHOT_ENABLED:
+            await _shutdown_step("save the warm state", save_warm_state)
+        if warm_up is not None:
+            await _shutdown_step("warm up the Calendar client", lambda: warm_up)
+        await _shutdown_step("close the async Calendar client", lambda: get_async_calendar_client().aclose())
+        if CALENDAR_WATCH_URL:
+            await _shutdown_step(
+                "stop calendar watch channel", lambda: asyncio.to_thread(get_availability_cache().stop_watch))
+        await _shutdown_step("stop the slot lease listeners", stop_lease_listeners)
+        await _shutdown_step("clear the Firestore read cache", lambda: get_read_cache().clear())
+        await _shutdown_step("close the Firestore client", close_firestore_service)
+        # Commits the write-behind queue before closing the async client
+        await _shutdown_step("close the async Firestore client", close_async_firestore_service)
+
+app.router.lifespan_context = lifespan
+
 @app.get("/healthz")
 async def health_check():
     """
@@ -34,6 +106,42 @@ async def health_check():
     """
     return {"status": "ok", "env": os.getenv("ENV", "unknown")}
 
+@app.get("/metrics/availability")
+async def availability_metrics():
+    """
+    Availability cache counters and Calendar client timings for monitoring
+    """
+    return {
+        "availability_cache": get_availability_cache().get_stats(),
+        "calendar_client": get_calendar_client().get_stats(),
+        "singleflight": availability_flight.get_stats(),
+        "snapshot": get_availability_snapshots().get_stats(),
+    }
+
+@app.get("/metrics/firestore")
+async def firestore_metrics():
+    """
+    Read cache hit ratio, write-behind queue depth and flush latency for monitoring
+    """
+    # Only report on a service the tools created; a scrape must not create clients or tasks
+    service = peek_async_firestore_service()
+    write_behind = service.write_behind if service is not None else None
+    return {
+        "read_cache": get_read_cache().get_stats(),
+        "write_behind": write_behind.get_stats() if write_behind is not None else None,
+    }
+
+if CALENDAR_WATCH_URL:
+    @app.post("/calendar/notifications")
+    async def calendar_notification(request: Request):
+        """
+        Receives events.watch push notifications and invalidates the availability cache
+        """
+        if CALENDAR_WATCH_TOKEN and request.headers.get("X-Goog-Channel-Token") != CALENDAR_WATCH_TOKEN:
+            return Response(status_code=status.HTTP_403_FORBIDDEN)
+        get_availability_cache().handle_notification(request.headers.get("X-Goog-Resource-State", ""))
+        return Response(status_code=status.HTTP_200_OK)
+
 if __name__ == "__main__":
     # Use the PORT environment variable provided by Cloud Run, defaulting to 8080
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
\ No newline at end of file